@@ -1,10 +1,13 @@
 from sqlalchemy.orm import Session
 from agents.eda_preprocessing import preprocess_data, AgentEventEmitter
+from agents.schema_learning import update_schema_registry, check_schema_drift
+from utils.incremental import running_stats_from_summary
 from utils.connectors import get_connector
 from utils.logger import logger
 from fastapi import HTTPException
 from typing import Dict, Any, Optional
 from datetime import datetime
+import pandas as pd
 import asyncio
 
 # Configuration validation for ingestion
@@ -14,7 +17,9 @@ def validate_source_config(source_config: Dict[str, Any]) -> Dict[str, Any]:
     default_config = {
         "timeout": 30,  # Default timeout in seconds for connectors
         "retry_attempts": 3,  # Default retry attempts for failed fetches
-        "agent_id": "ingestion_agent_1"  # Default agent identifier
+        "agent_id": "ingestion_agent_1",  # Default agent identifier
+        "drift_detection": True,  # Check rows against the registered schema as they arrive
+        "drift_config": {}  # Overrides for the drift thresholds
     }
 
     if not all(field in source_config for field in required_fields):
@@ -53,6 +58,26 @@ async def fetch_with_retries(
         await asyncio.sleep(2 ** attempt)  # Exponential backoff
     raise HTTPException(status_code=500, detail="Max retries exceeded for data fetch")
 
+# Helper function to keep the schema registry current on every ingest
+def register_schema(db: Session, identifier: str, result: Dict[str, Any], agent_id: str) -> None:
+    """Update the schema registry from a successful preprocessing result."""
+    try:
+        schema, changes = update_schema_registry(
+            db,
+            identifier,
+            result.get("field_types", {}),
+            stats=running_stats_from_summary(result.get("column_stats") or {}),
+            row_count=result.get("new_rows", 0),
+            agent_id=agent_id
+        )
+        result["schema_version"] = schema.version
+        if changes and schema.version > 1:
+            logger.info(f"Agent {agent_id}: Schema for {identifier} evolved to v{schema.version}")
+    except Exception as e:
+        # A lost race on (identifier, version) must not leave the session unusable for the rest of the ingest
+        db.rollback()
+        logger.error(f"Agent {agent_id}: Schema registry update failed for {identifier}: {e}")
+
 # Main ingestion function
 async def ingest_data(
     db: Session,
@@ -108,6 +133,13 @@ async def ingest_data(
             )
             logger.info(f"Agent {agent_id}: Data fetched successfully from {source_type}")
 
+        # Stream rows through the schema-drift detector before preprocessing
+        if source_config["drift_detection"]:
+            rows = raw_data.to_dict(orient="records") if isinstance(raw_data, pd.DataFrame) else raw_data
+            drifts = await check_schema_drift(db, identifier, rows, source_config["drift_config"], agent_id)
+            if drifts:
+                logger.warning(f"Agent {agent_id}: Schema drift on {identifier}: {[d['column'] for d in drifts]}")
+
         # Emit event to notify raw data availability
         await AgentEventEmitter.emit(
             "raw_data_ready",
@@ -133,6 +165,8 @@ async def ingest_data(
 
         # Log and return result
         if result["status"] == "success":
+            if not result.get("cached"):
+                register_schema(db, identifier, result, agent_id)
             logger.info(f"Agent {agent_id}: Data ingestion and preprocessing completed for {identifier}")
         else:
             logger.warning(f"Agent {agent_id}: Preprocessing returned non-success status: {result['status']}")
@@ -1,10 +1,24 @@
 from sqlalchemy.orm import Session
 from models.dynamic_data import DynamicData
-from utils.eda import infer_field_types
-from utils.websocket import ws_manager
-from utils.cache import cache_set, cache_get
+from utils.eda import infer_field_types, optimize_dtypes, encode_categoricals
+from utils.websocket import ws_manager, EVENT_CHANNEL
+from utils.cache import cache_set, cache_get, cache_add_members, cache_filter_new_members, cache_publish
+from utils.incremental import (
+    hash_row,
+    hash_records,
+    compute_running_stats,
+    merge_running_stats,
+    summarize_running_stats,
+    update_cluster_model,
+    select_new_rows
+)
 from utils.logger import logger
-from utils.ai import get_ai_insights
+from utils.kpi import update_kpi_states
+from utils.baselines import update_hourly_rollups
+from utils.percentiles import update_fleet_sketches
+from utils.online_anomaly import score_stream
+from utils.changepoints import update_cusum_states
+from utils.ai import summarize_for_insights, generate_insights_handle, schedule_ai_insights
 from utils.stats import detect_clusters
 import pandas as pd
 import numpy as np
@@ -12,13 +26,16 @@ import hashlib
 import json
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans, DBSCAN
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 import asyncio
 
 # Event emitter for multi-agent communication
 class AgentEventEmitter:
     """Simple event emitter for multi-agent communication."""
+    # Set in Celery workers, which have no WebSocket clients: events are published to Redis and relayed by the API
+    relay = False
+
     @staticmethod
     async def emit(event_type: str, data: Dict[str, Any], target: Optional[str] = None):
         """Emit an event to the WebSocket manager or other agents."""
@@ -28,7 +45,10 @@ class AgentEventEmitter:
             "timestamp": datetime.utcnow().isoformat(),
             "target_agent": target
         }
-        await ws_manager.broadcast(payload)
+        if AgentEventEmitter.relay:
+            cache_publish(EVENT_CHANNEL, payload)
+        else:
+            await ws_manager.broadcast(payload)
         logger.debug(f"Emitted event: {event_type} to {target or 'all agents'}")
 
 # Enhanced clean_data function
@@ -53,17 +73,35 @@ def clean_data(df: pd.DataFrame, field_types: Dict[str, str], config: Dict[str,
     return df
 
 # Enhanced transform_data function
-def transform_data(df: pd.DataFrame, field_types: Dict[str, str], config: Dict[str, Any]) -> pd.DataFrame:
-    """Transform the dataframe with scaling and encoding."""
+def transform_data(
+    df: pd.DataFrame,
+    field_types: Dict[str, str],
+    config: Dict[str, Any],
+    scaler_stats: Optional[Dict[str, Dict[str, float]]] = None
+) -> pd.DataFrame:
+    """Transform the dataframe with scaling and encoding.
+
+    When `scaler_stats` (mean/std per column) is given, numeric columns are
+    standardized with those statistics instead of refitting on this frame.
+    """
     try:
         numeric_cols = [col for col, t in field_types.items() if t == "numeric"]
-        if numeric_cols:
+        if numeric_cols and scaler_stats:
+            for col in numeric_cols:
+                col_stats = scaler_stats.get(col, {})
+                std = col_stats.get("std") or 1.0
+                df[col] = (df[col].astype(np.float64) - col_stats.get("mean", 0.0)) / std
+        elif numeric_cols:
             scaler = StandardScaler()
             df[numeric_cols] = scaler.fit_transform(df[numeric_cols])
 
         categorical_cols = [col for col, t in field_types.items() if t == "categorical"]
         if categorical_cols and config.get("encode_categorical", True):
-            df = pd.get_dummies(df, columns=categorical_cols, prefix=categorical_cols)
+            df = encode_categoricals(df, categorical_cols, {
+                "max_one_hot": config.get("max_one_hot_categories", 20),
+                "method": config.get("categorical_encoding", "top_k"),
+                "hash_buckets": config.get("hash_buckets", 16)
+            })
     except Exception as e:
         logger.error(f"Error transforming data: {e}")
     return df
@@ -84,11 +122,157 @@ def detect_clusters(features: np.ndarray, method: str = "kmeans", **kwargs) -> n
         return np.full(features.shape[0], -1)
 
 # Helper function to generate cache key
-def generate_cache_key(identifier: str, config: Dict[str, Any], agent_id: str) -> str:
-    """Generate a unique cache key including agent ID."""
+def generate_cache_key(identifier: str, config: Dict[str, Any], agent_id: str, content_hash: str) -> str:
+    """Generate a unique cache key from the agent ID, config and payload content hash."""
     config_str = json.dumps(config, sort_keys=True)
     config_hash = hashlib.md5(config_str.encode()).hexdigest()
-    return f"eda_{identifier}_{agent_id}_{config_hash}"
+    return f"eda_{identifier}_{agent_id}_{config_hash}_{content_hash}"
+
+# Helper function to profile payload chunks, reusing results for chunks seen before
+def profile_chunks(
+    raw_data: list,
+    chunk_hashes: List[str],
+    chunk_size: int,
+    ttl: int = 86400
+) -> Tuple[Dict[str, str], Dict[str, Dict[str, float]], int]:
+    """
+    Infer field types and raw running statistics chunk by chunk.
+
+    Chunk profiles are cached by chunk content hash, so payloads that share
+    chunks with a previous upload only profile the chunks that changed.
+
+    Limits: only type inference and raw statistics are reused. Cleaning,
+    transformation, clustering and the database insert still run over the
+    whole payload (use incremental mode to skip rows already processed).
+    Field types are a row-weighted majority vote over chunk-level inference,
+    so a column whose type is decided by a minority of chunks can be typed
+    differently than whole-frame inference would type it.
+
+    Returns:
+        tuple: Field types (majority vote across chunks), merged statistics, and
+        the number of chunks served from cache.
+    """
+    type_votes: Dict[str, Dict[str, int]] = {}
+    stats: Dict[str, Dict[str, float]] = {}
+    reused = 0
+    for index, chunk_hash in enumerate(chunk_hashes):
+        profile = cache_get(f"eda_chunk_{chunk_hash}")
+        if profile:
+            reused += 1
+        else:
+            chunk_df = pd.DataFrame(raw_data[index * chunk_size:(index + 1) * chunk_size])
+            chunk_types = infer_field_types(chunk_df)
+            chunk_numeric = [col for col, t in chunk_types.items() if t == "numeric"]
+            profile = {
+                "field_types": chunk_types,
+                "stats": compute_running_stats(chunk_df, chunk_numeric),
+                "rows": len(chunk_df)
+            }
+            cache_set(f"eda_chunk_{chunk_hash}", profile, ttl=ttl)
+
+        for col, col_type in profile["field_types"].items():
+            votes = type_votes.setdefault(col, {})
+            votes[col_type] = votes.get(col_type, 0) + profile["rows"]
+        stats = merge_running_stats(stats, profile["stats"])
+
+    field_types = {col: max(votes, key=votes.get) for col, votes in type_votes.items()}
+    return field_types, stats, reused
+
+# Helpers for incremental preprocessing state
+def _incremental_state_key(identifier: str, agent_id: str) -> str:
+    return f"eda_state_{identifier}_{agent_id}"
+
+def _processed_rows_key(identifier: str, agent_id: str) -> str:
+    return f"eda_rows_{identifier}_{agent_id}"
+
+def _find_timestamp_col(df: pd.DataFrame, state: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Pick the column used for watermarking, preferring the one recorded in state."""
+    if state and state.get("timestamp_col") in df.columns:
+        return state["timestamp_col"]
+    if "timestamp" in df.columns:
+        return "timestamp"
+    return next((col for col in df.columns if "time" in str(col).lower()), None)
+
+def filter_processed_rows(
+    df: pd.DataFrame,
+    raw_data: list,
+    identifier: str,
+    state: Optional[Dict[str, Any]],
+    config: Dict[str, Any],
+    agent_id: str
+) -> Tuple[pd.DataFrame, List[str], Optional[str]]:
+    """
+    Drop rows that were already processed for this identifier.
+
+    Returns:
+        tuple: The new rows, their content hashes, and the timestamp column used.
+    """
+    strategy = config.get("incremental_strategy", "hash")
+    timestamp_col = _find_timestamp_col(df, state)
+    if strategy == "watermark" and timestamp_col is None:
+        logger.warning(f"Agent {agent_id}: No timestamp column for watermarking {identifier}; using row hashes")
+        strategy = "hash"
+
+    row_hashes, seen = [], None
+    if strategy == "hash":
+        row_hashes = [hash_row(row) for row in raw_data]
+        seen = cache_filter_new_members(_processed_rows_key(identifier, agent_id), row_hashes)
+        # Repeated rows within one batch are new only once
+        first_seen = set()
+        for i, row_hash in enumerate(row_hashes):
+            seen[i] = seen[i] and row_hash not in first_seen
+            first_seen.add(row_hash)
+    mask = select_new_rows(
+        df,
+        strategy,
+        watermark=(state or {}).get("watermark"),
+        timestamp_col=timestamp_col,
+        seen=seen
+    )
+    new_hashes = [row_hash for row_hash, is_new in zip(row_hashes, mask.tolist()) if is_new]
+    logger.info(f"Agent {agent_id}: {int(mask.sum())} of {len(df)} rows are new for {identifier}")
+    return df[mask].reset_index(drop=True), new_hashes, timestamp_col
+
+def save_incremental_state(
+    identifier: str,
+    agent_id: str,
+    state: Dict[str, Any],
+    row_hashes: List[str],
+    config: Dict[str, Any]
+) -> None:
+    """Persist the incremental state and mark the processed rows as seen."""
+    ttl = config.get("incremental_state_ttl", 30 * 86400)
+    cache_set(_incremental_state_key(identifier, agent_id), state, ttl=ttl)
+    cache_add_members(_processed_rows_key(identifier, agent_id), row_hashes, ttl=ttl)
+
+# Helper function to launch background AI insights for a processed dataset
+def start_ai_insights(
+    df: pd.DataFrame,
+    numeric_cols: list,
+    identifier: str,
+    agent_id: str,
+    source_agent: Optional[str] = None
+) -> Dict[str, Any]:
+    """Schedule AI insights from summary statistics and publish them once ready."""
+    summary = summarize_for_insights(df, numeric_cols)
+    handle = generate_insights_handle(identifier, summary)
+    ai_prompt = (
+        f"Analyze this network data for trends and anomalies from agent {agent_id}. "
+        "Summary statistics per column"
+    )
+
+    async def publish(status: Dict[str, Any]) -> None:
+        await AgentEventEmitter.emit(
+            "ai_insights_ready",
+            {**status, "identifier": identifier, "agent_id": agent_id},
+            target=source_agent
+        )
+
+    try:
+        return schedule_ai_insights(handle, summary, ai_prompt, on_complete=publish)
+    except Exception as e:
+        logger.warning(f"Agent {agent_id}: Could not schedule AI insights for {identifier}: {e}")
+        return {"handle": handle, "status": "failed", "message": str(e)}
 
 # Configuration validation
 def validate_config(config: Dict[str, Any]) -> Dict[str, Any]:
@@ -98,8 +282,25 @@ def validate_config(config: Dict[str, Any]) -> Dict[str, Any]:
         "outlier_threshold": 2.0,
         "clustering_method": "kmeans",
         "clustering_params": {"n_clusters": 3},
-        "batch_size": 1000,
+        "batch_size": 1000,  # Also the chunk size for content-addressed chunk profiles
+        "chunk_cache_ttl": 86400,
         "encode_categorical": True,
+        "max_one_hot_categories": 20,  # Cap on one-hot columns per categorical field
+        "categorical_encoding": "top_k",  # 'top_k' (+ "other") or 'hash' for wide categoricals
+        "hash_buckets": 16,
+        "optimize_dtypes": True,  # Downcast numerics and use pandas categories on ingest
+        "ai_insights": True,  # Generate AI insights in the background after preprocessing
+        "incremental": False,  # Only process rows not seen before for this identifier
+        "incremental_strategy": "hash",  # 'hash' (row content) or 'watermark' (timestamp)
+        "kpi_state": True,  # Fold ingested rows into the persisted incremental KPI state
+        "kpi_window": 100,  # Recent samples used for KPI min/max/trend
+        "kpi_bucket_seconds": 300,  # Time bucket width behind the 15m/1h/24h KPI windows
+        "kpi_alerts": {},  # Overrides for streaming alert rules (hysteresis, min samples, static bounds)
+        "fleet_sketches": True,  # Fold raw values into the fleet-wide hourly quantile sketches
+        "online_detection": True,  # Score every sample with the streaming detector as it arrives
+        "online_detection_config": {},  # Overrides for the streaming detector (thresholds, half-life, warmup)
+        "change_points": True,  # Track level shifts online (CUSUM) and store when they started
+        "cusum_config": {},  # Overrides for the online CUSUM detector (drift, threshold, warmup)
         "agent_priority": "normal"  # For multi-agent scheduling
     }
     config = {**default_config, **(config or {})}
@@ -107,6 +308,12 @@ def validate_config(config: Dict[str, Any]) -> Dict[str, Any]:
     if config["impute_method"] not in ["mean", "median"]:
         logger.warning(f"Unsupported impute method: {config['impute_method']}. Using 'mean'.")
         config["impute_method"] = "mean"
+    if config["categorical_encoding"] not in ["top_k", "hash"]:
+        logger.warning(f"Unsupported categorical encoding: {config['categorical_encoding']}. Using 'top_k'.")
+        config["categorical_encoding"] = "top_k"
+    if config["incremental_strategy"] not in ["hash", "watermark"]:
+        logger.warning(f"Unsupported incremental strategy: {config['incremental_strategy']}. Using 'hash'.")
+        config["incremental_strategy"] = "hash"
     if config["clustering_method"] not in ["kmeans", "dbscan"]:
         logger.warning(f"Unsupported clustering method: {config['clustering_method']}. Using 'kmeans'.")
         config["clustering_method"] = "kmeans"
@@ -125,12 +332,19 @@ async def preprocess_data(
     try:
         # Validate and prepare config
         config = validate_config(config)
-        cache_key = generate_cache_key(identifier, config, agent_id)
-        
-        # Check cache first
-        cached = cache_get(cache_key)
+        if isinstance(raw_data, pd.DataFrame):
+            # Connectors return DataFrames; hashing and chunking work on records
+            raw_data = raw_data.to_dict(orient="records")
+        content_hash, chunk_hashes = hash_records(raw_data, chunk_size=config["batch_size"])
+        cache_key = generate_cache_key(identifier, config, agent_id, content_hash)
+        incremental = config.get("incremental")
+        state = cache_get(_incremental_state_key(identifier, agent_id)) if incremental else None
+
+        # Check cache first (incremental runs rely on row-level deduplication instead)
+        cached = None if incremental else cache_get(cache_key)
         if cached:
             logger.info(f"Agent {agent_id} returning cached result for {identifier}")
+            cached["cached"] = True
             await AgentEventEmitter.emit("eda_complete", cached, target=source_agent)
             return cached
 
@@ -142,11 +356,55 @@ async def preprocess_data(
             await AgentEventEmitter.emit("eda_error", result, target=source_agent)
             return result
 
-        # Infer field types and extract columns
-        field_types = infer_field_types(df)
+        # Keep only rows that have not been processed before
+        row_hashes: List[str] = []
+        watermark_col = None
+        if incremental:
+            df, row_hashes, watermark_col = filter_processed_rows(df, raw_data, identifier, state, config, agent_id)
+            if df.empty:
+                result = {
+                    "identifier": identifier,
+                    "status": "up to date",
+                    "field_types": (state or {}).get("field_types", {}),
+                    "summary": summarize_running_stats((state or {}).get("stats", {})),
+                    "new_rows": 0,
+                    "agent_id": agent_id,
+                    "source_agent": source_agent,
+                    "processed_at": datetime.utcnow().isoformat()
+                }
+                await AgentEventEmitter.emit("eda_complete", result, target=source_agent)
+                return result
+
+        # Infer field types (reusing the learned ones when the columns are already known)
+        known_types = (state or {}).get("field_types", {})
+        column_stats = None
+        if known_types and set(df.columns) <= set(known_types):
+            field_types = {col: known_types[col] for col in df.columns}
+        elif incremental:
+            field_types = infer_field_types(df)
+        else:
+            field_types, column_stats, reused_chunks = profile_chunks(
+                raw_data, chunk_hashes, config["batch_size"], ttl=config.get("chunk_cache_ttl", 86400)
+            )
+            field_types = {col: field_types.get(col, "unknown") for col in df.columns}
+            logger.debug(f"Agent {agent_id}: Reused {reused_chunks}/{len(chunk_hashes)} chunk profiles for {identifier}")
         timestamp_col = next((col for col, t in field_types.items() if t == "timestamp"), "timestamp")
         numeric_cols = [col for col, t in field_types.items() if t == "numeric"]
 
+        # Parse numeric fields that arrived as strings
+        for col in numeric_cols:
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+
+        # Shrink the frame before any further processing
+        memory_report = None
+        if config.get("optimize_dtypes"):
+            df, memory_report = optimize_dtypes(df, {"float_columns": numeric_cols})
+            logger.info(
+                f"Agent {agent_id}: Dtype optimization saved {memory_report['memory_saved_bytes']} bytes "
+                f"({memory_report['memory_saved_pct']}%) for {identifier}"
+            )
+
         if not numeric_cols:
             logger.warning(f"Agent {agent_id}: No numeric columns found for {identifier}")
             result = {
@@ -158,32 +416,70 @@ async def preprocess_data(
             await AgentEventEmitter.emit("eda_error", result, target=source_agent)
             return result
 
-        # Clean and transform data
+        # Keep untransformed numeric values (and timestamps for ordering) for insights and KPI state
+        raw_numeric = df[numeric_cols + ([timestamp_col] if timestamp_col in df.columns else [])].copy()
+        # Raw (uncleaned) statistics of the processed rows feed the schema registry on every path
+        if column_stats is None or incremental:
+            column_stats = compute_running_stats(raw_numeric, numeric_cols)
+
+        # Score samples before any batch work so action_required goes out as soon as a sample lands
+        if config.get("online_detection"):
+            try:
+                for event in score_stream(identifier, raw_numeric, numeric_cols, timestamp_col, config["online_detection_config"]):
+                    await AgentEventEmitter.emit(
+                        "action_required",
+                        {"identifier": identifier, "issues": [event], "agent_id": agent_id},
+                        target="decision_making_agent"
+                    )
+            except Exception as e:
+                logger.warning(f"Agent {agent_id}: Online anomaly scoring failed for {identifier}: {e}")
+
+        # Clean data and update running statistics
         df = clean_data(df, field_types, config)
-        df = transform_data(df, field_types, config)
+        running_stats = None
+        if incremental:
+            running_stats = merge_running_stats((state or {}).get("stats", {}), compute_running_stats(df, numeric_cols))
+
+        # Transform data, scaling incremental batches with the accumulated statistics
+        scaler_stats = summarize_running_stats(running_stats) if running_stats else None
+        df = transform_data(df, field_types, config, scaler_stats=scaler_stats)
 
         # Clustering
         features = df[numeric_cols].values
         clustering_method = config.get("clustering_method")
         clustering_params = config.get("clustering_params", {})
-        clusters = detect_clusters(features, method=clustering_method, **clustering_params)
+        cluster_state = None
+        if incremental and clustering_method == "kmeans":
+            clusters, cluster_state = update_cluster_model(
+                (state or {}).get("clusters"),
+                features,
+                n_clusters=clustering_params.get("n_clusters", 3),
+                scaler={
+                    "mean": [scaler_stats[col]["mean"] for col in numeric_cols],
+                    "std": [scaler_stats[col]["std"] or 1.0 for col in numeric_cols]
+                }
+            )
+        else:
+            clusters = detect_clusters(features, method=clustering_method, **clustering_params)
         df['cluster'] = clusters
 
-        # AI Insights
-        ai_prompt = (
-            f"Analyze this network data for trends and anomalies from agent {agent_id}. "
-            f"Summary statistics: {df[numeric_cols].describe().to_dict()}"
-        )
-        ai_insights = await get_ai_insights(df[numeric_cols].to_dict(), ai_prompt)
+        # AI Insights are generated off the critical path from compact summary statistics
+        ai_insights = {"status": "disabled"}
+        if config.get("ai_insights"):
+            ai_insights = start_ai_insights(raw_numeric, numeric_cols, identifier, agent_id, source_agent)
 
         # Prepare result with agent metadata
         result = {
             "identifier": identifier,
             "status": "success",
             "field_types": field_types,
-            "summary": df.describe().to_dict(),
+            "summary": summarize_running_stats(running_stats) if incremental else df.describe().to_dict(),
             "clusters": len(set(clusters)) - (1 if -1 in clusters else 0),
             "ai_insights": ai_insights,
+            "memory": memory_report,
+            "column_stats": summarize_running_stats(column_stats) if column_stats else None,
+            "content_hash": content_hash,
+            "new_rows": len(df),
             "agent_id": agent_id,
             "source_agent": source_agent,
             "processed_at": datetime.utcnow().isoformat()
@@ -207,6 +503,70 @@ async def preprocess_data(
                 db.add(data_entry)
             db.commit()
 
+        # Fold the new rows into the KPI state so monitoring does not rescan history. Each
+        # derived store is updated on its own, so one failure neither skips the others
+        # nor leaves the session in a failed transaction
+        if config.get("kpi_state"):
+            try:
+                _, alert_events = update_kpi_states(
+                    db, identifier, raw_numeric, numeric_cols, timestamp_col,
+                    window=config["kpi_window"], bucket_seconds=config["kpi_bucket_seconds"],
+                    alert_config=config.get("kpi_alerts")
+                )
+                # Only alert transitions are emitted; ongoing conditions stay silent. Per-column
+                # streaming transitions use their own event type: kpi_alert carries per-identifier
+                # anomaly sets from kpi_monitoring
+                for event in alert_events:
+                    await AgentEventEmitter.emit("kpi_stream_alert", {**event, "agent_id": agent_id}, target="decision_making_agent")
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Agent {agent_id}: KPI state update failed for {identifier}: {e}")
+
+            # Raw hourly rollups feed the offline hour-of-week baseline job
+            try:
+                update_hourly_rollups(db, identifier, raw_numeric, numeric_cols, timestamp_col)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Agent {agent_id}: Hourly rollup update failed for {identifier}: {e}")
+
+            # Mergeable sketches let cells be ranked against the network without a fleet scan
+            if config.get("fleet_sketches"):
+                try:
+                    update_fleet_sketches(db, identifier, raw_numeric, numeric_cols, timestamp_col)
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"Agent {agent_id}: Fleet sketch update failed for {identifier}: {e}")
+
+            if config.get("change_points"):
+                try:
+                    for change in update_cusum_states(db, identifier, raw_numeric, numeric_cols, timestamp_col, config["cusum_config"]):
+                        await AgentEventEmitter.emit("change_point_detected", {
+                            "identifier": identifier,
+                            **change,
+                            "changed_at": change["changed_at"].isoformat(),
+                            "agent_id": agent_id
+                        }, target="root_cause_analysis_agent")
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"Agent {agent_id}: Change point update failed for {identifier}: {e}")
+
+        # Record what was processed so the next incremental run only sees the delta
+        if incremental:
+            watermark = (state or {}).get("watermark")
+            if watermark_col and watermark_col in df.columns:
+                latest = pd.to_datetime(df[watermark_col], errors="coerce").max()
+                if pd.notna(latest) and (watermark is None or latest > pd.Timestamp(watermark)):
+                    watermark = latest.isoformat()
+            save_incremental_state(identifier, agent_id, {
+                "field_types": {**known_types, **field_types},
+                "timestamp_col": watermark_col,
+                "watermark": watermark,
+                "stats": running_stats,
+                "clusters": cluster_state or (state or {}).get("clusters"),
+                "rows_processed": (state or {}).get("rows_processed", 0) + len(df),
+                "updated_at": datetime.utcnow().isoformat()
+            }, row_hashes, config)
+
         # Notify downstream agents (e.g., visualization or decision-making agents)
         await AgentEventEmitter.emit("data_ready", {
             "identifier": identifier,
@@ -2,18 +2,48 @@ from sqlalchemy.orm import Session
 from models.dynamic_data import DynamicData
 from utils.stats import detect_clusters
 from utils.logger import logger
+from utils.decoders import decode_numeric_frame
+from utils.model_store import save_model, load_model, register_model_members
+from utils.issues import persist_issues
+from utils.trends import compute_trends
+from utils.cache import cache_get, cache_set
+from config.settings import settings
 from agents.eda_preprocessing import AgentEventEmitter
-from typing import Dict, List, Any, Optional
+from agents.kpi_monitoring import fetch_kpi_windows
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import time
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
+from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import StandardScaler
 
+# Model store family of the persisted anomaly models
+ANOMALY_MODEL_KIND = "isolation_forest"
+
 # Helper function to detect anomalies
-def detect_anomalies(df: pd.DataFrame, numeric_cols: List[str], contamination: float = 0.1) -> np.ndarray:
-    """Detect anomalies using Isolation Forest."""
+def detect_anomalies(
+    df: pd.DataFrame,
+    numeric_cols: List[str],
+    contamination: float = 0.1,
+    model: Optional[Any] = None,
+    metadata: Optional[Dict[str, Any]] = None
+) -> np.ndarray:
+    """
+    Detect anomalies using Isolation Forest.
+
+    With a persisted model only `decision_function` runs; without one a model
+    is fitted on the rows being scored (cold start).
+    """
     try:
+        if model is not None:
+            scores = score_anomalies(model, metadata, df)
+            if scores is not None:
+                return np.where(scores < 0, -1, 1)
         features = df[numeric_cols].values
         scaler = StandardScaler()
         scaled_features = scaler.fit_transform(features)
@@ -24,22 +54,193 @@ def detect_anomalies(df: pd.DataFrame, numeric_cols: List[str], contamination: f
         logger.error(f"Error detecting anomalies: {e}")
         return np.ones(len(df))  # Default to normal if detection fails
 
+# Helper function to mask the rows a persisted model has not been trained on
+def _unseen_rows(timestamps: pd.Series, metadata: Optional[Dict[str, Any]]) -> np.ndarray:
+    trained_until = (metadata or {}).get("trained_until")
+    if not trained_until:
+        return np.ones(len(timestamps), dtype=bool)
+    return (pd.to_datetime(timestamps) > pd.Timestamp(trained_until)).to_numpy()
+
+def score_anomalies(model: Any, metadata: Dict[str, Any], df: pd.DataFrame) -> Optional[np.ndarray]:
+    """
+    Score rows with a persisted anomaly model.
+
+    Args:
+        model: Fitted scaler + IsolationForest pipeline.
+        metadata (dict): Model metadata with the training 'columns' and 'fill_values'.
+        df (pd.DataFrame): Rows to score.
+
+    Returns:
+        np.ndarray or None: Decision scores (negative = anomalous), or None if the
+        model's features are missing from `df`.
+    """
+    columns = metadata["columns"]
+    if any(col not in df.columns for col in columns):
+        return None
+    features = df[columns].fillna(metadata["fill_values"]).to_numpy(dtype=np.float64)
+    return model.decision_function(features)
+
+def train_anomaly_model(
+    db: Session,
+    model_key: str,
+    identifiers: Optional[List[str]] = None,
+    config: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Train and persist an anomaly model on a longer history.
+
+    A model is trained per identifier by default; passing several identifiers
+    trains one shared model for a cell cluster on their common numeric columns.
+
+    Args:
+        db (Session): Database session.
+        model_key (str): Key the model is stored under (identifier or cluster name).
+        identifiers (list, optional): Identifiers whose history is used (defaults to [model_key]).
+        config (dict, optional): Training configuration (history_rows, contamination, n_estimators).
+
+    Returns:
+        dict or None: Metadata of the stored model, or None if there was not enough data.
+    """
+    config = {
+        "history_rows": settings.ANOMALY_MODEL_HISTORY_ROWS,
+        "contamination": 0.1,
+        "n_estimators": 100,
+        "min_rows": 50,
+        **(config or {})
+    }
+    identifiers = identifiers or [model_key]
+    started = time.perf_counter()
+
+    frames, trained_until = [], None
+    for identifier in identifiers:
+        data = (
+            db.query(DynamicData.timestamp, DynamicData.data)
+            .filter(DynamicData.identifier == identifier)
+            .order_by(DynamicData.timestamp.desc())
+            .limit(config["history_rows"])
+            .all()
+        )
+        if not data:
+            continue
+        df, numeric_cols = decode_numeric_frame(db, identifier, [d.data for d in data])
+        if numeric_cols:
+            frames.append(df[numeric_cols])
+            latest = max(d.timestamp for d in data)
+            trained_until = latest if trained_until is None else max(trained_until, latest)
+    if not frames:
+        logger.warning(f"No training data for anomaly model {model_key}")
+        return None
+
+    columns = sorted(set.intersection(*(set(frame.columns) for frame in frames)))
+    history = pd.concat([frame[columns] for frame in frames], ignore_index=True).dropna(how="all")
+    if not columns or len(history) < config["min_rows"]:
+        logger.warning(f"Not enough history to train anomaly model {model_key}: {len(history)} rows")
+        return None
+
+    fill_values = history.median().fillna(0.0)
+    model = make_pipeline(
+        StandardScaler(),
+        IsolationForest(n_estimators=config["n_estimators"], contamination=config["contamination"], random_state=42)
+    )
+    model.fit(history.fillna(fill_values).to_numpy(dtype=np.float64))
+
+    metadata = {
+        "identifiers": identifiers,
+        "columns": columns,
+        "fill_values": {col: float(value) for col, value in fill_values.items()},
+        "contamination": config["contamination"],
+        "rows": len(history),
+        "trained_until": trained_until.isoformat() if trained_until else None,
+        "train_seconds": round(time.perf_counter() - started, 3)
+    }
+    metadata["version"] = save_model(ANOMALY_MODEL_KIND, model_key, model, metadata)
+    return metadata
+
+# Helper function to queue background training for a key without a model, at most once per hour
+def _request_training(model_key: str, members: Optional[List[str]] = None) -> None:
+    if cache_get(f"anomaly_training_{model_key}"):
+        return
+    try:
+        from tasks.celery_config import celery_app
+        if members:
+            # A cluster key matches no rows of its own; its model pools the members' history
+            celery_app.send_task(
+                "tasks.training.train_cluster_anomaly_model", args=[model_key, members], queue="training"
+            )
+        else:
+            celery_app.send_task("tasks.training.train_anomaly_model_batch", args=[[model_key]], queue="training")
+        cache_set(f"anomaly_training_{model_key}", True, ttl=3600)
+    except Exception as e:
+        logger.warning(f"Could not queue anomaly model training for {model_key}: {e}")
+
+def load_anomaly_model(
+    identifier: str,
+    config: Optional[Dict[str, Any]] = None,
+    members: Optional[List[str]] = None
+) -> Optional[Tuple[Any, Dict[str, Any]]]:
+    """
+    Return the persisted anomaly model for an identifier, queueing training if none exists.
+
+    When a shared cluster model is selected, the identifiers scored with it
+    are recorded in the model store, so a cold start trains the cluster
+    model on its members and the periodic retrain keeps refreshing it.
+
+    Args:
+        identifier (str): Unique identifier for the data.
+        config (dict, optional): Detection configuration; 'model_key' selects a shared cluster model.
+        members (list, optional): All identifiers scored with the cluster model (defaults to [identifier]).
+
+    Returns:
+        tuple or None: (model, metadata), or None while no model has been trained.
+    """
+    model_key = (config or {}).get("model_key") or identifier
+    cluster_members = None
+    if model_key != identifier:
+        cluster_members = register_model_members(ANOMALY_MODEL_KIND, model_key, members or [identifier])
+    loaded = load_model(ANOMALY_MODEL_KIND, model_key)
+    if loaded is None:
+        _request_training(model_key, cluster_members)
+    return loaded
+
 # Helper function to analyze trends
-def detect_trends(df: pd.DataFrame, numeric_cols: List[str], window: int = 10) -> List[Dict[str, Any]]:
-    """Detect trends in numeric columns."""
+def detect_trends(
+    df: pd.DataFrame,
+    numeric_cols: List[str],
+    window: int = 10,
+    alpha: float = 0.05,
+    significance: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Detect trends in all numeric columns at once (rows must be in time order).
+
+    Uses the rolling-mean rule by default, or the Mann-Kendall test and
+    Theil-Sen slope when `significance` is on.
+    """
+    if not numeric_cols or len(df) < 2:
+        return []
+    result = compute_trends(df[numeric_cols].to_numpy(dtype=np.float64), window, alpha, significance)
     trends = []
-    for col in numeric_cols:
-        try:
-            rolling_mean = df[col].rolling(window=window, min_periods=1).mean()
-            diff = rolling_mean.diff()
-            if diff.iloc[-1] > 0 and (diff > 0).sum() > window * 0.7:
-                trends.append({"column": col, "trend": "increasing", "magnitude": diff.iloc[-1]})
-            elif diff.iloc[-1] < 0 and (diff < 0).sum() > window * 0.7:
-                trends.append({"column": col, "trend": "decreasing", "magnitude": diff.iloc[-1]})
-        except Exception as e:
-            logger.warning(f"Error detecting trend in {col}: {e}")
+    for j, col in enumerate(numeric_cols):
+        if result["direction"][j] == 0:
+            continue
+        trend = {
+            "column": col,
+            "trend": "increasing" if result["direction"][j] > 0 else "decreasing",
+            "magnitude": float(result["magnitude"][j]),
+            "slope": float(result["slope"][j])
+        }
+        if significance:
+            trend["p_value"] = float(result["p_value"][j])
+            trend["tau"] = float(result["tau"][j])
+        trends.append(trend)
     return trends
 
+# Helper function to grade a trend: Kendall's tau for tested trends, the latest step otherwise
+def _trend_severity(trend: Dict[str, Any]) -> str:
+    if "tau" in trend:
+        return "medium" if abs(trend["tau"]) >= 0.5 else "low"
+    return "low" if abs(trend["magnitude"]) < 1 else "medium"
+
 # Main issue detection function
 async def detect_issues(
     db: Session,
@@ -62,12 +263,17 @@ async def detect_issues(
         dict: Detected issues and metadata.
     """
     logger.info(f"Agent {agent_id}: Detecting issues for {identifier}")
-    config = config or {
+    default_config = {
         "max_rows": 100,
-        "contamination": 0.1,  # For anomaly detection
+        "contamination": 0.1,  # For anomaly detection (cold start only; persisted models keep theirs)
+        "model_key": None,  # Shared cluster model to score with (defaults to the identifier's own)
         "trend_window": 10,
-        "cluster_threshold": 2  # Min number of clusters to flag an issue
+        "trend_significance": False,  # Mann-Kendall / Theil-Sen instead of the rolling-mean rule
+        "trend_alpha": 0.05,  # Significance level of the trend test
+        "cluster_threshold": 2,  # Min number of clusters to flag an issue
+        "persist": True  # Upsert issues into the Issue table and resolve the ones that cleared
     }
+    config = {**default_config, **(config or {})}
 
     try:
         # Fetch recent data from the database
@@ -77,23 +283,21 @@ async def detect_issues(
             .order_by(DynamicData.timestamp.desc())
             .limit(config["max_rows"])
             .all()
-        )
+        )[::-1]  # Latest rows, in time order for trend detection
         if not data:
             logger.warning(f"Agent {agent_id}: No data found for {identifier}")
             result = {"identifier": identifier, "issues": [], "status": "no data", "agent_id": agent_id}
             await AgentEventEmitter.emit("issues_detected", result, target=source_agent)
             return result
 
-        # Convert to DataFrame
-        df = pd.DataFrame([d.data for d in data])
+        # Decode rows into numeric columns using the learned schema
+        df, numeric_cols = decode_numeric_frame(db, identifier, [d.data for d in data])
         if df.empty:
             logger.warning(f"Agent {agent_id}: Empty dataframe for {identifier}")
             result = {"identifier": identifier, "issues": [], "status": "empty data", "agent_id": agent_id}
             await AgentEventEmitter.emit("issues_detected", result, target=source_agent)
             return result
 
-        # Identify numeric columns
-        numeric_cols = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
         if not numeric_cols:
             logger.info(f"Agent {agent_id}: No numeric columns found for {identifier}")
             result = {"identifier": identifier, "issues": [], "status": "no numeric data", "agent_id": agent_id}
@@ -105,30 +309,46 @@ async def detect_issues(
 
         # 1. Cluster-based issue detection
         features = df[numeric_cols].values
-        clusters = detect_clusters(features, method="dbscan", eps=0.5, min_samples=3)
+        clusters = detect_clusters(features, method="dbscan", config={"eps": 0.5, "min_samples": 3})
         n_clusters = len(set(clusters)) - (1 if -1 in clusters else 0)  # Exclude noise (-1)
         if n_clusters >= config["cluster_threshold"]:
             issues.append({
+                "type": "clusters",
+                "column": None,
                 "description": f"Detected {n_clusters} distinct clusters indicating potential performance degradation",
                 "severity": "medium",
                 "details": {"n_clusters": n_clusters}
             })
 
-        # 2. Anomaly detection
-        anomaly_predictions = detect_anomalies(df, numeric_cols, config["contamination"])
-        anomaly_count = (anomaly_predictions == -1).sum()
+        # 2. Anomaly detection (inference only when a persisted model exists)
+        model, metadata = load_anomaly_model(identifier, config) or (None, None)
+        scored = df
+        if model is not None:
+            # Rows the model was trained on score as normal by construction, so only newer rows are scored
+            scored = df[_unseen_rows(pd.Series([d.timestamp for d in data], index=df.index), metadata)]
+        anomaly_count = 0
+        if not scored.empty:
+            anomaly_predictions = detect_anomalies(scored, numeric_cols, config["contamination"], model, metadata)
+            anomaly_count = int((anomaly_predictions == -1).sum())
         if anomaly_count > 0:
             issues.append({
+                "type": "anomaly",
+                "column": None,
                 "description": f"Detected {anomaly_count} anomalies in numeric data",
-                "severity": "high" if anomaly_count > len(df) * 0.2 else "medium",
-                "details": {"anomaly_indices": np.where(anomaly_predictions == -1)[0].tolist()}
+                "severity": "high" if anomaly_count > len(scored) * 0.2 else "medium",
+                "details": {
+                    "anomaly_indices": [int(index) for index in scored.index[anomaly_predictions == -1]],
+                    "model_version": metadata["version"] if metadata else None
+                }
             })
 
         # 3. Trend detection
-        trends = detect_trends(df, numeric_cols, config["trend_window"])
+        trends = detect_trends(df, numeric_cols, config["trend_window"], config["trend_alpha"], config["trend_significance"])
         for trend in trends:
-            severity = "low" if abs(trend["magnitude"]) < 1 else "medium"
+            severity = _trend_severity(trend)
             issues.append({
+                "type": "trend",
+                "column": trend["column"],
                 "description": f"Trend detected in {trend['column']}: {trend['trend']} (magnitude: {trend['magnitude']:.2f})",
                 "severity": severity,
                 "details": trend
@@ -144,12 +364,23 @@ async def detect_issues(
             "timestamp": datetime.utcnow().isoformat(),
             "data_summary": {
                 "rows_analyzed": len(df),
+                "rows_scored": len(scored),
                 "numeric_columns": numeric_cols,
                 "cluster_count": n_clusters,
-                "anomaly_count": anomaly_count
+                "anomaly_count": anomaly_count,
+                "anomaly_model": {"version": metadata["version"], "trained_at": metadata["saved_at"]} if metadata else None
             }
         }
 
+        # Persist with fingerprints so dashboards read history instead of recomputing
+        if config["persist"]:
+            try:
+                evaluated = {"clusters", "trend"} | ({"anomaly"} if not scored.empty else set())
+                result["lifecycle"] = persist_issues(db, {identifier: issues}, agent_id, evaluated={identifier: evaluated})
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Agent {agent_id}: Could not persist issues for {identifier}: {e}")
+
         # Emit event to notify other agents
         await AgentEventEmitter.emit("issues_detected", result, target=source_agent)
         
@@ -181,6 +412,274 @@ async def detect_issues(
         await AgentEventEmitter.emit("issue_detection_error", error_result, target=source_agent)
         return error_result
 
+# Severity weights used to rank identifiers in fleet sweeps
+SEVERITY_WEIGHTS = {"low": 1, "medium": 2, "high": 3, "critical": 4}
+
+def detect_trends_batch(
+    long_df: pd.DataFrame,
+    window: int = 10,
+    alpha: float = 0.05,
+    significance: bool = False,
+    max_block: int = 2_000_000
+) -> pd.DataFrame:
+    """
+    Detect trends for every (identifier, column) pair in one vectorized pass.
+
+    The windows are stacked into a single (samples, identifier x column) array,
+    right-aligned so the latest sample of every series is the last row and
+    shorter series are NaN-padded at the start. With `significance`, the
+    pairwise Mann-Kendall statistics are computed over column blocks of at most
+    `max_block` pair differences to bound memory.
+
+    Args:
+        long_df (pd.DataFrame): Long-format frame with identifier, timestamp, kpi, value.
+        window (int): Rolling window size.
+        alpha (float): Significance level of the Mann-Kendall test.
+        significance (bool): Use the Mann-Kendall test instead of the rolling-mean rule.
+        max_block (int): Maximum pair differences held in memory at once.
+
+    Returns:
+        pd.DataFrame: One row per trending pair with identifier, column, trend, magnitude and slope
+        (plus p_value and tau with significance).
+    """
+    columns = ["identifier", "column", "trend", "magnitude", "slope"] + (["p_value", "tau"] if significance else [])
+    if long_df.empty:
+        return pd.DataFrame(columns=columns)
+    wide = long_df.pivot_table(index=["identifier", "timestamp"], columns="kpi", values="value").sort_index()
+    # Row offset from each identifier's latest sample (0 = latest) aligns all windows on their end
+    lag = wide.groupby(level=0).cumcount(ascending=False).to_numpy()
+    wide.index = pd.MultiIndex.from_arrays([wide.index.get_level_values(0), -lag], names=["identifier", "lag"])
+    stacked = wide.unstack(level=0).sort_index().dropna(axis=1, how="all")
+    if len(stacked) < 2 or stacked.empty:
+        return pd.DataFrame(columns=columns)
+
+    X = stacked.to_numpy(dtype=np.float64)
+    points = min(len(X), 500)
+    step = max(1, max_block // max(points * (points - 1) // 2, 1)) if significance else X.shape[1]
+    blocks = [compute_trends(X[:, i:i + step], window, alpha, significance) for i in range(0, X.shape[1], step)]
+    result = {key: np.concatenate([block[key] for block in blocks]) for key in blocks[0]}
+
+    trending = np.flatnonzero(result["direction"] != 0)
+    pairs = stacked.columns[trending]
+    trends = pd.DataFrame({
+        "identifier": pairs.get_level_values("identifier"),
+        "column": pairs.get_level_values("kpi"),
+        "trend": np.where(result["direction"][trending] > 0, "increasing", "decreasing"),
+        "magnitude": result["magnitude"][trending],
+        "slope": result["slope"][trending]
+    })
+    if significance:
+        trends["p_value"] = result["p_value"][trending]
+        trends["tau"] = result["tau"][trending]
+    return trends[columns]
+
+# Helper function to count DBSCAN clusters for a chunk of identifiers (runs in worker processes)
+def _count_clusters(feature_sets: List[np.ndarray]) -> List[int]:
+    counts = []
+    for features in feature_sets:
+        labels = detect_clusters(features, method="dbscan", config={"eps": 0.5, "min_samples": 3})
+        counts.append(len(set(labels)) - (1 if -1 in labels else 0))
+    return counts
+
+# Long-lived process pool for clustering, created on first use and reused across requests
+_cluster_pool: Optional[ProcessPoolExecutor] = None
+_cluster_pool_workers = 0
+
+# Helper function to return the shared clustering pool, resizing it if a different worker count is requested
+def _get_cluster_pool(workers: int) -> ProcessPoolExecutor:
+    global _cluster_pool, _cluster_pool_workers
+    if _cluster_pool is None or _cluster_pool_workers != workers:
+        if _cluster_pool is not None:
+            _cluster_pool.shutdown(wait=False)
+        _cluster_pool = ProcessPoolExecutor(max_workers=workers)
+        _cluster_pool_workers = workers
+    return _cluster_pool
+
+def shutdown_cluster_pool() -> None:
+    """Stop the shared clustering pool (called on application shutdown)."""
+    global _cluster_pool
+    if _cluster_pool is not None:
+        _cluster_pool.shutdown(wait=True)
+        _cluster_pool = None
+
+async def _count_clusters_parallel(feature_sets: List[np.ndarray], workers: int) -> List[int]:
+    """Count clusters per identifier over the shared process pool, inline for small sweeps or when forking is unavailable."""
+    global _cluster_pool
+    if workers <= 1 or len(feature_sets) < 2 * workers:
+        return _count_clusters(feature_sets)
+    size = -(-len(feature_sets) // (workers * 4))
+    chunks = [feature_sets[i:i + size] for i in range(0, len(feature_sets), size)]
+    try:
+        loop = asyncio.get_running_loop()
+        pool = _get_cluster_pool(workers)
+        results = await asyncio.gather(*(loop.run_in_executor(pool, _count_clusters, chunk) for chunk in chunks))
+        return [count for chunk in results for count in chunk]
+    except BrokenProcessPool as e:
+        # A worker died; drop the pool so the next request starts a fresh one
+        logger.warning(f"Clustering pool broken ({e}); clustering inline")
+        _cluster_pool = None
+        return _count_clusters(feature_sets)
+    except (AssertionError, OSError) as e:
+        # Daemonic processes (e.g. Celery prefork workers) cannot start a pool
+        logger.warning(f"Process pool unavailable ({e}); clustering inline")
+        return _count_clusters(feature_sets)
+
+async def detect_issues_batch(
+    db: Session,
+    identifiers: List[str],
+    config: Dict[str, Any] = None,
+    agent_id: str = "issue_detection_agent_1",
+    source_agent: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Detect issues for many identifiers and rank the problem cells.
+
+    Windows are loaded with one query, trends are computed for all pairs in one
+    grouped pass, anomalies are scored with the persisted models (rows of
+    identifiers sharing a cluster model are scored in one call), and DBSCAN
+    runs over a process pool.
+
+    Args:
+        db (Session): Database session.
+        identifiers (list): Identifiers to analyze.
+        config (dict, optional): Detection configuration; 'model_keys' maps identifiers to shared cluster models.
+        agent_id (str): Identifier for this issue detection agent.
+        source_agent (str, optional): Agent that triggered this detection.
+
+    Returns:
+        dict: Problem cells ranked by severity score, with their issues.
+    """
+    config = {
+        "max_rows": 100,
+        "trend_window": 10,
+        "trend_significance": False,
+        "trend_alpha": 0.05,
+        "cluster_threshold": 2,
+        "model_keys": {},
+        "workers": 4,
+        "persist": True,
+        **(config or {})
+    }
+    logger.info(f"Agent {agent_id}: Detecting issues for {len(identifiers)} identifiers")
+
+    try:
+        long_df = fetch_kpi_windows(db, identifiers, config["max_rows"])
+        issues: Dict[str, List[Dict[str, Any]]] = {identifier: [] for identifier in identifiers}
+        if long_df.empty:
+            return {"status": "no data", "identifiers": len(identifiers), "ranked": [], "agent_id": agent_id}
+        wide = long_df.pivot_table(index=["identifier", "timestamp"], columns="kpi", values="value").sort_index()
+        frames = {identifier: frame.droplevel(0) for identifier, frame in wide.groupby(level=0)}
+
+        # Issue types whose detector ran per identifier; only those can be auto-resolved
+        evaluated: Dict[str, set] = {identifier: {"trend"} for identifier in frames}
+
+        # 1. Trends for all identifiers and columns at once
+        trends = detect_trends_batch(long_df, config["trend_window"], config["trend_alpha"], config["trend_significance"])
+        for trend in trends.to_dict(orient="records"):
+            identifier = trend.pop("identifier")
+            issues[identifier].append({
+                "type": "trend",
+                "column": trend["column"],
+                "description": f"Trend detected in {trend['column']}: {trend['trend']} (magnitude: {trend['magnitude']:.2f})",
+                "severity": _trend_severity(trend),
+                "details": trend
+            })
+
+        # 2. Anomalies with shared pre-trained models; identifiers of one model are scored together
+        by_model: Dict[str, List[str]] = {}
+        for identifier in frames:
+            by_model.setdefault(config["model_keys"].get(identifier) or identifier, []).append(identifier)
+        anomaly_counts: Dict[str, int] = {}
+        for model_key, members in by_model.items():
+            loaded = load_anomaly_model(members[0], {"model_key": model_key}, members=members)
+            if loaded is None:
+                continue
+            model, metadata = loaded
+            unseen = {identifier: frames[identifier][_unseen_rows(frames[identifier].index.to_series(), metadata)] for identifier in members}
+            unseen = {identifier: frame for identifier, frame in unseen.items() if not frame.empty}
+            if not unseen:
+                continue
+            stacked = pd.concat(list(unseen.values()), keys=list(unseen))
+            scores = score_anomalies(model, metadata, stacked)
+            if scores is None:
+                continue
+            flagged = pd.Series(scores < 0, index=stacked.index).groupby(level=0).agg(["sum", "size"])
+            for identifier, row in flagged.iterrows():
+                evaluated[identifier].add("anomaly")
+                anomaly_counts[identifier] = int(row["sum"])
+                if row["sum"] > 0:
+                    issues[identifier].append({
+                        "type": "anomaly",
+                        "column": None,
+                        "description": f"Detected {int(row['sum'])} anomalies in numeric data",
+                        "severity": "high" if row["sum"] > row["size"] * 0.2 else "medium",
+                        "details": {"anomaly_count": int(row["sum"]), "model_version": metadata["version"]}
+                    })
+
+        # 3. Per-identifier clustering over the process pool
+        clustered = [identifier for identifier, frame in frames.items() if len(frame) >= 3]
+        feature_sets = [frames[identifier].dropna(axis=1, how="all").fillna(0.0).to_numpy() for identifier in clustered]
+        for identifier, n_clusters in zip(clustered, await _count_clusters_parallel(feature_sets, config["workers"])):
+            evaluated[identifier].add("clusters")
+            if n_clusters >= config["cluster_threshold"]:
+                issues[identifier].append({
+                    "type": "clusters",
+                    "column": None,
+                    "description": f"Detected {n_clusters} distinct clusters indicating potential performance degradation",
+                    "severity": "medium",
+                    "details": {"n_clusters": n_clusters}
+                })
+
+        ranked = sorted(
+            (
+                {
+                    "identifier": identifier,
+                    "score": sum(SEVERITY_WEIGHTS.get(issue["severity"], 1) for issue in cell_issues),
+                    "anomaly_count": anomaly_counts.get(identifier, 0),
+                    "issues": cell_issues
+                }
+                for identifier, cell_issues in issues.items() if cell_issues
+            ),
+            key=lambda cell: (cell["score"], cell["anomaly_count"]),
+            reverse=True
+        )
+        lifecycle = None
+        if config["persist"]:
+            try:
+                lifecycle = persist_issues(
+                    db, {identifier: issues[identifier] for identifier in frames}, agent_id, evaluated=evaluated
+                )
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Agent {agent_id}: Could not persist fleet issues: {e}")
+        for cell in ranked:
+            await AgentEventEmitter.emit(
+                "action_required",
+                {"identifier": cell["identifier"], "issues": cell["issues"], "agent_id": agent_id},
+                target="decision_making_agent"
+            )
+        result = {
+            "status": "success",
+            "identifiers": len(identifiers),
+            "analyzed": len(frames),
+            "ranked": ranked,
+            "lifecycle": lifecycle,
+            "agent_id": agent_id,
+            "source_agent": source_agent,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        await AgentEventEmitter.emit("fleet_issues_detected", {
+            "identifiers": len(identifiers),
+            "problem_cells": [cell["identifier"] for cell in ranked],
+            "agent_id": agent_id
+        }, target=source_agent)
+        logger.info(f"Agent {agent_id}: {len(ranked)} of {len(identifiers)} identifiers have issues")
+        return result
+
+    except Exception as e:
+        logger.error(f"Agent {agent_id}: Error detecting issues for {len(identifiers)} identifiers: {e}")
+        return {"status": "error", "message": str(e), "identifiers": len(identifiers), "agent_id": agent_id}
+
 # Listener for multi-agent integration
 async def listen_for_data_ready(agent_id: str):
     """Listen for data readiness events from upstream agents."""
@@ -1,22 +1,59 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from models.dynamic_data import DynamicData
 from utils.logger import logger
+from utils.decoders import decode_numeric_frame, get_row_decoders_bulk
+from utils.kpi import load_kpis, load_kpis_bulk, parse_window
+from utils.cache import cache_get, cache_get_many, cache_set, cache_set_many
+from utils.baselines import load_baselines, load_baselines_bulk, load_latest_rollups, seasonal_band
 from agents.eda_preprocessing import AgentEventEmitter
 from typing import Dict, List, Any, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
+import hashlib
+import json
 from scipy import stats
 
 # Helper function to calculate KPIs
-def calculate_kpis(df: pd.DataFrame, numeric_cols: List[str]) -> Dict[str, Dict[str, float]]:
-    """Calculate basic KPIs for numeric columns."""
+def calculate_kpis(
+    df: pd.DataFrame,
+    numeric_cols: List[str],
+    timestamps: Optional[pd.Series] = None
+) -> Dict[str, Dict[str, float]]:
+    """
+    Calculate basic KPIs for numeric columns.
+
+    Rows are expected in ascending time order. With `timestamps`, rows are
+    sorted by time and the trend is the least-squares slope per hour against
+    the real sample times, so irregular sampling does not distort it;
+    otherwise it is the change per data point. 'trend_unit' records which,
+    and 'trend_span' (hours) and 'trend_points' qualify the fitted slope.
+    """
+    hours = None
+    if timestamps is not None:
+        timestamps = pd.to_datetime(pd.Series(timestamps, index=df.index), errors="coerce")
+        order = timestamps.sort_values(kind="stable").index
+        df, timestamps = df.loc[order], timestamps.loc[order]
+        hours = (timestamps - timestamps.min()).dt.total_seconds() / 3600
+
     kpis = {}
     for col in numeric_cols:
         try:
             series = df[col].dropna()
             if len(series) < 5:  # Minimum data points for meaningful stats
                 continue
+            trend_span = None
+            if hours is not None and hours.loc[series.index].nunique() > 1:
+                trend = float(np.polyfit(hours.loc[series.index].to_numpy(), series.to_numpy(dtype=np.float64), 1)[0])
+                trend_unit = "hour"
+                trend_span = float(np.sqrt(12 * hours.loc[series.index].var(ddof=0)))
+            else:
+                trend = (series.iloc[-1] - series.iloc[0]) / len(series) if len(series) > 1 else 0
+                trend_unit = "sample"
+            timing = {}
+            if hours is not None and hours.loc[series.index].notna().any():
+                timing = {"recent_at": timestamps.loc[series.index].max().isoformat()}
             kpis[col] = {
                 "mean": series.mean(),
                 "std": series.std(),
@@ -24,12 +61,61 @@ def calculate_kpis(df: pd.DataFrame, numeric_cols: List[str]) -> Dict[str, Dict[
                 "max": series.max(),
                 "skew": stats.skew(series),
                 "recent_value": series.iloc[-1],
-                "trend": (series.iloc[-1] - series.iloc[0]) / len(series) if len(series) > 1 else 0
+                "trend": trend,
+                "trend_unit": trend_unit,
+                "trend_span": trend_span,
+                "trend_points": len(series),
+                **timing
             }
         except Exception as e:
             logger.warning(f"Error calculating KPIs for {col}: {e}")
     return kpis
 
+# Helper function to pick the KPIs of the evaluation window from a precomputed snapshot
+def select_window_kpis(
+    kpis: Dict[str, Dict[str, Any]],
+    window: Optional[str],
+    min_points: int = 5,
+    trend_window: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Use the time-window statistics when available, keeping all windows for reporting.
+
+    A short evaluation window holds too few samples for a stable slope, so
+    the trend fields (and the std it is scaled by) come from `trend_window`
+    when that window has statistics.
+    """
+    selected = {}
+    for col, kpi in kpis.items():
+        windows = kpi.get("windows") or {}
+        windowed = windows.get(window) if window else None
+        if windowed and windowed["count"] >= min_points:
+            # The window ends at its newest sample, which dates the recent value
+            selected[col] = {**windowed, "windows": kpi["windows"], "recent_at": windowed.get("end") or kpi.get("recent_at")}
+        elif kpi.get("count", 0) >= min_points:
+            selected[col] = dict(kpi)
+        else:
+            continue
+        trended = windows.get(trend_window) if trend_window else None
+        if trended:
+            selected[col].update({
+                "trend": trended["trend"],
+                "trend_unit": trended["trend_unit"],
+                "trend_span": trended.get("trend_span"),
+                "trend_points": trended["count"],
+                "trend_std": trended["std"],
+                "trend_window": trend_window
+            })
+    return selected
+
+# Helper function to express a KPI's slope as its change over the fitted span in standard deviations
+def trend_score(kpi: Dict[str, Any]) -> float:
+    """Return |trend| * span / std, which does not depend on the KPI's units or sampling rate."""
+    std = kpi.get("trend_std", kpi["std"])
+    if kpi.get("trend_unit", "hour") != "hour" or not kpi.get("trend_span") or not std or std <= 0:
+        return 0.0
+    return float(abs(kpi["trend"]) * kpi["trend_span"] / std)
+
 # Helper function to detect KPI anomalies
 def detect_kpi_anomalies(
     df: pd.DataFrame,
@@ -44,28 +130,48 @@ def detect_kpi_anomalies(
             # High standard deviation relative to mean
             if kpi["std"] > kpi["mean"] * thresholds["std_to_mean_ratio"]:
                 anomalies[col].append({
+                    "type": "variability",
                     "description": f"High variability (std: {kpi['std']:.2f}, mean: {kpi['mean']:.2f})",
                     "severity": "medium"
                 })
 
-            # Extreme recent value (Z-score based)
+            # Hourly level: the baseline is built from hourly means, so the latest hourly mean is compared
+            seasonal = kpi.get("seasonal")
+            if seasonal:
+                seasonal_z = (seasonal["value"] - seasonal["expected"]) / seasonal["scale"]
+                if abs(seasonal_z) > thresholds["z_score_threshold"]:
+                    anomalies[col].append({
+                        "type": "seasonal",
+                        "description": (
+                            f"Hourly mean outside seasonal baseline (value: {seasonal['value']:.2f}, "
+                            f"expected: {seasonal['expected']:.2f}, robust Z-score: {seasonal_z:.2f})"
+                        ),
+                        "severity": "high" if abs(seasonal_z) > 4 else "medium"
+                    })
+
+            # Extreme recent value against the evaluation window
             z_score = (kpi["recent_value"] - kpi["mean"]) / kpi["std"] if kpi["std"] > 0 else 0
             if abs(z_score) > thresholds["z_score_threshold"]:
                 anomalies[col].append({
+                    "type": "recent_value",
                     "description": f"Recent value anomaly (value: {kpi['recent_value']:.2f}, Z-score: {z_score:.2f})",
                     "severity": "high" if abs(z_score) > 4 else "medium"
                 })
 
-            # Significant trend
-            if abs(kpi["trend"]) > thresholds["trend_threshold"]:
+            # Significant trend: the change over the fitted span in standard deviations, on enough points
+            score = trend_score(kpi)
+            enough = kpi.get("trend_points", kpi.get("count", 0)) >= thresholds.get("min_trend_points", 30)
+            if enough and score > thresholds["trend_threshold"]:
                 anomalies[col].append({
-                    "description": f"Significant trend detected (rate: {kpi['trend']:.4f})",
+                    "type": "trend",
+                    "description": f"Significant trend detected (rate: {kpi['trend']:.4f}/h, score: {score:.2f})",
                     "severity": "medium"
                 })
 
             # Skewness indicating distribution issues
             if abs(kpi["skew"]) > thresholds["skew_threshold"]:
                 anomalies[col].append({
+                    "type": "skew",
                     "description": f"Highly skewed distribution (skew: {kpi['skew']:.2f})",
                     "severity": "low"
                 })
@@ -73,6 +179,334 @@ def detect_kpi_anomalies(
             logger.warning(f"Error detecting anomalies for {col}: {e}")
     return anomalies
 
+# Helper function to attach the expected hour-of-week band to each KPI
+def attach_seasonal_baselines(
+    kpis: Dict[str, Dict[str, Any]],
+    baselines: Dict[str, Dict[str, List[float]]],
+    rollups: Dict[str, Dict[str, Any]],
+    k: float = 3.0
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Add a 'seasonal' band for the current clock hour of each KPI (O(1) per column).
+
+    The baselines are the median/MAD of raw hourly means per hour of week, so
+    the band is paired with the mean of the newest hourly rollup, looked up
+    at that rollup's own hour. While that hour is still filling up its mean is
+    noisier, so the band is widened by sqrt(complete-hour count / count).
+    Columns whose newest rollup is older than the KPI's recent value are
+    skipped rather than compared with a stale hour.
+    """
+    for col, kpi in kpis.items():
+        profile, rollup = baselines.get(col), rollups.get(col)
+        if not profile or not rollup or rollup.get("mean") is None:
+            continue
+        hour = pd.Timestamp(rollup["hour"])
+        if kpi.get("recent_at") and pd.Timestamp(kpi["recent_at"]).floor("h") > hour:
+            continue
+        band = seasonal_band(profile, hour.to_pydatetime(), k)
+        if band:
+            count = max(rollup["count"] or 1, 1)
+            scale = band["scale"] * np.sqrt(max((rollup.get("previous_count") or count) / count, 1.0))
+            kpi["seasonal"] = {
+                **band,
+                "scale": scale,
+                "lower": band["expected"] - k * scale,
+                "upper": band["expected"] + k * scale,
+                "value": float(rollup["mean"]),
+                "hour": hour.isoformat(),
+                "hour_count": rollup["count"]
+            }
+    return kpis
+
+# Helper function to load recent rows of many identifiers in long format
+def fetch_kpi_windows(
+    db: Session,
+    identifiers: List[str],
+    max_rows: int = 100,
+    window: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Load the latest `max_rows` rows of every identifier with a single query.
+
+    Only the numeric fields of each identifier's registered schema are kept,
+    as in `decode_numeric_frame`, so columns written by preprocessing (e.g.
+    cluster labels) are not monitored as KPIs. Identifiers without a schema
+    fall back to every numeric column.
+
+    Args:
+        db (Session): Database session.
+        identifiers (list): Identifiers to load.
+        max_rows (int): Rows per identifier.
+        window (str, optional): Keep only rows within this time window of each identifier's newest row.
+
+    Returns:
+        pd.DataFrame: Long-format frame with columns identifier, timestamp, kpi, value.
+    """
+    ranked = (
+        db.query(
+            DynamicData.identifier,
+            DynamicData.timestamp,
+            DynamicData.data,
+            func.row_number().over(
+                partition_by=DynamicData.identifier,
+                order_by=DynamicData.timestamp.desc()
+            ).label("rank")
+        )
+        .filter(DynamicData.identifier.in_(list(identifiers)))
+        .subquery()
+    )
+    rows = db.query(ranked.c.identifier, ranked.c.timestamp, ranked.c.data).filter(ranked.c.rank <= max_rows).all()
+    if not rows:
+        return pd.DataFrame(columns=["identifier", "timestamp", "kpi", "value"])
+
+    wide = pd.DataFrame([row.data for row in rows])
+    numeric_cols = [
+        col for col in wide.columns
+        if col not in ("identifier", "timestamp") and pd.api.types.is_numeric_dtype(wide[col])
+    ]
+    wide = wide[numeric_cols]
+    wide.insert(0, "identifier", [row.identifier for row in rows])
+    wide.insert(1, "timestamp", pd.to_datetime([row.timestamp for row in rows]))
+    if window:
+        latest = wide.groupby("identifier")["timestamp"].transform("max")
+        wide = wide[wide["timestamp"] >= latest - pd.Timedelta(seconds=parse_window(window))]
+    # Melted under a private name first: a KPI column may itself be called 'value'
+    long_df = (
+        wide.melt(id_vars=["identifier", "timestamp"], var_name="kpi", value_name="_value")
+        .rename(columns={"_value": "value"})
+        .dropna(subset=["value"])
+    )
+
+    # Keep the schema's numeric fields; identifiers without a schema keep every numeric column
+    decoders = get_row_decoders_bulk(db, list(identifiers))
+    allowed = pd.DataFrame(
+        [(identifier, field) for identifier, decoder in decoders.items() if decoder for field in decoder.fields],
+        columns=["identifier", "kpi"]
+    )
+    with_schema = long_df["identifier"].isin(allowed["identifier"].unique())
+    keys = pd.MultiIndex.from_frame(long_df[["identifier", "kpi"]])
+    in_schema = keys.isin(pd.MultiIndex.from_frame(allowed)) if not allowed.empty else np.zeros(len(long_df), dtype=bool)
+    return long_df[~with_schema | in_schema]
+
+# Helper function to flatten the selected KPIs of many identifiers into one frame for vectorized checks
+def _kpi_frame(kpi_records: Dict[str, Dict[str, Dict[str, Any]]]) -> pd.DataFrame:
+    rows = []
+    for identifier, kpis in kpi_records.items():
+        for col, kpi in kpis.items():
+            seasonal = kpi.get("seasonal") or {}
+            rows.append({
+                "identifier": identifier,
+                "kpi": col,
+                **{key: kpi.get(key) for key in ("mean", "std", "skew", "recent_value", "trend", "count")},
+                "trend_score": trend_score(kpi),
+                "trend_points": kpi.get("trend_points", kpi.get("count", 0)),
+                "seasonal_value": seasonal.get("value", np.nan),
+                "seasonal_expected": seasonal.get("expected", np.nan),
+                "seasonal_scale": seasonal.get("scale", np.nan)
+            })
+    columns = ["identifier", "kpi", "mean", "std", "skew", "recent_value", "trend", "count", "trend_score", "trend_points",
+               "seasonal_value", "seasonal_expected", "seasonal_scale"]
+    return pd.DataFrame(rows, columns=columns).set_index(["identifier", "kpi"])
+
+def detect_kpi_anomalies_batch(
+    kpis: pd.DataFrame,
+    thresholds: Dict[str, float]
+) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    """
+    Apply the `detect_kpi_anomalies` checks to a batch of KPIs with vectorized masks.
+
+    Args:
+        kpis (pd.DataFrame): KPIs indexed by (identifier, kpi), as built by `_kpi_frame`.
+        thresholds (dict): Anomaly thresholds.
+
+    Returns:
+        dict: Anomalies per column per identifier (empty lists for clean columns).
+    """
+    std = kpis["std"].astype(np.float64).fillna(0.0)
+    mean = kpis["mean"].astype(np.float64)
+    recent = kpis["recent_value"].astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z_score = np.where(std > 0, (recent - mean) / std, 0.0)
+        seasonal_z = ((kpis["seasonal_value"] - kpis["seasonal_expected"]) / kpis["seasonal_scale"]).to_numpy(dtype=np.float64)
+    checks = {
+        "variability": (std > mean * thresholds["std_to_mean_ratio"]).to_numpy(),
+        "seasonal": np.nan_to_num(np.abs(seasonal_z)) > thresholds["z_score_threshold"],
+        "recent": np.abs(z_score) > thresholds["z_score_threshold"],
+        "trend": (
+            (kpis["trend_points"].astype(np.float64) >= thresholds.get("min_trend_points", 30))
+            & (kpis["trend_score"] > thresholds["trend_threshold"])
+        ).to_numpy(),
+        "skew": (kpis["skew"].astype(np.float64).abs() > thresholds["skew_threshold"]).to_numpy()
+    }
+
+    anomalies: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    for identifier, col in kpis.index:
+        anomalies.setdefault(identifier, {})[col] = []
+    # Only flagged rows are visited to format descriptions, in the order `detect_kpi_anomalies` reports them
+    flagged = np.flatnonzero(np.logical_or.reduce(list(checks.values())))
+    for i in flagged:
+        identifier, col = kpis.index[i]
+        row = kpis.iloc[i]
+        found = anomalies[identifier][col]
+        if checks["variability"][i]:
+            found.append({
+                "type": "variability",
+                "description": f"High variability (std: {row['std']:.2f}, mean: {row['mean']:.2f})",
+                "severity": "medium"
+            })
+        if checks["seasonal"][i]:
+            found.append({
+                "type": "seasonal",
+                "description": (
+                    f"Hourly mean outside seasonal baseline (value: {row['seasonal_value']:.2f}, "
+                    f"expected: {row['seasonal_expected']:.2f}, robust Z-score: {seasonal_z[i]:.2f})"
+                ),
+                "severity": "high" if abs(seasonal_z[i]) > 4 else "medium"
+            })
+        if checks["recent"][i]:
+            found.append({
+                "type": "recent_value",
+                "description": f"Recent value anomaly (value: {row['recent_value']:.2f}, Z-score: {z_score[i]:.2f})",
+                "severity": "high" if abs(z_score[i]) > 4 else "medium"
+            })
+        if checks["trend"][i]:
+            found.append({
+                "type": "trend",
+                "description": f"Significant trend detected (rate: {row['trend']:.4f}/h, score: {row['trend_score']:.2f})",
+                "severity": "medium"
+            })
+        if checks["skew"][i]:
+            found.append({
+                "type": "skew",
+                "description": f"Highly skewed distribution (skew: {row['skew']:.2f})",
+                "severity": "low"
+            })
+    return anomalies
+
+# Helper function to evaluate many identifiers from their KPI state (raw values) with one query per table
+def _evaluate_kpi_states(
+    db: Session,
+    identifiers: List[str],
+    config: Dict[str, Any]
+) -> tuple:
+    """Return the selected KPIs and their anomalies per identifier, and the identifiers that have any state."""
+    states = load_kpis_bulk(db, identifiers)
+    baselines, rollups = {}, {}
+    if config.get("use_seasonal_baselines", True):
+        baselines = load_baselines_bulk(db, list(states))
+        rollups = load_latest_rollups(db, list(baselines))
+    kpi_records: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for identifier, column_kpis in states.items():
+        kpis = select_window_kpis(column_kpis, config.get("window"), config.get("min_data_points", 5), config.get("trend_window"))
+        if kpis:
+            kpi_records[identifier] = attach_seasonal_baselines(kpis, baselines.get(identifier, {}), rollups.get(identifier, {}))
+    anomalies = detect_kpi_anomalies_batch(_kpi_frame(kpi_records), config["thresholds"]) if kpi_records else {}
+    return kpi_records, anomalies, set(states)
+
+# Helper function to fingerprint the set of anomalous conditions of an identifier
+def _alert_fingerprint(anomalies: Dict[str, List[Dict[str, Any]]]) -> Optional[str]:
+    active = sorted(
+        [col, anomaly["type"], anomaly["severity"]]
+        for col, anomaly_list in anomalies.items()
+        for anomaly in anomaly_list
+    )
+    return hashlib.md5(json.dumps(active).encode()).hexdigest() if active else None
+
+# Helper function to build the alert payload for a changed set of anomalous conditions
+def _alert_payload(
+    identifier: str,
+    kpis: Dict[str, Dict[str, float]],
+    anomalies: Dict[str, List[Dict[str, Any]]],
+    previous: Optional[str],
+    agent_id: str
+) -> Dict[str, Any]:
+    anomalies_detected = any(anomalies.values())
+    return {
+        "identifier": identifier,
+        "status": "raised" if anomalies_detected and not previous else "updated" if anomalies_detected else "cleared",
+        "anomalies": anomalies,
+        "kpis": kpis,
+        "agent_id": agent_id
+    }
+
+# Helper function to alert on every identifier whose set of anomalous conditions changed
+async def _publish_alerts(
+    kpi_records: Dict[str, Dict[str, Dict[str, float]]],
+    anomalies: Dict[str, Dict[str, List[Dict[str, Any]]]],
+    agent_id: str
+) -> int:
+    """Read and write all alert fingerprints in one round trip each; return the number of alerts emitted."""
+    evaluated = list(kpi_records)
+    alert_keys = [f"kpi_alert_fingerprint_{identifier}" for identifier in evaluated]
+    changed, alerts = {}, 0
+    for identifier, alert_key, previous in zip(evaluated, alert_keys, cache_get_many(alert_keys)):
+        fingerprint = _alert_fingerprint(anomalies[identifier])
+        if fingerprint == previous:
+            continue
+        changed[alert_key] = fingerprint
+        if fingerprint or previous:
+            await AgentEventEmitter.emit(
+                "kpi_alert",
+                _alert_payload(identifier, kpi_records[identifier], anomalies[identifier], previous, agent_id),
+                target="decision_making_agent"
+            )
+            alerts += 1
+    cache_set_many(changed, ttl=86400)
+    return alerts
+
+# Helper function to build a KPI monitoring result
+def _kpi_result(
+    identifier: str,
+    kpis: Dict[str, Dict[str, float]],
+    anomalies: Dict[str, List[Dict[str, Any]]],
+    data_summary: Dict[str, Any],
+    agent_id: str,
+    source_agent: Optional[str]
+) -> Dict[str, Any]:
+    return {
+        "identifier": identifier,
+        "anomalies_detected": any(len(anomaly_list) > 0 for anomaly_list in anomalies.values()),
+        "kpis": kpis,
+        "anomalies": anomalies,
+        "status": "success",
+        "agent_id": agent_id,
+        "source_agent": source_agent,
+        "timestamp": datetime.utcnow().isoformat(),
+        "data_summary": data_summary
+    }
+
+# Helper function to emit and return a KPI monitoring result
+async def _publish_kpi_result(
+    identifier: str,
+    kpis: Dict[str, Dict[str, float]],
+    anomalies: Dict[str, List[Dict[str, Any]]],
+    data_summary: Dict[str, Any],
+    agent_id: str,
+    source_agent: Optional[str]
+) -> Dict[str, Any]:
+    """Build the monitoring result, notify other agents and alert on anomalies."""
+    result = _kpi_result(identifier, kpis, anomalies, data_summary, agent_id, source_agent)
+    anomalies_detected = result["anomalies_detected"]
+
+    # Emit event to notify other agents
+    await AgentEventEmitter.emit("kpis_monitored", result, target=source_agent)
+
+    # Notify downstream agents only when the set of anomalous conditions changes
+    fingerprint = _alert_fingerprint(anomalies)
+    alert_key = f"kpi_alert_fingerprint_{identifier}"
+    previous = cache_get(alert_key)
+    if fingerprint != previous:
+        if anomalies_detected or previous:
+            await AgentEventEmitter.emit(
+                "kpi_alert",
+                _alert_payload(identifier, kpis, anomalies, previous, agent_id),
+                target="decision_making_agent"
+            )
+        cache_set(alert_key, fingerprint, ttl=86400)
+
+    logger.info(f"Agent {agent_id}: KPI monitoring completed for {identifier} with anomalies: {anomalies_detected}")
+    return result
+
 # Main KPI monitoring function
 async def monitor_kpis(
     db: Session,
@@ -100,21 +534,50 @@ async def monitor_kpis(
         "thresholds": {
             "std_to_mean_ratio": 0.5,  # Std > 50% of mean
             "z_score_threshold": 3.0,  # Z-score > 3 for anomaly
-            "trend_threshold": 0.1,    # Trend rate per data point
+            "trend_threshold": 3.0,    # Change over the trend window in std units (a daily cycle alone scores at most ~2.7)
+            "min_trend_points": 30,    # Samples needed before a trend is reported
             "skew_threshold": 1.5      # Skewness threshold
         },
-        "min_data_points": 10
+        "min_data_points": 10,
+        "use_kpi_state": True,  # Read KPIs maintained incrementally on ingest when available
+        "window": "1h",  # Time window the anomaly checks are evaluated on
+        "trend_window": "24h",  # Longer window the trend is fitted on
+        "window_anchor": "latest",  # Windows end at the newest sample ('latest') or the current time ('now')
+        "use_seasonal_baselines": True  # Compare hourly means to hour-of-week baselines when computed
     }
 
     try:
-        # Fetch recent data from the database
-        data = (
-            db.query(DynamicData)
-            .filter(DynamicData.identifier == identifier)
-            .order_by(DynamicData.timestamp.desc())
-            .limit(config["max_rows"])
-            .all()
-        )
+        # Serve precomputed KPIs in constant time when the ingest path maintains them
+        if config.get("use_kpi_state", True):
+            kpis = select_window_kpis(load_kpis(db, identifier), config.get("window"), trend_window=config.get("trend_window"))
+            if kpis:
+                if config.get("use_seasonal_baselines", True):
+                    baselines = load_baselines(db, identifier)
+                    if baselines:
+                        attach_seasonal_baselines(kpis, baselines, load_latest_rollups(db, [identifier]).get(identifier, {}))
+                anomalies = detect_kpi_anomalies(None, kpis, config["thresholds"])
+                return await _publish_kpi_result(identifier, kpis, anomalies, {
+                    "source": "kpi_state",
+                    "window": config.get("window"),
+                    "rows_analyzed": max(kpi["count"] for kpi in kpis.values()),
+                    "numeric_columns": list(kpis)
+                }, agent_id, source_agent)
+
+        # Fetch the evaluation window from the database via the (identifier, timestamp) index
+        query = db.query(DynamicData).filter(DynamicData.identifier == identifier)
+        window = config.get("window")
+        if window:
+            anchor = datetime.utcnow()
+            if config.get("window_anchor", "latest") == "latest":
+                anchor = (
+                    db.query(func.max(DynamicData.timestamp))
+                    .filter(DynamicData.identifier == identifier)
+                    .scalar()
+                )
+            if isinstance(anchor, datetime):
+                query = query.filter(DynamicData.timestamp >= anchor - timedelta(seconds=parse_window(window)))
+        data = query.order_by(DynamicData.timestamp.desc()).limit(config["max_rows"]).all()
+        data.reverse()  # Oldest first, so the last row is the most recent value
         if not data:
             logger.warning(f"Agent {agent_id}: No data found for {identifier}")
             result = {
@@ -128,8 +591,8 @@ async def monitor_kpis(
             await AgentEventEmitter.emit("kpis_monitored", result, target=source_agent)
             return result
 
-        # Convert to DataFrame
-        df = pd.DataFrame([d.data for d in data])
+        # Decode rows into numeric columns using the learned schema
+        df, numeric_cols = decode_numeric_frame(db, identifier, [d.data for d in data])
         if df.empty:
             logger.warning(f"Agent {agent_id}: Empty dataframe for {identifier}")
             result = {
@@ -143,8 +606,6 @@ async def monitor_kpis(
             await AgentEventEmitter.emit("kpis_monitored", result, target=source_agent)
             return result
 
-        # Identify numeric columns
-        numeric_cols = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
         if not numeric_cols:
             logger.warning(f"Agent {agent_id}: No numeric columns found for {identifier}")
             result = {
@@ -159,8 +620,8 @@ async def monitor_kpis(
             await AgentEventEmitter.emit("kpis_monitored", result, target=source_agent)
             return result
 
-        # Calculate KPIs
-        kpis = calculate_kpis(df, numeric_cols)
+        # Calculate KPIs against the real sample times
+        kpis = calculate_kpis(df, numeric_cols, timestamps=pd.Series([d.timestamp for d in data], index=df.index))
         if not kpis:
             logger.warning(f"Agent {agent_id}: Insufficient data for KPI calculation for {identifier}")
             result = {
@@ -175,44 +636,14 @@ async def monitor_kpis(
             await AgentEventEmitter.emit("kpis_monitored", result, target=source_agent)
             return result
 
-        # Detect anomalies
+        # Rows are standardized per ingest batch, so they are not compared with the raw-unit seasonal baselines
         anomalies = detect_kpi_anomalies(df, kpis, config["thresholds"])
-        anomalies_detected = any(len(anomaly_list) > 0 for anomaly_list in anomalies.values())
-
-        # Prepare result
-        result = {
-            "identifier": identifier,
-            "anomalies_detected": anomalies_detected,
-            "kpis": kpis,
-            "anomalies": anomalies,
-            "status": "success",
-            "agent_id": agent_id,
-            "source_agent": source_agent,
-            "timestamp": datetime.utcnow().isoformat(),
-            "data_summary": {
-                "rows_analyzed": len(df),
-                "numeric_columns": numeric_cols
-            }
-        }
-
-        # Emit event to notify other agents
-        await AgentEventEmitter.emit("kpis_monitored", result, target=source_agent)
-
-        # Notify downstream agents if anomalies are detected
-        if anomalies_detected:
-            await AgentEventEmitter.emit(
-                "kpi_alert",
-                {
-                    "identifier": identifier,
-                    "anomalies": anomalies,
-                    "kpis": kpis,
-                    "agent_id": agent_id
-                },
-                target="decision_making_agent"
-            )
-
-        logger.info(f"Agent {agent_id}: KPI monitoring completed for {identifier} with anomalies: {anomalies_detected}")
-        return result
+        return await _publish_kpi_result(identifier, kpis, anomalies, {
+            "source": "history",
+            "window": window,
+            "rows_analyzed": len(df),
+            "numeric_columns": numeric_cols
+        }, agent_id, source_agent)
 
     except Exception as e:
         logger.error(f"Agent {agent_id}: Error monitoring KPIs for {identifier}: {e}")
@@ -229,6 +660,144 @@ async def monitor_kpis(
         await AgentEventEmitter.emit("kpi_monitoring_error", error_result, target=source_agent)
         return error_result
 
+async def monitor_kpis_batch(
+    db: Session,
+    identifiers: List[str],
+    config: Dict[str, Any] = None,
+    agent_id: str = "kpi_monitoring_agent_1"
+) -> Dict[str, Any]:
+    """
+    Evaluate KPI anomalies for many identifiers from their precomputed KPI state.
+
+    All states are loaded with one query; identifiers without state are
+    skipped. Alert fingerprints are read and written in one round trip each,
+    alerts are emitted only for identifiers whose conditions changed, and the
+    batch is reported with a single summary event.
+
+    Args:
+        db (Session): Database session.
+        identifiers (list): Identifiers to evaluate.
+        config (dict, optional): Configuration with 'thresholds'.
+        agent_id (str): Identifier for this KPI monitoring agent.
+
+    Returns:
+        dict: Counts of evaluated identifiers, those with anomalies and the alerts emitted.
+    """
+    config = {
+        "thresholds": {
+            "std_to_mean_ratio": 0.5,
+            "z_score_threshold": 3.0,
+            "trend_threshold": 3.0,
+            "min_trend_points": 30,
+            "skew_threshold": 1.5
+        },
+        "window": "1h",
+        "trend_window": "24h",
+        **(config or {})
+    }
+    kpi_records, anomalies, _ = _evaluate_kpi_states(db, identifiers, config)
+
+    alerts = await _publish_alerts(kpi_records, anomalies, agent_id)
+    anomalous = [identifier for identifier, found in anomalies.items() if any(found.values())]
+    summary = {
+        "status": "success",
+        "requested": len(identifiers),
+        "evaluated": len(kpi_records),
+        "anomalous": anomalous,
+        "alerts": alerts,
+        "agent_id": agent_id,
+        "source_agent": "kpi_scheduler",
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    # One notification per batch instead of one per identifier
+    await AgentEventEmitter.emit("kpis_monitored_fleet", summary, target="kpi_scheduler")
+    logger.info(f"Agent {agent_id}: Evaluated {len(kpi_records)}/{len(identifiers)} identifiers, {len(anomalous)} with anomalies")
+    return summary
+
+async def monitor_kpis_fleet(
+    db: Session,
+    identifiers: List[str],
+    config: Dict[str, Any] = None,
+    agent_id: str = "kpi_monitoring_agent_1",
+    source_agent: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Monitor KPIs of many identifiers from their KPI state with one vectorized pass.
+
+    The KPIs come from the state maintained on ingest (`load_kpis_bulk`), in
+    raw units, rather than from the standardized rows of DynamicData, and
+    are checked against the hour-of-week baselines like `monitor_kpis`.
+
+    Args:
+        db (Session): Database session.
+        identifiers (list): Identifiers to monitor.
+        config (dict, optional): Configuration with 'thresholds', 'window', 'trend_window' and 'min_data_points'.
+        agent_id (str): Identifier for this KPI monitoring agent.
+        source_agent (str, optional): Agent that triggered this monitoring.
+
+    Returns:
+        dict: Per-identifier results keyed by identifier, plus summary counts.
+    """
+    config = {
+        "thresholds": {
+            "std_to_mean_ratio": 0.5,
+            "z_score_threshold": 3.0,
+            "trend_threshold": 3.0,
+            "min_trend_points": 30,
+            "skew_threshold": 1.5
+        },
+        "min_data_points": 5,
+        "window": "1h",
+        "trend_window": "24h",
+        "use_seasonal_baselines": True,
+        **(config or {})
+    }
+    logger.info(f"Agent {agent_id}: Monitoring KPIs for {len(identifiers)} identifiers")
+
+    try:
+        kpi_records, anomalies, with_state = _evaluate_kpi_states(db, identifiers, config)
+
+        results = {}
+        for identifier in identifiers:
+            if identifier not in kpi_records:
+                results[identifier] = {
+                    "identifier": identifier,
+                    "anomalies_detected": False,
+                    "kpis": {},
+                    "anomalies": {},
+                    "status": "insufficient data" if identifier in with_state else "no data",
+                    "agent_id": agent_id
+                }
+                continue
+            kpis = kpi_records[identifier]
+            results[identifier] = _kpi_result(identifier, kpis, anomalies[identifier], {
+                "source": "kpi_state",
+                "window": config.get("window"),
+                "rows_analyzed": max(kpi["count"] for kpi in kpis.values()),
+                "numeric_columns": list(kpis)
+            }, agent_id, source_agent)
+
+        evaluated = list(kpi_records)
+        await _publish_alerts(kpi_records, anomalies, agent_id)
+
+        anomalous = [identifier for identifier, result in results.items() if result["anomalies_detected"]]
+        summary = {
+            "status": "success",
+            "identifiers": len(identifiers),
+            "evaluated": len(evaluated),
+            "anomalous": anomalous,
+            "agent_id": agent_id,
+            "source_agent": source_agent,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        # One fleet-level notification instead of one per identifier
+        await AgentEventEmitter.emit("kpis_monitored_fleet", summary, target=source_agent)
+        logger.info(f"Agent {agent_id}: Fleet monitoring completed, {len(anomalous)}/{len(evaluated)} identifiers with anomalies")
+        return {**summary, "results": results}
+    except Exception as e:
+        logger.error(f"Agent {agent_id}: Error monitoring KPIs for {len(identifiers)} identifiers: {e}")
+        return {"status": "error", "message": str(e), "identifiers": len(identifiers), "agent_id": agent_id}
+
 # Listener for multi-agent integration
 async def listen_for_data_ready(agent_id: str):
     """Listen for data readiness events from upstream agents."""
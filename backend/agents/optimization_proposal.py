@@ -189,7 +189,7 @@ async def listen_for_inputs(agent_id: str):
                 "kpis": {"throughput": {"mean": 9.0, "std": 2.0}, "latency": {"mean": 55.0, "std": 5.0}}
             }
         }
-        if event["event_type"] in ["root_cause_identified", "predictions_available", "kpi_alert"]:
+        if event["event_type"] in ["root_cause_identified", "predictions_available", "kpi_alert", "kpi_stream_alert"]:
             logger.info(f"Agent {agent_id}: Received {event['event_type']} event")
             data = event["data"]
             result = await propose_optimization(
@@ -1,14 +1,54 @@
 from sqlalchemy.orm import Session
 from models.dynamic_data import DynamicData
-from utils.ml import train_lstm_model, predict_with_lstm
+from utils.ml import (
+    train_lstm_model, predict_with_lstm, predict_lstm_batch, forecast, FORECASTERS,
+    sample_windows, train_global_model, predict_global, evaluate_global_model
+)
 from utils.logger import logger
+from utils.decoders import decode_numeric_frame
+from utils.model_store import save_model, load_model
+from utils.cache import cache_get, cache_set
+from config.settings import settings
 from agents.eda_preprocessing import AgentEventEmitter
+from agents.kpi_monitoring import fetch_kpi_windows
 from typing import Dict, List, Any, Optional
 from datetime import datetime
+import asyncio
+import hashlib
+import json
 import pandas as pd
 import numpy as np
 from sklearn.metrics import mean_squared_error
 
+# Model store family of the persisted forecasters
+FORECAST_MODEL_KIND = "lstm_forecaster"
+# Config keys that change the trained model; other keys only affect inference
+MODEL_CONFIG_KEYS = ("lookback", "forecast_steps", "units", "dropout", "epochs", "batch_size")
+# Model store family of the fleet-wide forecasters (one per KPI, shared by all identifiers)
+GLOBAL_MODEL_KIND = "global_forecaster"
+GLOBAL_CONFIG_KEYS = ("lookback", "forecast_steps", "global_model")
+# Seconds a column keeps the backend 'auto' selected for it before it is backtested again
+SELECTION_TTL = 6 * 3600
+
+DEFAULT_PREDICTION_CONFIG = {
+    "max_rows": 100,
+    "lookback": 10,      # Number of past timesteps to use
+    "forecast_steps": 5, # Number of future steps to predict
+    "min_data_points": 20,
+    "validation_split": 0.2,  # Fraction of data for validation
+    "backend": "auto",   # Forecasting backend (see utils.ml.FORECASTERS) or 'auto' to pick by backtest
+    "season_length": None,  # Season length of the statistical backends (detected when None)
+    "global_model": "ridge",  # Fleet-wide model of the 'global' backend: 'ridge' or 'mlp'
+    "global_train_rows": 500,  # History per identifier used to train the global models
+    "global_max_windows": 50,  # Training windows sampled per series
+    "global_holdout": 0.1,  # Fraction of identifiers held out to validate the global models
+    "train_rows": 2000,  # History used by offline training
+    "units": [50, 50],
+    "dropout": 0.2,
+    "epochs": 10,
+    "batch_size": 32
+}
+
 # Helper function to prepare time series data
 def prepare_time_series(
     series: np.ndarray,
@@ -35,6 +75,256 @@ def evaluate_model(
         logger.warning(f"Error evaluating model: {e}")
         return {"rmse": float("inf")}
 
+# Helper function to build the model store key of a forecaster
+def forecaster_key(identifier: str, column: str, config: Dict[str, Any]) -> str:
+    model_config = {key: config.get(key) for key in MODEL_CONFIG_KEYS}
+    digest = hashlib.md5(json.dumps(model_config, sort_keys=True).encode()).hexdigest()[:10]
+    return f"{identifier}/{column}/{digest}"
+
+# Helper function for the cheap forecast served while no trained model exists
+def baseline_forecast(series: np.ndarray, steps: int, lookback: int) -> List[float]:
+    return [float(np.mean(series[-lookback:]))] * steps
+
+def train_forecasters(db: Session, identifier: str, config: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Train and persist one LSTM forecaster per numeric column of an identifier (offline).
+
+    Each model outputs all `forecast_steps` horizons at once, so serving a
+    forecast is one forward pass. The last `validation_split` of each series is
+    held out and all its windows are scored in one batched pass; the RMSE over
+    all horizons is stored with the model.
+
+    Args:
+        db (Session): Database session.
+        identifier (str): Unique identifier for the data.
+        config (dict, optional): Prediction configuration (see DEFAULT_PREDICTION_CONFIG).
+
+    Returns:
+        dict: Metadata of the stored model per column.
+    """
+    config = {**DEFAULT_PREDICTION_CONFIG, **(config or {})}
+    data = (
+        db.query(DynamicData)
+        .filter(DynamicData.identifier == identifier)
+        .order_by(DynamicData.timestamp.desc())
+        .limit(config["train_rows"])
+        .all()
+    )[::-1]
+    if not data:
+        return {}
+    df, numeric_cols = decode_numeric_frame(db, identifier, [d.data for d in data])
+    lookback, steps = config["lookback"], config["forecast_steps"]
+    trained = {}
+    for col in numeric_cols:
+        series = df[col].dropna().to_numpy(dtype=np.float64)
+        if len(series) < max(config["min_data_points"], 2 * (lookback + steps)):
+            continue
+        split = int(len(series) * (1 - config["validation_split"]))
+        model = train_lstm_model(series[:split], {
+            "look_back": lookback,
+            "forecast_steps": steps,
+            "units": config["units"],
+            "dropout": config["dropout"],
+            "epochs": config["epochs"],
+            "batch_size": config["batch_size"],
+            "validation_split": 0.0,
+            "optimizer": "adam",
+            "loss": "mse"
+        })
+        validation = series[split - lookback:]
+        rmse = None
+        if len(validation) >= lookback + steps:
+            X_val, y_val = prepare_time_series(validation, lookback, steps)
+            rmse = float(np.sqrt(mean_squared_error(y_val, predict_lstm_batch(model, X_val, steps))))
+        metadata = {
+            "identifier": identifier,
+            "column": col,
+            "config": {key: config[key] for key in MODEL_CONFIG_KEYS},
+            "rows": len(series),
+            "validation_rmse": rmse,
+            "trained_until": max(d.timestamp for d in data).isoformat()
+        }
+        metadata["version"] = save_model(FORECAST_MODEL_KIND, forecaster_key(identifier, col, config), model, metadata, fmt="keras")
+        trained[col] = metadata
+    logger.info(f"Trained {len(trained)} forecasters for {identifier}")
+    return trained
+
+# Helper function to queue offline training for an identifier, at most once per hour per config
+def _request_training(identifier: str, config: Dict[str, Any]) -> None:
+    marker = f"forecast_training_{forecaster_key(identifier, '', config)}"
+    if cache_get(marker):
+        return
+    try:
+        from tasks.celery_config import celery_app
+        celery_app.send_task("tasks.training.train_forecaster_batch", args=[[identifier], config], queue="training")
+        cache_set(marker, True, ttl=3600)
+    except Exception as e:
+        logger.warning(f"Could not queue forecaster training for {identifier}: {e}")
+
+# Helper function to build the model store key of a global forecaster
+def global_forecaster_key(column: str, config: Dict[str, Any]) -> str:
+    model_config = {key: config.get(key) for key in GLOBAL_CONFIG_KEYS}
+    digest = hashlib.md5(json.dumps(model_config, sort_keys=True).encode()).hexdigest()[:10]
+    return f"{column}/{digest}"
+
+# Helper function to split a long-format KPI frame into time-ordered series per KPI and identifier
+def _series_by_kpi(long_df: pd.DataFrame) -> Dict[str, Dict[str, np.ndarray]]:
+    series: Dict[str, Dict[str, np.ndarray]] = {}
+    for (kpi, identifier), group in long_df.sort_values("timestamp").groupby(["kpi", "identifier"], sort=False):
+        series.setdefault(kpi, {})[identifier] = group["value"].to_numpy(dtype=np.float64)
+    return series
+
+# Helper function to assign an identifier to the validation split, stable across runs
+def _is_holdout(identifier: str, fraction: float) -> bool:
+    return int(hashlib.md5(identifier.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF < fraction
+
+def train_global_forecasters(db: Session, identifiers: List[str], config: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Train one forecaster per KPI across all identifiers and persist it (offline).
+
+    History is loaded in batches of KPI_MONITOR_BATCH_SIZE identifiers and cut
+    into normalized windows right away, so memory grows with the sampled
+    windows rather than the raw rows. A stable fraction of identifiers is held
+    out to validate each model against the last-value forecast.
+
+    Args:
+        db (Session): Database session.
+        identifiers (list): Identifiers whose history is pooled.
+        config (dict, optional): Prediction configuration (see DEFAULT_PREDICTION_CONFIG).
+
+    Returns:
+        dict: Metadata of the stored model per KPI.
+    """
+    config = {**DEFAULT_PREDICTION_CONFIG, **(config or {})}
+    lookback, length = config["lookback"], config["lookback"] + config["forecast_steps"]
+    train: Dict[str, List[np.ndarray]] = {}
+    holdout: Dict[str, List[np.ndarray]] = {}
+    series_counts: Dict[str, int] = {}
+    for start in range(0, len(identifiers), settings.KPI_MONITOR_BATCH_SIZE):
+        batch = identifiers[start:start + settings.KPI_MONITOR_BATCH_SIZE]
+        long_df = fetch_kpi_windows(db, batch, config["global_train_rows"])
+        for kpi, by_identifier in _series_by_kpi(long_df).items():
+            series_counts[kpi] = series_counts.get(kpi, 0) + len(by_identifier)
+            for identifier, series in by_identifier.items():
+                target = holdout if _is_holdout(identifier, config["global_holdout"]) else train
+                windows = sample_windows([series], length, config["global_max_windows"])
+                if len(windows):
+                    target.setdefault(kpi, []).append(windows)
+
+    trained = {}
+    for kpi, chunks in train.items():
+        windows = np.concatenate(chunks)
+        if len(windows) < config["min_data_points"]:
+            continue
+        model = train_global_model(windows, lookback, config["global_model"])
+        validation = evaluate_global_model(model, np.concatenate(holdout[kpi]), lookback) if kpi in holdout else {}
+        metadata = {
+            "column": kpi,
+            "config": {key: config[key] for key in GLOBAL_CONFIG_KEYS},
+            "series": series_counts[kpi],
+            "windows": len(windows),
+            "validation_rmse": validation.get("rmse"),
+            "naive_rmse": validation.get("naive_rmse"),
+            "trained_at": datetime.utcnow().isoformat()
+        }
+        metadata["version"] = save_model(GLOBAL_MODEL_KIND, global_forecaster_key(kpi, config), model, metadata)
+        trained[kpi] = metadata
+    logger.info(f"Trained {len(trained)} global forecasters across {len(identifiers)} identifiers")
+    return trained
+
+# Helper function to queue training of the global forecasters, at most once per hour per config
+def _request_global_training(config: Dict[str, Any]) -> None:
+    marker = f"global_forecast_training_{global_forecaster_key('', config)}"
+    if cache_get(marker):
+        return
+    try:
+        from tasks.celery_config import celery_app
+        celery_app.send_task("tasks.training.train_global_forecasters", args=[None, config], queue="training")
+        cache_set(marker, True, ttl=3600)
+    except Exception as e:
+        logger.warning(f"Could not queue global forecaster training: {e}")
+
+# Helper function to forecast a batch of identifiers with the stored global models
+def _predict_fleet_batch(
+    db: Session,
+    identifiers: List[str],
+    config: Dict[str, Any],
+    models: Dict[str, Optional[tuple]]
+) -> Dict[str, Dict[str, List[float]]]:
+    lookback = config["lookback"]
+    predictions: Dict[str, Dict[str, List[float]]] = {}
+    for kpi, by_identifier in _series_by_kpi(fetch_kpi_windows(db, identifiers, 2 * lookback)).items():
+        if kpi not in models:
+            models[kpi] = load_model(GLOBAL_MODEL_KIND, global_forecaster_key(kpi, config))
+        ready = [(identifier, series[-lookback:]) for identifier, series in by_identifier.items() if len(series) >= lookback]
+        if models[kpi] is None or not ready:
+            continue
+        forecasts = predict_global(models[kpi][0], np.stack([history for _, history in ready]))
+        for (identifier, _), values in zip(ready, forecasts):
+            predictions.setdefault(identifier, {})[kpi] = values.tolist()
+    return predictions
+
+async def predict_kpis_batch(
+    db: Session,
+    identifiers: List[str],
+    config: Dict[str, Any] = None,
+    agent_id: str = "prediction_agent_1",
+    source_agent: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Forecast every KPI of many identifiers with the fleet-wide global models.
+
+    Identifiers are processed in batches of KPI_MONITOR_BATCH_SIZE: one query
+    loads the latest windows of the batch, and each KPI is forecast for all of
+    its cells with a single vectorized predict call. KPIs without a stored
+    model are skipped and their training is queued.
+
+    Args:
+        db (Session): Database session.
+        identifiers (list): Identifiers to forecast.
+        config (dict, optional): Prediction configuration (lookback, forecast_steps, global_model).
+        agent_id (str): Identifier for this prediction agent.
+        source_agent (str, optional): Agent that triggered the predictions.
+
+    Returns:
+        dict: Forecasts per identifier and KPI, and the model versions used.
+    """
+    config = {**DEFAULT_PREDICTION_CONFIG, **(config or {})}
+    logger.info(f"Agent {agent_id}: Forecasting {len(identifiers)} identifiers with global models")
+    try:
+        predictions: Dict[str, Dict[str, List[float]]] = {}
+        models: Dict[str, Optional[tuple]] = {}
+        for start in range(0, len(identifiers), settings.KPI_MONITOR_BATCH_SIZE):
+            batch = identifiers[start:start + settings.KPI_MONITOR_BATCH_SIZE]
+            predictions.update(await asyncio.to_thread(_predict_fleet_batch, db, batch, config, models))
+        missing = sorted(kpi for kpi, loaded in models.items() if loaded is None)
+        if missing:
+            _request_global_training(config)
+        result = {
+            "status": "success",
+            "identifiers": len(identifiers),
+            "forecasted": len(predictions),
+            "predictions": predictions,
+            "models": {kpi: loaded[1]["version"] for kpi, loaded in models.items() if loaded is not None},
+            "missing_models": missing,
+            "agent_id": agent_id,
+            "source_agent": source_agent,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        await AgentEventEmitter.emit("fleet_predictions_generated", {
+            "identifiers": len(identifiers),
+            "forecasted": len(predictions),
+            "missing_models": missing,
+            "agent_id": agent_id
+        }, target=source_agent)
+        logger.info(f"Agent {agent_id}: Forecasted {len(predictions)} of {len(identifiers)} identifiers")
+        return result
+    except Exception as e:
+        logger.error(f"Agent {agent_id}: Error forecasting fleet: {e}")
+        error_result = {"status": "error", "message": str(e), "agent_id": agent_id, "source_agent": source_agent}
+        await AgentEventEmitter.emit("prediction_error", error_result, target=source_agent)
+        return error_result
+
 # Main prediction function
 async def predict_kpis(
     db: Session,
@@ -57,13 +347,7 @@ async def predict_kpis(
         dict: Predicted KPIs and metadata.
     """
     logger.info(f"Agent {agent_id}: Generating predictions for {identifier}")
-    config = config or {
-        "max_rows": 100,
-        "lookback": 10,      # Number of past timesteps to use
-        "forecast_steps": 5, # Number of future steps to predict
-        "min_data_points": 20,
-        "validation_split": 0.2  # Fraction of data for validation
-    }
+    config = {**DEFAULT_PREDICTION_CONFIG, **(config or {})}
 
     try:
         # Fetch recent data from the database
@@ -73,7 +357,7 @@ async def predict_kpis(
             .order_by(DynamicData.timestamp.desc())
             .limit(config["max_rows"])
             .all()
-        )
+        )[::-1]  # Latest rows, in time order
         if not data:
             logger.warning(f"Agent {agent_id}: No data found for {identifier}")
             result = {
@@ -85,8 +369,8 @@ async def predict_kpis(
             await AgentEventEmitter.emit("predictions_generated", result, target=source_agent)
             return result
 
-        # Convert to DataFrame
-        df = pd.DataFrame([d.data for d in data])
+        # Decode rows into numeric columns using the learned schema
+        df, numeric_cols = decode_numeric_frame(db, identifier, [d.data for d in data])
         if df.empty or len(df) < config["min_data_points"]:
             logger.warning(f"Agent {agent_id}: Insufficient data for {identifier}")
             result = {
@@ -99,8 +383,6 @@ async def predict_kpis(
             await AgentEventEmitter.emit("predictions_generated", result, target=source_agent)
             return result
 
-        # Identify numeric columns
-        numeric_cols = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
         if not numeric_cols:
             logger.warning(f"Agent {agent_id}: No numeric columns found for {identifier}")
             result = {
@@ -113,54 +395,92 @@ async def predict_kpis(
             await AgentEventEmitter.emit("predictions_generated", result, target=source_agent)
             return result
 
-        # Generate predictions for each numeric column
+        backend = config["backend"]
+        if backend not in ("auto", "global") and backend not in FORECASTERS:
+            raise ValueError(f"Unknown forecasting backend: {backend}")
+
+        # Statistical backends fit per request in milliseconds; LSTM and global forecasters come from the model store
         predictions = {}
         performance = {}
+        untrained = []
+        lookback = config["lookback"]
         for col in numeric_cols:
             series = df[col].dropna().values
-            if len(series) >= config["min_data_points"]:
+            if len(series) < max(config["min_data_points"], lookback):
+                logger.warning(f"Agent {agent_id}: Too few data points for {col}")
+                predictions[col] = [float(series.mean())] * config["forecast_steps"] if len(series) else []
+                performance[col] = {"rmse": float("inf")}
+                continue
+            if backend == "global":
+                loaded = load_model(GLOBAL_MODEL_KIND, global_forecaster_key(col, config))
+                if loaded is None:
+                    untrained.append(col)
+                    predictions[col] = baseline_forecast(series, config["forecast_steps"], lookback)
+                    performance[col] = {"rmse": None, "source": "baseline"}
+                    continue
+                model, metadata = loaded
+                predictions[col] = predict_global(model, series[-lookback:][None, :])[0].tolist()
+                performance[col] = {
+                    "rmse": None,
+                    "normalized_rmse": metadata.get("validation_rmse"),
+                    "normalized_naive_rmse": metadata.get("naive_rmse"),
+                    "source": "global",
+                    "model_version": metadata["version"]
+                }
+                continue
+            if backend != "lstm":
                 try:
-                    # Prepare data with lookback window
-                    series = series[-config["max_rows"]:]  # Limit to max_rows
-                    X, y = prepare_time_series(series, config["lookback"], config["forecast_steps"])
-                    if len(X) == 0:
-                        logger.warning(f"Agent {agent_id}: Not enough data after lookback for {col}")
-                        predictions[col] = [float(series.mean())] * config["forecast_steps"]
-                        performance[col] = {"rmse": float("inf")}
-                        continue
-
-                    # Split into train and validation
-                    split_idx = int(len(X) * (1 - config["validation_split"]))
-                    X_train, X_val = X[:split_idx], X[split_idx:]
-                    y_train, y_val = y[:split_idx], y[split_idx:]
-
-                    # Train LSTM model
-                    model = train_lstm_model(X_train.reshape(-1, config["lookback"], 1))
-                    pred = predict_with_lstm(
-                        model,
-                        series[-config["lookback"]:].reshape(1, -1, 1),
-                        steps=config["forecast_steps"]
+                    # 'auto' reuses the backend it last selected for this column instead of backtesting again
+                    selection_key = f"forecast_selection_{identifier}_{col}_{config['forecast_steps']}_{config['season_length']}"
+                    selection = cache_get(selection_key) if backend == "auto" else None
+                    outcome = await asyncio.to_thread(
+                        forecast, series, config["forecast_steps"],
+                        selection["backend"] if selection else backend,
+                        config["season_length"] or (selection or {}).get("season_length")
                     )
-                    predictions[col] = pred.flatten().tolist()
-
-                    # Evaluate performance on validation set if available
-                    if len(X_val) > 0:
-                        val_pred = predict_with_lstm(
-                            model,
-                            X_val[:, -config["lookback"]:].reshape(-1, config["lookback"], 1),
-                            steps=config["forecast_steps"]
-                        )
-                        performance[col] = evaluate_model(y_val.flatten(), val_pred.flatten())
-                    else:
-                        performance[col] = {"rmse": None}
+                    if backend == "auto" and selection is None:
+                        selection = {key: outcome[key] for key in ("backend", "season_length", "scores")}
+                        cache_set(selection_key, selection, ttl=SELECTION_TTL)
+                    predictions[col] = outcome["forecast"].tolist()
+                    scores = (selection or outcome)["scores"] or {}
+                    performance[col] = {
+                        "rmse": scores.get(outcome["backend"]),
+                        "source": "statistical",
+                        "backend": outcome["backend"],
+                        "season_length": outcome["season_length"]
+                    }
                 except Exception as e:
                     logger.error(f"Agent {agent_id}: Prediction failed for {col}: {e}")
-                    predictions[col] = [float(series.mean())] * config["forecast_steps"]
-                    performance[col] = {"rmse": float("inf")}
+                    predictions[col] = baseline_forecast(series, config["forecast_steps"], lookback)
+                    performance[col] = {"rmse": None, "source": "baseline"}
+                continue
+            loaded = load_model(FORECAST_MODEL_KIND, forecaster_key(identifier, col, config))
+            if loaded is None:
+                untrained.append(col)
+                predictions[col] = baseline_forecast(series, config["forecast_steps"], lookback)
+                performance[col] = {"rmse": None, "source": "baseline"}
+                continue
+            model, metadata = loaded
+            try:
+                pred = await asyncio.to_thread(
+                    predict_with_lstm, model, series[-lookback:], config["forecast_steps"], {"look_back": lookback}
+                )
+                predictions[col] = pred.flatten().tolist()
+                performance[col] = {
+                    "rmse": metadata.get("validation_rmse"),
+                    "source": "model",
+                    "model_version": metadata["version"],
+                    "trained_until": metadata.get("trained_until")
+                }
+            except Exception as e:
+                logger.error(f"Agent {agent_id}: Prediction failed for {col}: {e}")
+                predictions[col] = baseline_forecast(series, config["forecast_steps"], lookback)
+                performance[col] = {"rmse": None, "source": "baseline"}
+        if untrained:
+            if backend == "global":
+                _request_global_training(config)
             else:
-                logger.warning(f"Agent {agent_id}: Too few data points for {col}")
-                predictions[col] = [float(series.mean())] * config["forecast_steps"]
-                performance[col] = {"rmse": float("inf")}
+                _request_training(identifier, config)
 
         # Prepare result
         result = {
@@ -172,7 +492,8 @@ async def predict_kpis(
             "timestamp": datetime.utcnow().isoformat(),
             "data_summary": {
                 "rows_analyzed": len(df),
-                "numeric_columns": numeric_cols
+                "numeric_columns": numeric_cols,
+                "untrained_columns": untrained
             },
             "performance": performance
         }
@@ -181,7 +502,7 @@ async def predict_kpis(
         await AgentEventEmitter.emit("predictions_generated", result, target=source_agent)
 
         # Notify downstream agents if predictions are meaningful
-        if any(len(pred) > 0 and perf["rmse"] != float("inf") for col, perf in performance.items()):
+        if any(len(predictions[col]) > 0 and perf["rmse"] != float("inf") for col, perf in performance.items()):
             await AgentEventEmitter.emit(
                 "predictions_available",
                 {
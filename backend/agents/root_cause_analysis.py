@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from models.dynamic_data import DynamicData
 from utils.logger import logger
+from utils.decoders import decode_numeric_frame
 from agents.eda_preprocessing import AgentEventEmitter
 from typing import Dict, List, Any, Optional
 from datetime import datetime
@@ -152,8 +153,8 @@ async def analyze_root_cause(
             await AgentEventEmitter.emit("root_cause_analyzed", result, target=source_agent)
             return result
 
-        # Convert to DataFrame
-        df = pd.DataFrame([d.data for d in data])
+        # Decode rows into numeric columns using the learned schema
+        df, numeric_cols = decode_numeric_frame(db, identifier, [d.data for d in data])
         if df.empty or len(df) < config["min_data_points"]:
             logger.warning(f"Agent {agent_id}: Insufficient data for {identifier}")
             result = {
@@ -166,8 +167,6 @@ async def analyze_root_cause(
             await AgentEventEmitter.emit("root_cause_analyzed", result, target=source_agent)
             return result
 
-        # Identify numeric columns
-        numeric_cols = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
         if not numeric_cols:
             logger.warning(f"Agent {agent_id}: No numeric columns found for {identifier}")
             result = {
@@ -240,7 +239,7 @@ async def listen_for_alerts(agent_id: str):
             "event_type": "kpi_alert",
             "data": {"identifier": "test_data", "config": {"max_rows": 30}}
         }
-        if event["event_type"] in ["kpi_alert", "action_required"]:
+        if event["event_type"] in ["kpi_alert", "kpi_stream_alert", "action_required"]:
             logger.info(f"Agent {agent_id}: Received {event['event_type']} event")
             db = MagicMock(spec=Session)  # Replace with actual DB session
             result = await analyze_root_cause(
@@ -1,15 +1,15 @@
 from sqlalchemy.orm import Session
-from models.dynamic_data import DynamicData
+from models.schema_registry import SchemaVersion
 from utils.eda import infer_field_types
-from utils.cache import cache_set, cache_get
+from utils.cache import cache_set, cache_get, cache_delete
+from utils.incremental import merge_running_stats, summarize_running_stats
+from utils.drift import SchemaDriftDetector
 from utils.logger import logger
 from agents.eda_preprocessing import AgentEventEmitter
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import pandas as pd
 import numpy as np
-import hashlib
-import json
 
 # Helper function to merge field types
 def merge_field_types(new_types: Dict[str, str], historical_types: Dict[str, str]) -> Dict[str, str]:
@@ -46,6 +46,231 @@ def detect_schema_changes(
             })
     return changes
 
+# Helper function to fetch the current schema version with a single indexed read
+def get_latest_schema(db: Session, identifier: str) -> Optional[SchemaVersion]:
+    """Return the newest registered schema version for an identifier, if any."""
+    return (
+        db.query(SchemaVersion)
+        .filter(SchemaVersion.identifier == identifier)
+        .order_by(SchemaVersion.version.desc())
+        .first()
+    )
+
+def update_schema_registry(
+    db: Session,
+    identifier: str,
+    field_types: Dict[str, str],
+    stats: Optional[Dict[str, Dict[str, float]]] = None,
+    row_count: int = 0,
+    agent_id: str = "schema_learning_agent_1"
+) -> Tuple[SchemaVersion, List[Dict[str, Any]]]:
+    """
+    Record newly observed field types in the schema registry.
+
+    A batch that only confirms the current schema updates its statistics and
+    last_seen time; a batch that adds or changes column types creates a new
+    version. Columns missing from a batch are kept, since a batch may carry a
+    subset of the fields.
+
+    Args:
+        db (Session): Database session.
+        identifier (str): Unique identifier for the data.
+        field_types (dict): Types inferred from the new batch.
+        stats (dict, optional): Mergeable running statistics of the new batch.
+        row_count (int): Number of rows in the new batch.
+        agent_id (str): Identifier of the agent updating the registry.
+
+    Returns:
+        tuple: The current schema version and the changes against the previous version.
+    """
+    now = datetime.utcnow()
+    latest = get_latest_schema(db, identifier)
+    if latest is None:
+        schema = SchemaVersion(
+            identifier=identifier,
+            version=1,
+            field_types=field_types,
+            stats=stats or {},
+            row_count=row_count,
+            agent_id=agent_id,
+            first_seen=now,
+            last_seen=now
+        )
+        db.add(schema)
+        db.commit()
+        cache_delete(f"schema_{identifier}")
+        changes = detect_schema_changes(field_types, {})
+        logger.info(f"Agent {agent_id}: Registered schema v1 for {identifier}")
+        return schema, changes
+
+    merged_types = merge_field_types(field_types, latest.field_types)
+    changes = detect_schema_changes(merged_types, latest.field_types)
+    merged_stats = merge_running_stats(latest.stats or {}, stats or {})
+    if changes:
+        schema = SchemaVersion(
+            identifier=identifier,
+            version=latest.version + 1,
+            field_types=merged_types,
+            stats=merged_stats,
+            row_count=row_count,
+            agent_id=agent_id,
+            first_seen=now,
+            last_seen=now
+        )
+        db.add(schema)
+        logger.info(f"Agent {agent_id}: Registered schema v{schema.version} for {identifier} with {len(changes)} changes")
+    else:
+        schema = latest
+        schema.stats = merged_stats
+        schema.row_count = (schema.row_count or 0) + row_count
+        schema.last_seen = now
+        schema.agent_id = agent_id
+    db.commit()
+    cache_delete(f"schema_{identifier}")
+    return schema, changes
+
+def get_schema_history(db: Session, identifier: str) -> List[Dict[str, Any]]:
+    """
+    Return all schema versions of an identifier with the changes introduced by each.
+
+    Args:
+        db (Session): Database session.
+        identifier (str): Unique identifier for the data.
+
+    Returns:
+        list: Versions in ascending order, each with its 'schema_changes' against the previous one.
+    """
+    versions = (
+        db.query(SchemaVersion)
+        .filter(SchemaVersion.identifier == identifier)
+        .order_by(SchemaVersion.version.asc())
+        .all()
+    )
+    history, previous_types = [], {}
+    for schema in versions:
+        entry = schema.to_dict()
+        entry["schema_changes"] = detect_schema_changes(schema.field_types, previous_types)
+        history.append(entry)
+        previous_types = schema.field_types
+    return history
+
+# Helper function to load the drift detector for the current schema version
+def _load_drift_detector(
+    db: Session,
+    identifier: str,
+    config: Optional[Dict[str, Any]] = None
+) -> Optional[SchemaDriftDetector]:
+    """Restore the cached detector with a fresh baseline, rebuilding it when the registered schema version changed."""
+    schema = get_latest_schema(db, identifier)
+    if not isinstance(schema, SchemaVersion):
+        return None  # Nothing registered yet; the first ingest defines the baseline
+    cached = cache_get(f"schema_drift_{identifier}")
+    if cached and cached.get("version") == schema.version:
+        detector = SchemaDriftDetector.from_dict(cached)
+        detector.set_baseline(schema.stats or {})  # Registry stats keep merging within a version
+        return detector
+    return SchemaDriftDetector(identifier, schema.field_types, schema.stats or {}, config=config, version=schema.version)
+
+async def check_schema_drift(
+    db: Session,
+    identifier: str,
+    rows: List[Dict[str, Any]],
+    config: Optional[Dict[str, Any]] = None,
+    agent_id: str = "schema_learning_agent_1",
+    ttl: int = 86400
+) -> List[Dict[str, Any]]:
+    """
+    Stream rows through the schema-drift detector and emit `schema_evolved` on drift.
+
+    Each row is checked against the registered schema in constant time, and
+    an event is emitted as soon as a column crosses a drift threshold, so
+    downstream agents do not have to wait for a full re-inference.
+
+    Args:
+        db (Session): Database session.
+        identifier (str): Unique identifier for the data.
+        rows (list): Raw records in arrival order.
+        config (dict, optional): Drift thresholds (see utils.drift.DEFAULT_DRIFT_CONFIG).
+        agent_id (str): Identifier of the agent running the check.
+        ttl (int): Time-to-live of the detector state in the cache.
+
+    Returns:
+        list: Drifts detected in this batch.
+    """
+    try:
+        detector = _load_drift_detector(db, identifier, config)
+        if detector is None:
+            return []
+
+        detected = []
+        for row in rows:
+            drifts = detector.update(row)
+            if drifts:
+                detected.extend(drifts)
+                await _emit_drift(identifier, drifts, detector, agent_id)
+        drifts = detector.check_cardinality()
+        if drifts:
+            detected.extend(drifts)
+            await _emit_drift(identifier, drifts, detector, agent_id)
+
+        cache_set(f"schema_drift_{identifier}", detector.to_dict(), ttl=ttl)
+        if detected:
+            logger.info(f"Agent {agent_id}: Detected {len(detected)} schema drifts for {identifier}")
+        return detected
+    except Exception as e:
+        logger.error(f"Agent {agent_id}: Schema drift check failed for {identifier}: {e}")
+        return []
+
+# Helper function to notify downstream agents of a drift
+async def _emit_drift(
+    identifier: str,
+    drifts: List[Dict[str, Any]],
+    detector: SchemaDriftDetector,
+    agent_id: str
+) -> None:
+    """Emit a schema_evolved event for drifts detected by the streaming detector."""
+    await AgentEventEmitter.emit(
+        "schema_evolved",
+        {
+            "identifier": identifier,
+            "schema_changes": drifts,
+            "field_types": detector.field_types,
+            "version": detector.version,
+            "detection": "streaming",
+            "agent_id": agent_id,
+            "timestamp": datetime.utcnow().isoformat()
+        },
+        target="eda_agent_1"
+    )
+
+# Helper function to build the API result for a registered schema
+def _schema_result(
+    schema: SchemaVersion,
+    schema_changes: List[Dict[str, Any]],
+    agent_id: str,
+    source_agent: Optional[str],
+    new_rows: int = 0
+) -> Dict[str, Any]:
+    """Format a registry entry as a schema learning result."""
+    return {
+        "identifier": schema.identifier,
+        "field_types": schema.field_types,
+        "schema_changes": schema_changes,
+        "version": schema.version,
+        "status": "success",
+        "agent_id": agent_id,
+        "source_agent": source_agent,
+        "timestamp": datetime.utcnow().isoformat(),
+        "data_summary": {
+            "new_rows": new_rows,
+            "historical_rows": schema.row_count,
+            "columns": list(schema.field_types.keys()),
+            "first_seen": schema.first_seen.isoformat() if schema.first_seen else None,
+            "last_seen": schema.last_seen.isoformat() if schema.last_seen else None,
+            "stats": summarize_running_stats(schema.stats or {})
+        }
+    }
+
 # Main schema learning function
 async def learn_schema(
     db: Session,
@@ -56,13 +281,17 @@ async def learn_schema(
     source_agent: Optional[str] = None
 ) -> Dict[str, Any]:
     """
-    Learn and update the schema for a given identifier, integrating with historical data.
+    Learn and update the schema for a given identifier using the schema registry.
+
+    With empty `raw_data` this is a lookup of the latest registered version.
+    Otherwise the new rows are inferred, merged into the registry, and schema
+    evolution is reported by diffing against the previous version.
 
     Args:
         db (Session): Database session.
         identifier (str): Unique identifier for the data.
         raw_data (list): Raw data to infer schema from.
-        config (dict, optional): Configuration for schema learning (e.g., sample size).
+        config (dict, optional): Configuration for schema learning (e.g., cache TTL).
         agent_id (str): Identifier for this schema learning agent.
         source_agent (str, optional): Agent that triggered this schema learning.
 
@@ -71,74 +300,63 @@ async def learn_schema(
     """
     logger.info(f"Agent {agent_id}: Learning schema for {identifier}")
     config = config or {
-        "max_historical_rows": 1000,
-        "cache_ttl": 86400,  # 24 hours
+        "cache_ttl": 3600,
         "min_rows_for_inference": 5
     }
 
-    # Generate cache key with config hash for uniqueness
-    config_str = json.dumps(config, sort_keys=True)
-    config_hash = hashlib.md5(config_str.encode()).hexdigest()
-    cache_key = f"schema_{identifier}_{agent_id}_{config_hash}"
-    cached = cache_get(cache_key)
-    if cached:
-        logger.info(f"Agent {agent_id}: Returning cached schema for {identifier}")
-        await AgentEventEmitter.emit("schema_learned", cached, target=source_agent)
-        return cached
-
     try:
+        # Lookup path: serve the registered schema
+        if not raw_data:
+            cache_key = f"schema_{identifier}"
+            cached = cache_get(cache_key)
+            if cached:
+                logger.info(f"Agent {agent_id}: Returning cached schema for {identifier}")
+                await AgentEventEmitter.emit("schema_learned", cached, target=source_agent)
+                return cached
+
+            schema = get_latest_schema(db, identifier)
+            if schema is None:
+                result = {
+                    "identifier": identifier,
+                    "field_types": {},
+                    "schema_changes": [],
+                    "status": "not found",
+                    "message": f"No schema registered for {identifier}",
+                    "agent_id": agent_id
+                }
+                await AgentEventEmitter.emit("schema_learned", result, target=source_agent)
+                return result
+
+            result = _schema_result(schema, [], agent_id, source_agent)
+            cache_set(cache_key, result, ttl=config.get("cache_ttl", 3600))
+            await AgentEventEmitter.emit("schema_learned", result, target=source_agent)
+            return result
+
         # Convert raw data to DataFrame
         df = pd.DataFrame(raw_data)
-        if df.empty or len(df) < config["min_rows_for_inference"]:
+        min_rows = config.get("min_rows_for_inference", 5)
+        if df.empty or len(df) < min_rows:
             logger.warning(f"Agent {agent_id}: Insufficient data for schema inference for {identifier}")
             result = {
                 "identifier": identifier,
                 "field_types": {},
                 "schema_changes": [],
                 "status": "insufficient data",
-                "message": f"Need at least {config['min_rows_for_inference']} rows",
+                "message": f"Need at least {min_rows} rows",
                 "agent_id": agent_id
             }
             await AgentEventEmitter.emit("schema_learned", result, target=source_agent)
             return result
 
-        # Infer field types from new data
+        # Infer field types from new data only and merge them into the registry
         field_types = infer_field_types(df)
-
-        # Fetch historical data for schema enrichment
-        existing_data = (
-            db.query(DynamicData)
-            .filter(DynamicData.identifier == identifier)
-            .order_by(DynamicData.timestamp.desc())
-            .limit(config["max_historical_rows"])
-            .all()
+        schema, schema_changes = update_schema_registry(
+            db, identifier, field_types, row_count=len(df), agent_id=agent_id
         )
-        schema_changes = []
-        if existing_data:
-            historical_df = pd.DataFrame([d.data for d in existing_data])
-            historical_types = infer_field_types(historical_df)
-            field_types = merge_field_types(field_types, historical_types)
-            schema_changes = detect_schema_changes(field_types, historical_types)
-            logger.debug(f"Agent {agent_id}: Merged historical schema for {identifier}")
-
-        # Prepare result
-        result = {
-            "identifier": identifier,
-            "field_types": field_types,
-            "schema_changes": schema_changes,
-            "status": "success",
-            "agent_id": agent_id,
-            "source_agent": source_agent,
-            "timestamp": datetime.utcnow().isoformat(),
-            "data_summary": {
-                "new_rows": len(df),
-                "historical_rows": len(existing_data) if existing_data else 0,
-                "columns": list(field_types.keys())
-            }
-        }
+        if schema.version == 1:
+            schema_changes = []  # The first registration is not an evolution
+        result = _schema_result(schema, schema_changes, agent_id, source_agent, new_rows=len(df))
 
-        # Cache and emit event
-        cache_set(cache_key, result, ttl=config["cache_ttl"])
         await AgentEventEmitter.emit("schema_learned", result, target=source_agent)
 
         # Notify downstream agents if schema changes are detected
@@ -148,13 +366,14 @@ async def learn_schema(
                 {
                     "identifier": identifier,
                     "schema_changes": schema_changes,
-                    "field_types": field_types,
+                    "field_types": schema.field_types,
+                    "version": schema.version,
                     "agent_id": agent_id
                 },
                 target="eda_agent_1"  # Inform EDA agent to adapt preprocessing
             )
 
-        logger.info(f"Agent {agent_id}: Schema learned for {identifier}: {field_types}")
+        logger.info(f"Agent {agent_id}: Schema learned for {identifier}: {schema.field_types}")
         return result
 
     except Exception as e:
@@ -207,11 +426,9 @@ if __name__ == "__main__":
             {"value": 10, "time": "2023-01-01"},
             {"value": 20, "time": "2023-01-02"}
         ]
-        # Mock historical data
-        mock_data = [
-            DynamicData(timestamp=datetime.now(), identifier="test_data", data={"value": "15", "time": "2022-12-31"})
-        ]
-        db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = mock_data
+        # Mock registry entry
+        mock_schema = SchemaVersion(identifier="test_data", version=1, field_types={"value": "categorical"})
+        db.query.return_value.filter.return_value.order_by.return_value.first.return_value = mock_schema
         
         result = await learn_schema(db, "test_data", raw_data)
         print(result)
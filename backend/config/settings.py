@@ -70,6 +70,70 @@ class Settings(BaseModel):
         env="OPENAI_API_KEY",
         description="OpenAI API key for AI insights"
     )
+    AI_INSIGHTS_MAX_CONCURRENCY: int = Field(
+        default=4,
+        env="AI_INSIGHTS_MAX_CONCURRENCY",
+        description="Maximum number of AI insight requests running concurrently in the background"
+    )
+
+    # KPI monitoring scheduler settings
+    KPI_MONITOR_INTERVAL: int = Field(
+        default=60,
+        env="KPI_MONITOR_INTERVAL",
+        description="Seconds between fleet-wide KPI monitoring sweeps"
+    )
+    KPI_MONITOR_BATCH_SIZE: int = Field(
+        default=500,
+        env="KPI_MONITOR_BATCH_SIZE",
+        description="Number of identifiers evaluated per monitoring task"
+    )
+    KPI_BASELINE_REFRESH_INTERVAL: int = Field(
+        default=86400,
+        env="KPI_BASELINE_REFRESH_INTERVAL",
+        description="Seconds between recomputations of the hour-of-week KPI baselines"
+    )
+    KPI_BASELINE_DAYS: int = Field(
+        default=28,
+        env="KPI_BASELINE_DAYS",
+        description="Days of hourly history used for the hour-of-week KPI baselines"
+    )
+
+    # Model store settings
+    MODEL_STORE_DIR: str = Field(
+        default="model_store",
+        env="MODEL_STORE_DIR",
+        description="Directory holding persisted, versioned models"
+    )
+    MODEL_STORE_KEEP_VERSIONS: int = Field(
+        default=3,
+        env="MODEL_STORE_KEEP_VERSIONS",
+        description="Number of versions kept per model for rollback"
+    )
+    MODEL_CACHE_SIZE: int = Field(
+        default=256,
+        env="MODEL_CACHE_SIZE",
+        description="Maximum number of models kept loaded in each process"
+    )
+    ANOMALY_MODEL_RETRAIN_INTERVAL: int = Field(
+        default=86400,
+        env="ANOMALY_MODEL_RETRAIN_INTERVAL",
+        description="Seconds between retraining runs of the issue detection anomaly models"
+    )
+    ANOMALY_MODEL_HISTORY_ROWS: int = Field(
+        default=5000,
+        env="ANOMALY_MODEL_HISTORY_ROWS",
+        description="Rows of history per identifier used to train an anomaly model"
+    )
+    FORECAST_MODEL_RETRAIN_INTERVAL: int = Field(
+        default=86400,
+        env="FORECAST_MODEL_RETRAIN_INTERVAL",
+        description="Seconds between retraining runs of the stored per-identifier LSTM forecasters"
+    )
+    GLOBAL_FORECAST_RETRAIN_INTERVAL: int = Field(
+        default=86400,
+        env="GLOBAL_FORECAST_RETRAIN_INTERVAL",
+        description="Seconds between retraining runs of the fleet-wide global forecasters"
+    )
 
     # Environment settings
     ENVIRONMENT: str = Field(
@@ -1,8 +1,9 @@
 from fastapi import FastAPI, WebSocket, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from utils.websocket import ws_manager
+from utils.websocket import ws_manager, relay_events
 from routers import auth, api
+from agents.issue_detection import shutdown_cluster_pool
 from config.settings import load_settings  # Import load_settings function
 from utils.logger import logger, configure_logger
 from utils.database import init_db, get_db, Base  # Adjusted imports
@@ -46,16 +47,19 @@ async def lifespan(app: FastAPI):
     """Handle startup and shutdown events."""
     logger.info("Starting application lifecycle")
     heartbeat_task = asyncio.create_task(agent_heartbeat())
-    logger.info("Application started with agent heartbeat task")
+    relay_task = asyncio.create_task(relay_events(ws_manager))  # Events emitted by Celery workers
+    logger.info("Application started with agent heartbeat and event relay tasks")
 
     yield
 
-    heartbeat_task.cancel()
-    try:
-        await heartbeat_task
-    except asyncio.CancelledError:
-        logger.info("Agent heartbeat task cancelled")
+    for task in (heartbeat_task, relay_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            logger.info("Background task cancelled")
     await ws_manager.close_all()
+    shutdown_cluster_pool()
     logger.info("Application shutdown complete")
 
 app = FastAPI(lifespan=lifespan)
@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime, Index, UniqueConstraint
+from utils.database import Base
+from datetime import datetime
+from typing import Dict, Any
+
+class ChangePoint(Base):
+    """Model holding a detected change point (shift in level or variance) in one KPI column of an identifier."""
+
+    __tablename__ = "change_points"
+
+    # Primary fields
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True, doc="Unique identifier for the change point")
+    identifier = Column(String, nullable=False, doc="Unique identifier for the data source or context")
+    column = Column(String, nullable=False, doc="Numeric column the change was detected in")
+    changed_at = Column(DateTime, nullable=False, doc="Timestamp of the first sample after the change")
+    method = Column(String, nullable=False, doc="Detection method ('pelt', 'binseg' or 'cusum')")
+    mean_before = Column(Float, nullable=True, doc="Mean raw value of the regime before the change")
+    mean_after = Column(Float, nullable=True, doc="Raw level after the change: mean_before plus the seasonally adjusted shift")
+    magnitude = Column(Float, nullable=True, doc="mean_after - mean_before, net of the hour-of-week baseline when one exists")
+
+    # Metadata fields
+    detected_at = Column(DateTime, default=datetime.utcnow, nullable=False, doc="When the change point was detected")
+
+    # Re-running detection over overlapping windows must not duplicate change points
+    __table_args__ = (
+        UniqueConstraint("identifier", "column", "changed_at", "method", name="uq_change_points_identifier_column_changed_at_method"),
+        Index("ix_change_points_identifier_changed_at", "identifier", "changed_at"),
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the model instance to a dictionary.
+
+        Returns:
+            Dict[str, Any]: Dictionary representation of the instance.
+        """
+        return {
+            "id": self.id,
+            "identifier": self.identifier,
+            "column": self.column,
+            "changed_at": self.changed_at.isoformat() if self.changed_at else None,
+            "method": self.method,
+            "mean_before": self.mean_before,
+            "mean_after": self.mean_after,
+            "magnitude": self.magnitude,
+            "detected_at": self.detected_at.isoformat() if self.detected_at else None
+        }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime, Index, ForeignKey
+from sqlalchemy import Column, Integer, String, Enum, DateTime, Index, ForeignKey, JSON
 from sqlalchemy.orm import validates
 from utils.database import Base
 from utils.logger import logger
@@ -23,16 +23,24 @@ class Issue(Base):
     identifier = Column(String, index=True, nullable=False, doc="Unique identifier linking to the data source or context")
     description = Column(String, nullable=False, doc="Description of the detected issue")
     severity = Column(Enum(SeverityLevel), nullable=False, default=SeverityLevel.MEDIUM, doc="Severity level of the issue")
+    issue_type = Column(String, nullable=True, doc="Kind of issue (e.g., 'anomaly', 'trend', 'clusters')")
+    column = Column(String, nullable=True, doc="Column the issue concerns, if specific to one")
+    fingerprint = Column(String, unique=True, nullable=True, doc="Hash of identifier, type and column; one row per recurring issue")
+    details = Column(JSON, nullable=True, doc="Detector-specific details of the latest detection")
+    occurrences = Column(Integer, default=1, nullable=False, doc="Number of detection runs that reported the issue")
 
     # Metadata fields
     agent_id = Column(String, nullable=True, doc="ID of the agent that detected this issue")
     detected_at = Column(DateTime, default=datetime.utcnow, nullable=False, doc="Timestamp when the issue was detected")
+    last_seen_at = Column(DateTime, default=datetime.utcnow, nullable=False, doc="Timestamp of the latest detection")
     resolved_at = Column(DateTime, nullable=True, doc="Timestamp when the issue was resolved")
     status = Column(String, default="open", nullable=False, doc="Current status of the issue (e.g., 'open', 'resolved')")
 
-    # Define composite index for efficient querying
+    # Define composite indexes for efficient querying (per identifier, and dashboard filters by status/severity)
     __table_args__ = (
         Index("ix_issues_identifier_detected_at", "identifier", "detected_at"),
+        Index("ix_issues_identifier_status", "identifier", "status"),
+        Index("ix_issues_status_severity_last_seen_at", "status", "severity", "last_seen_at"),
     )
 
     @validates("identifier")
@@ -111,8 +119,14 @@ class Issue(Base):
             "identifier": self.identifier,
             "description": self.description,
             "severity": self.severity.value if self.severity else None,
+            "type": self.issue_type,
+            "column": self.column,
+            "fingerprint": self.fingerprint,
+            "details": self.details,
+            "occurrences": self.occurrences,
             "agent_id": self.agent_id,
             "detected_at": self.detected_at.isoformat() if self.detected_at else None,
+            "last_seen_at": self.last_seen_at.isoformat() if self.last_seen_at else None,
             "resolved_at": self.resolved_at.isoformat() if self.resolved_at else None,
             "status": self.status
         }
@@ -134,6 +148,10 @@ class Issue(Base):
                 identifier=data["identifier"],
                 description=data["description"],
                 severity=data.get("severity", "medium"),
+                issue_type=data.get("type"),
+                column=data.get("column"),
+                fingerprint=data.get("fingerprint"),
+                details=data.get("details"),
                 agent_id=agent_id or data.get("agent_id"),
                 detected_at=datetime.fromisoformat(data["detected_at"]) if data.get("detected_at") else datetime.utcnow(),
                 resolved_at=datetime.fromisoformat(data["resolved_at"]) if data.get("resolved_at") else None,
@@ -0,0 +1,96 @@
+from sqlalchemy import Column, Integer, JSON, String, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import validates
+from utils.database import Base
+from utils.logger import logger
+from datetime import datetime
+from typing import Dict, Any, List
+
+HOURS_PER_WEEK = 168
+
+class KpiBaseline(Base):
+    """Model holding robust per-hour-of-week baselines of one KPI column of an identifier."""
+
+    __tablename__ = "kpi_baselines"
+
+    # Primary fields
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True, doc="Unique identifier for the baseline")
+    identifier = Column(String, index=True, nullable=False, doc="Unique identifier for the data source or context")
+    column = Column(String, nullable=False, doc="Numeric column the baseline describes")
+    medians = Column(JSON, nullable=False, doc="168 medians, indexed by hour of week (Monday 00:00 = 0)")
+    mads = Column(JSON, nullable=False, doc="168 median absolute deviations, indexed by hour of week")
+    counts = Column(JSON, nullable=False, doc="168 sample counts, indexed by hour of week")
+    history_days = Column(Integer, nullable=False, default=28, doc="Days of history the baseline was computed from")
+
+    # Metadata fields
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False, doc="When the baseline was computed")
+
+    # One baseline per (identifier, column); lookups are a single index scan
+    __table_args__ = (
+        UniqueConstraint("identifier", "column", name="uq_kpi_baselines_identifier_column"),
+        Index("ix_kpi_baselines_identifier_column", "identifier", "column"),
+    )
+
+    @validates("medians", "mads", "counts")
+    def validate_profile(self, key: str, value: List[Any]) -> List[Any]:
+        """
+        Validate an hour-of-week profile.
+
+        Args:
+            key (str): Field name ('medians', 'mads' or 'counts').
+            value (list): Value to validate.
+
+        Returns:
+            list: Validated profile.
+
+        Raises:
+            ValueError: If the profile does not have one entry per hour of the week.
+        """
+        if not isinstance(value, list) or len(value) != HOURS_PER_WEEK:
+            logger.error(f"Invalid {key} profile for {self.identifier}: expected {HOURS_PER_WEEK} entries")
+            raise ValueError(f"{key} must be a list of {HOURS_PER_WEEK} values")
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the model instance to a dictionary.
+
+        Returns:
+            Dict[str, Any]: Dictionary representation of the instance.
+        """
+        return {
+            "id": self.id,
+            "identifier": self.identifier,
+            "column": self.column,
+            "medians": self.medians,
+            "mads": self.mads,
+            "counts": self.counts,
+            "history_days": self.history_days,
+            "computed_at": self.computed_at.isoformat() if self.computed_at else None
+        }
+
+if __name__ == "__main__":
+    # Test the model
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session as OrmSession
+
+    # Setup test database
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+
+    with OrmSession(engine) as session:
+        baseline = KpiBaseline(
+            identifier="test_data",
+            column="value",
+            medians=[10.0] * HOURS_PER_WEEK,
+            mads=[1.0] * HOURS_PER_WEEK,
+            counts=[4] * HOURS_PER_WEEK
+        )
+        session.add(baseline)
+        session.commit()
+        print("Retrieved:", session.query(KpiBaseline).first().to_dict()["column"])
+
+        # Test validation
+        try:
+            KpiBaseline(identifier="test_data", column="load", medians=[1.0], mads=[], counts=[])
+        except ValueError as e:
+            print(f"Validation Error: {e}")
@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime, Index, UniqueConstraint
+from utils.database import Base
+from datetime import datetime
+from typing import Dict, Any
+
+class KpiHourlyRollup(Base):
+    """Model holding hourly aggregates of raw (unscaled) KPI values, written on ingest."""
+
+    __tablename__ = "kpi_hourly_rollups"
+
+    # Primary fields
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True, doc="Unique identifier for the rollup")
+    identifier = Column(String, nullable=False, doc="Unique identifier for the data source or context")
+    column = Column(String, nullable=False, doc="Numeric column the rollup describes")
+    hour = Column(DateTime, nullable=False, doc="Start of the hour (UTC)")
+    count = Column(Integer, nullable=False, default=0, doc="Number of samples in the hour")
+    mean = Column(Float, nullable=False, doc="Mean of the raw values in the hour")
+    min = Column(Float, nullable=True, doc="Minimum raw value in the hour")
+    max = Column(Float, nullable=True, doc="Maximum raw value in the hour")
+
+    # Metadata fields
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, doc="Last update timestamp")
+
+    # Baseline jobs scan (identifier, hour) ranges
+    __table_args__ = (
+        UniqueConstraint("identifier", "column", "hour", name="uq_kpi_hourly_rollups_identifier_column_hour"),
+        Index("ix_kpi_hourly_rollups_identifier_hour", "identifier", "hour"),
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the model instance to a dictionary.
+
+        Returns:
+            Dict[str, Any]: Dictionary representation of the instance.
+        """
+        return {
+            "id": self.id,
+            "identifier": self.identifier,
+            "column": self.column,
+            "hour": self.hour.isoformat() if self.hour else None,
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min,
+            "max": self.max,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,43 @@
+from sqlalchemy import Column, Integer, JSON, String, DateTime, Index, UniqueConstraint
+from utils.database import Base
+from datetime import datetime
+from typing import Dict, Any
+
+class KpiQuantileSketch(Base):
+    """Model holding one shard of the fleet-wide quantile sketch of a KPI for a time bucket."""
+
+    __tablename__ = "kpi_quantile_sketches"
+
+    # Primary fields
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True, doc="Unique identifier for the sketch shard")
+    kpi = Column(String, nullable=False, doc="KPI (numeric column) the sketch summarizes")
+    bucket_start = Column(DateTime, nullable=False, doc="Start of the time bucket (UTC)")
+    shard = Column(Integer, nullable=False, default=0, doc="Shard number; identifiers hash to shards to spread write locks")
+    sketch = Column(JSON, nullable=False, doc="Serialized KLL sketch")
+    count = Column(Integer, nullable=False, default=0, doc="Number of values folded into the shard")
+
+    # Metadata fields
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, doc="Last update timestamp")
+
+    # Reads merge all shards of one (kpi, bucket); writes lock a single shard row
+    __table_args__ = (
+        UniqueConstraint("kpi", "bucket_start", "shard", name="uq_kpi_quantile_sketches_kpi_bucket_shard"),
+        Index("ix_kpi_quantile_sketches_kpi_bucket", "kpi", "bucket_start"),
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the model instance to a dictionary.
+
+        Returns:
+            Dict[str, Any]: Dictionary representation of the instance.
+        """
+        return {
+            "id": self.id,
+            "kpi": self.kpi,
+            "bucket_start": self.bucket_start.isoformat() if self.bucket_start else None,
+            "shard": self.shard,
+            "sketch": self.sketch,
+            "count": self.count,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
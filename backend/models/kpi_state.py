@@ -0,0 +1,106 @@
+from sqlalchemy import Column, Integer, JSON, String, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import validates
+from utils.database import Base
+from utils.logger import logger
+from datetime import datetime
+from typing import Dict, Any
+
+class KpiState(Base):
+    """Model holding the incrementally maintained KPI state of one column of an identifier."""
+
+    __tablename__ = "kpi_states"
+
+    # Primary fields
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True, doc="Unique identifier for the KPI state")
+    identifier = Column(String, index=True, nullable=False, doc="Unique identifier for the data source or context")
+    column = Column(String, nullable=False, doc="Numeric column the KPIs are computed for")
+    state = Column(JSON, nullable=False, default=dict, doc="Serialized running moments, window and regression sums")
+    sample_count = Column(Integer, nullable=False, default=0, doc="Number of samples folded into the state")
+    last_timestamp = Column(DateTime, nullable=True, doc="Timestamp of the newest sample folded into the state")
+
+    # Metadata fields
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True, nullable=False, doc="Last update timestamp")
+
+    # One state row per (identifier, column); monitoring reads them with a single index scan
+    __table_args__ = (
+        UniqueConstraint("identifier", "column", name="uq_kpi_states_identifier_column"),
+        Index("ix_kpi_states_identifier_column", "identifier", "column"),
+    )
+
+    @validates("identifier")
+    def validate_identifier(self, key: str, value: str) -> str:
+        """
+        Validate the identifier field.
+
+        Args:
+            key (str): Field name ('identifier').
+            value (str): Value to validate.
+
+        Returns:
+            str: Validated identifier.
+
+        Raises:
+            ValueError: If identifier is empty or too long.
+        """
+        if not value or len(value.strip()) == 0:
+            logger.error("Identifier cannot be empty")
+            raise ValueError("Identifier cannot be empty")
+        if len(value) > 255:
+            logger.warning(f"Identifier truncated from {len(value)} to 255 characters")
+            return value[:255]
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the model instance to a dictionary.
+
+        Returns:
+            Dict[str, Any]: Dictionary representation of the instance.
+        """
+        return {
+            "id": self.id,
+            "identifier": self.identifier,
+            "column": self.column,
+            "state": self.state,
+            "sample_count": self.sample_count,
+            "last_timestamp": self.last_timestamp.isoformat() if self.last_timestamp else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "KpiState":
+        """
+        Create a KpiState instance from a dictionary.
+
+        Args:
+            data (Dict[str, Any]): Data dictionary with fields.
+
+        Returns:
+            KpiState: New instance of the model.
+        """
+        try:
+            return cls(
+                identifier=data["identifier"],
+                column=data["column"],
+                state=data.get("state", {}),
+                sample_count=data.get("sample_count", 0),
+                last_timestamp=datetime.fromisoformat(data["last_timestamp"]) if data.get("last_timestamp") else None
+            )
+        except Exception as e:
+            logger.error(f"Failed to create KpiState from dict: {e}")
+            raise ValueError(f"Invalid data for KpiState: {e}")
+
+if __name__ == "__main__":
+    # Test the model
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session as OrmSession
+
+    # Setup test database
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+
+    with OrmSession(engine) as session:
+        state = KpiState.from_dict({"identifier": "test_data", "column": "value", "state": {"count": 3}, "sample_count": 3})
+        session.add(state)
+        session.commit()
+        print("Retrieved:", session.query(KpiState).first().to_dict())
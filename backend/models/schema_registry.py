@@ -0,0 +1,155 @@
+from sqlalchemy import Column, Integer, JSON, String, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import validates
+from utils.database import Base
+from utils.logger import logger
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+class SchemaVersion(Base):
+    """Model representing one version of the learned schema for an identifier."""
+
+    __tablename__ = "schema_versions"
+
+    # Primary fields
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True, doc="Unique identifier for the schema version")
+    identifier = Column(String, index=True, nullable=False, doc="Unique identifier for the data source or context")
+    version = Column(Integer, nullable=False, default=1, doc="Monotonically increasing schema version per identifier")
+    field_types = Column(JSON, nullable=False, default=dict, doc="Mapping of column names to inferred types")
+    stats = Column(JSON, nullable=True, default=dict, doc="Mergeable per-column statistics (count, mean, m2, min, max)")
+    row_count = Column(Integer, nullable=False, default=0, doc="Number of rows ingested under this version")
+
+    # Metadata fields
+    agent_id = Column(String, nullable=True, doc="ID of the agent that created or last updated this version")
+    first_seen = Column(DateTime, default=datetime.utcnow, nullable=False, doc="When this schema version was first observed")
+    last_seen = Column(DateTime, default=datetime.utcnow, nullable=False, doc="When data matching this version was last ingested")
+
+    # Latest-version lookups are a single index scan on (identifier, version)
+    __table_args__ = (
+        UniqueConstraint("identifier", "version", name="uq_schema_versions_identifier_version"),
+        Index("ix_schema_versions_identifier_version", "identifier", "version"),
+    )
+
+    @validates("identifier")
+    def validate_identifier(self, key: str, value: str) -> str:
+        """
+        Validate the identifier field.
+
+        Args:
+            key (str): Field name ('identifier').
+            value (str): Value to validate.
+
+        Returns:
+            str: Validated identifier.
+
+        Raises:
+            ValueError: If identifier is empty or too long.
+        """
+        if not value or len(value.strip()) == 0:
+            logger.error("Identifier cannot be empty")
+            raise ValueError("Identifier cannot be empty")
+        if len(value) > 255:
+            logger.warning(f"Identifier truncated from {len(value)} to 255 characters")
+            return value[:255]
+        return value
+
+    @validates("field_types")
+    def validate_field_types(self, key: str, value: Any) -> Dict[str, str]:
+        """
+        Validate the field_types mapping.
+
+        Args:
+            key (str): Field name ('field_types').
+            value (Any): Value to validate.
+
+        Returns:
+            Dict[str, str]: Validated mapping.
+
+        Raises:
+            ValueError: If the value is not a dictionary.
+        """
+        if not isinstance(value, dict):
+            logger.error(f"Invalid field_types for {self.identifier}: {value}")
+            raise ValueError("field_types must be a dictionary")
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the model instance to a dictionary.
+
+        Returns:
+            Dict[str, Any]: Dictionary representation of the instance.
+        """
+        return {
+            "id": self.id,
+            "identifier": self.identifier,
+            "version": self.version,
+            "field_types": self.field_types,
+            "stats": self.stats,
+            "row_count": self.row_count,
+            "agent_id": self.agent_id,
+            "first_seen": self.first_seen.isoformat() if self.first_seen else None,
+            "last_seen": self.last_seen.isoformat() if self.last_seen else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], agent_id: Optional[str] = None) -> "SchemaVersion":
+        """
+        Create a SchemaVersion instance from a dictionary.
+
+        Args:
+            data (Dict[str, Any]): Data dictionary with fields.
+            agent_id (str, optional): ID of the agent creating the instance.
+
+        Returns:
+            SchemaVersion: New instance of the model.
+        """
+        try:
+            now = datetime.utcnow()
+            instance = cls(
+                identifier=data["identifier"],
+                version=data.get("version", 1),
+                field_types=data["field_types"],
+                stats=data.get("stats", {}),
+                row_count=data.get("row_count", 0),
+                agent_id=agent_id or data.get("agent_id"),
+                first_seen=datetime.fromisoformat(data["first_seen"]) if data.get("first_seen") else now,
+                last_seen=datetime.fromisoformat(data["last_seen"]) if data.get("last_seen") else now
+            )
+            return instance
+        except Exception as e:
+            logger.error(f"Failed to create SchemaVersion from dict: {e}")
+            raise ValueError(f"Invalid data for SchemaVersion: {e}")
+
+if __name__ == "__main__":
+    # Test the model
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session as OrmSession
+
+    # Setup test database
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+
+    with OrmSession(engine) as session:
+        # Test creation
+        test_data = {
+            "identifier": "test_data",
+            "version": 1,
+            "field_types": {"value": "numeric", "timestamp": "timestamp"},
+            "row_count": 3,
+            "agent_id": "schema_learning_agent_1"
+        }
+        schema = SchemaVersion.from_dict(test_data)
+        session.add(schema)
+        session.commit()
+
+        # Test retrieval
+        retrieved = session.query(SchemaVersion).first()
+        print("Retrieved:", retrieved.to_dict())
+
+        # Test validation
+        try:
+            invalid_schema = SchemaVersion(identifier="", field_types=[])
+            session.add(invalid_schema)
+            session.commit()
+        except ValueError as e:
+            print(f"Validation Error: {e}")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, UploadFile, File, Query
 from sqlalchemy.orm import Session
 from utils.database import get_db
 from utils.security import oauth2_scheme
@@ -11,11 +11,16 @@ from agents import (
     root_cause_analysis,
     optimization_proposal
 )
+from utils.ai import get_insights_status
+from utils.percentiles import kpi_percentile, fleet_distribution
+from utils.issues import query_issues
+from utils.changepoints import detect_change_points, get_change_points
 from pydantic import BaseModel
 import pandas as pd
 import io
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from fastapi.responses import JSONResponse
+from datetime import datetime, timezone
 
 router = APIRouter(prefix="/api", tags=["Data Operations"])
 
@@ -24,9 +29,31 @@ class SourceConfig(BaseModel):
     type: str
     config: Dict[str, Any]
 
+class MonitorBatchRequest(BaseModel):
+    identifiers: List[str]
+    config: Optional[Dict[str, Any]] = None
+
+class IssueBatchRequest(BaseModel):
+    identifiers: List[str]
+    config: Optional[Dict[str, Any]] = None
+
+class ChangePointRequest(BaseModel):
+    columns: Optional[List[str]] = None
+    method: Optional[str] = "pelt"
+    max_rows: Optional[int] = 2000
+    penalty: Optional[float] = None
+    model: Optional[str] = "l2"
+    min_size: Optional[int] = 5
+
 class PredictionConfig(BaseModel):
     lookback: Optional[int] = 10
     forecast_steps: Optional[int] = 5
+    backend: Optional[str] = "auto"
+    season_length: Optional[int] = None
+
+class FleetPredictionRequest(BaseModel):
+    identifiers: List[str]
+    config: Optional[Dict[str, Any]] = None
 
 class OptimizationRequest(BaseModel):
     causes: Optional[list] = None
@@ -121,6 +148,23 @@ async def upload_csv(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"CSV ingestion failed: {str(e)}")
 
+@router.get("/insights/{handle}")
+async def get_insights(
+    handle: str,
+    agent_id: str = Depends(get_agent_id)
+):
+    """
+    Retrieve the status of a background AI insights job started during preprocessing.
+
+    Args:
+        handle (str): Insights handle returned in the preprocessing result.
+        agent_id (str): Identifier for the requesting agent.
+
+    Returns:
+        dict: Job status and insights once complete.
+    """
+    return get_insights_status(handle)
+
 @router.get("/schema/{identifier}")
 async def get_schema(
     identifier: str,
@@ -138,10 +182,32 @@ async def get_schema(
     Returns:
         dict: Learned schema and metadata.
     """
-    # Use empty raw_data to fetch cached/historical schema
+    # Empty raw_data reads the latest version from the schema registry
     result = await schema_learning.learn_schema(db, identifier, [], agent_id=agent_id, source_agent=agent_id)
     return result
 
+@router.get("/schema/{identifier}/versions")
+async def get_schema_versions(
+    identifier: str,
+    db: Session = Depends(get_db),
+    agent_id: str = Depends(get_agent_id)
+):
+    """
+    Retrieve the schema version history for the specified identifier.
+
+    Args:
+        identifier (str): Unique identifier for the data.
+        db (Session): Database session.
+        agent_id (str): Identifier for the requesting agent.
+
+    Returns:
+        dict: Registered schema versions with the changes introduced by each.
+    """
+    versions = schema_learning.get_schema_history(db, identifier)
+    if not versions:
+        raise HTTPException(status_code=404, detail=f"No schema registered for {identifier}")
+    return {"identifier": identifier, "versions": versions}
+
 @router.get("/monitor/{identifier}")
 async def monitor(
     identifier: str,
@@ -162,6 +228,156 @@ async def monitor(
     result = await kpi_monitoring.monitor_kpis(db, identifier, agent_id=agent_id, source_agent=agent_id)
     return result
 
+@router.post("/monitor/batch")
+async def monitor_batch(
+    request: MonitorBatchRequest,
+    db: Session = Depends(get_db),
+    agent_id: str = Depends(get_agent_id)
+):
+    """
+    Monitor KPIs for many identifiers in one query and one vectorized pass.
+
+    Args:
+        request (MonitorBatchRequest): Identifiers and optional monitoring configuration.
+        db (Session): Database session.
+        agent_id (str): Identifier for the KPI monitoring agent.
+
+    Returns:
+        dict: Per-identifier monitoring results and the anomalous identifiers.
+    """
+    if not request.identifiers:
+        raise HTTPException(status_code=400, detail="No identifiers provided")
+    result = await kpi_monitoring.monitor_kpis_fleet(
+        db, request.identifiers, request.config, agent_id=agent_id, source_agent=agent_id
+    )
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
+# Helper function to normalize a requested bucket to the start of its UTC hour
+def _hour_bucket(bucket: Optional[datetime]) -> Optional[datetime]:
+    if bucket is None:
+        return None
+    if bucket.tzinfo is not None:
+        bucket = bucket.astimezone(timezone.utc).replace(tzinfo=None)
+    return bucket.replace(minute=0, second=0, microsecond=0)
+
+@router.get("/percentile/{identifier}")
+async def get_percentile(
+    identifier: str,
+    kpi: str,
+    bucket: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    agent_id: str = Depends(get_agent_id)
+):
+    """
+    Rank an identifier's KPI against the rest of the network.
+
+    Args:
+        identifier (str): Unique identifier for the cell.
+        kpi (str): KPI column to rank.
+        bucket (datetime, optional): Hour to compare in (defaults to the hour of the latest value).
+        db (Session): Database session.
+        agent_id (str): Identifier for the requesting agent.
+
+    Returns:
+        dict: The cell's value, its network percentile and the network distribution.
+    """
+    result = kpi_percentile(db, identifier, kpi, _hour_bucket(bucket))
+    if result["status"] == "no data":
+        raise HTTPException(status_code=404, detail=result["message"])
+    return result
+
+@router.get("/fleet/{kpi}/distribution")
+async def get_fleet_distribution(
+    kpi: str,
+    bucket: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    agent_id: str = Depends(get_agent_id)
+):
+    """
+    Retrieve the network-wide distribution of a KPI for an hour.
+
+    Args:
+        kpi (str): KPI column.
+        bucket (datetime, optional): Hour to describe (defaults to the current hour).
+        db (Session): Database session.
+        agent_id (str): Identifier for the requesting agent.
+
+    Returns:
+        dict: Sample count, min/max and quantiles across all identifiers.
+    """
+    bucket_start = _hour_bucket(bucket or datetime.utcnow())
+    result = fleet_distribution(db, kpi, bucket_start)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No fleet data for {kpi} at {bucket_start.isoformat()}")
+    return result
+
+@router.get("/issues")
+async def list_issues(
+    identifier: Optional[str] = None,
+    status: Optional[str] = None,
+    severity: Optional[str] = None,
+    type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    agent_id: str = Depends(get_agent_id)
+):
+    """
+    List stored issues with filtering and pagination, without rerunning detection.
+
+    Args:
+        identifier (str, optional): Only issues of this identifier.
+        status (str, optional): 'open', 'in_progress' or 'resolved'.
+        severity (str, optional): 'low', 'medium', 'high' or 'critical'.
+        type (str, optional): Issue kind (e.g., 'anomaly', 'trend', 'clusters').
+        since (datetime, optional): Only issues seen at or after this time.
+        page (int): 1-based page number.
+        page_size (int): Issues per page.
+        db (Session): Database session.
+        agent_id (str): Identifier for the requesting agent.
+
+    Returns:
+        dict: Total matching issues and the requested page.
+    """
+    if status and status.lower() not in {"open", "in_progress", "resolved"}:
+        raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
+    if severity and severity.lower() not in {"low", "medium", "high", "critical"}:
+        raise HTTPException(status_code=400, detail=f"Invalid severity: {severity}")
+    result = query_issues(
+        db, identifier=identifier, status=status, severity=severity, issue_type=type,
+        since=since, limit=page_size, offset=(page - 1) * page_size
+    )
+    return {**result, "page": page, "page_size": page_size}
+
+@router.post("/issues/batch")
+async def detect_issues_batch(
+    request: IssueBatchRequest,
+    db: Session = Depends(get_db),
+    agent_id: str = Depends(get_agent_id)
+):
+    """
+    Detect issues for many identifiers and return the problem cells ranked by severity.
+
+    Args:
+        request (IssueBatchRequest): Identifiers and optional detection configuration.
+        db (Session): Database session.
+        agent_id (str): Identifier for the issue detection agent.
+
+    Returns:
+        dict: Ranked problem cells with their issues.
+    """
+    if not request.identifiers:
+        raise HTTPException(status_code=400, detail="No identifiers provided")
+    result = await issue_detection.detect_issues_batch(
+        db, request.identifiers, request.config, agent_id=agent_id, source_agent=agent_id
+    )
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
 @router.get("/issues/{identifier}")
 async def detect_issues(
     identifier: str,
@@ -202,6 +418,87 @@ async def analyze_root_cause(
     result = await root_cause_analysis.analyze_root_cause(db, identifier, agent_id=agent_id, source_agent=agent_id)
     return result
 
+@router.post("/change-points/{identifier}")
+async def run_change_point_detection(
+    identifier: str,
+    request: Optional[ChangePointRequest] = None,
+    db: Session = Depends(get_db),
+    agent_id: str = Depends(get_agent_id)
+):
+    """
+    Detect and store change points in the latest hourly history of an identifier's raw KPIs.
+
+    Args:
+        identifier (str): Unique identifier for the data.
+        request (ChangePointRequest, optional): Columns, method ('pelt' or 'binseg') and search settings (max_rows in hours).
+        db (Session): Database session.
+        agent_id (str): Identifier for the requesting agent.
+
+    Returns:
+        dict: Change points per column, newest first.
+    """
+    request = request or ChangePointRequest()
+    if request.method not in {"pelt", "binseg"} or request.model not in {"l2", "normal"}:
+        raise HTTPException(status_code=400, detail="method must be 'pelt' or 'binseg' and model 'l2' or 'normal'")
+    result = detect_change_points(
+        db, identifier, request.columns, request.method, request.max_rows,
+        request.penalty, request.model, request.min_size
+    )
+    if result["status"] == "no data":
+        raise HTTPException(status_code=404, detail=f"No data for {identifier}")
+    return result
+
+@router.get("/change-points/{identifier}")
+async def list_change_points(
+    identifier: str,
+    column: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    agent_id: str = Depends(get_agent_id)
+):
+    """
+    Retrieve stored change points (batch and online) of an identifier, newest first.
+
+    Args:
+        identifier (str): Unique identifier for the data.
+        column (str, optional): Only change points of this column.
+        since (datetime, optional): Only changes at or after this time.
+        limit (int): Maximum number of change points.
+        db (Session): Database session.
+        agent_id (str): Identifier for the requesting agent.
+
+    Returns:
+        dict: Stored change points.
+    """
+    return {"identifier": identifier, "change_points": get_change_points(db, identifier, column, since, limit)}
+
+@router.post("/predict/batch")
+async def predict_batch(
+    request: FleetPredictionRequest,
+    db: Session = Depends(get_db),
+    agent_id: str = Depends(get_agent_id)
+):
+    """
+    Forecast the KPIs of many identifiers with the fleet-wide global models.
+
+    Args:
+        request (FleetPredictionRequest): Identifiers and optional prediction configuration.
+        db (Session): Database session.
+        agent_id (str): Identifier for the prediction agent.
+
+    Returns:
+        dict: Forecasts per identifier and KPI.
+    """
+    if not request.identifiers:
+        raise HTTPException(status_code=400, detail="No identifiers provided")
+    result = await prediction.predict_kpis_batch(
+        db, request.identifiers, request.config, agent_id=agent_id, source_agent=agent_id
+    )
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
 @router.post("/predict/{identifier}")
 async def predict(
     identifier: str,
@@ -1,6 +1,7 @@
 from celery import Celery
 from config.settings import settings
 from utils.logger import logger
+from utils.database import init_db
 from celery.signals import worker_process_init, celeryd_after_setup
 import os
 from typing import Dict, Any
@@ -31,7 +32,9 @@ def configure_celery() -> Celery:
             "agents.kpi_monitoring",
             "agents.schema_learning",
             "agents.root_cause_analysis",
-            "agents.optimization_proposal"
+            "agents.optimization_proposal",
+            "tasks.monitoring",
+            "tasks.training"
         ]
     )
 
@@ -72,7 +75,38 @@ def configure_celery() -> Celery:
             "agents.kpi_monitoring.*": {"queue": "monitoring"},
             "agents.schema_learning.*": {"queue": "schema"},
             "agents.root_cause_analysis.*": {"queue": "analysis"},
-            "agents.optimization_proposal.*": {"queue": "optimization"}
+            "agents.optimization_proposal.*": {"queue": "optimization"},
+            "tasks.monitoring.*": {"queue": "monitoring"},
+            "tasks.training.*": {"queue": "training"}
+        },
+
+        # Periodic tasks (run with `celery beat`)
+        beat_schedule={
+            "kpi-monitoring-sweep": {
+                "task": "tasks.monitoring.schedule_kpi_monitoring",
+                "schedule": float(settings.KPI_MONITOR_INTERVAL),
+                "options": {"queue": "monitoring", "expires": settings.KPI_MONITOR_INTERVAL}
+            },
+            "kpi-baseline-refresh": {
+                "task": "tasks.monitoring.refresh_kpi_baselines",
+                "schedule": float(settings.KPI_BASELINE_REFRESH_INTERVAL),
+                "options": {"queue": "monitoring"}
+            },
+            "anomaly-model-retrain": {
+                "task": "tasks.training.retrain_anomaly_models",
+                "schedule": float(settings.ANOMALY_MODEL_RETRAIN_INTERVAL),
+                "options": {"queue": "training"}
+            },
+            "forecaster-retrain": {
+                "task": "tasks.training.retrain_forecasters",
+                "schedule": float(settings.FORECAST_MODEL_RETRAIN_INTERVAL),
+                "options": {"queue": "training"}
+            },
+            "global-forecaster-retrain": {
+                "task": "tasks.training.train_global_forecasters",
+                "schedule": float(settings.GLOBAL_FORECAST_RETRAIN_INTERVAL),
+                "options": {"queue": "training"}
+            }
         },
 
         # Task default settings
@@ -95,7 +129,11 @@ celery_app = configure_celery()
 # Signal to initialize worker process
 @worker_process_init.connect
 def init_worker(**kwargs) -> None:
-    """Initialize worker process with logging."""
+    """Initialize worker process with logging and a database connection pool."""
+    init_db(settings.DATABASE_URL)
+    # Workers have no WebSocket clients; their agent events reach them through the API's relay
+    from agents.eda_preprocessing import AgentEventEmitter
+    AgentEventEmitter.relay = True
     logger.info(f"Celery worker process initialized: PID={os.getpid()}")
 
 # Signal after Celery daemon setup
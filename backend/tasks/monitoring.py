@@ -0,0 +1,133 @@
+from celery import chord
+from tasks.celery_config import celery_app
+from config.settings import settings
+from utils.database import session_scope
+from utils.cache import cache_get, cache_set, cache_delete
+from utils.kpi import get_updated_identifiers
+from utils.baselines import refresh_baselines
+from utils.logger import logger
+from agents.kpi_monitoring import monitor_kpis_batch
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import asyncio
+
+# Cache key holding the start time of the last fleet sweep
+SWEEP_WATERMARK_KEY = "kpi_monitor_sweep_watermark"
+# Cache key set while a sweep's batches are outstanding, so a backlog is not dispatched twice
+SWEEP_RUNNING_KEY = "kpi_monitor_sweep_running"
+
+# Helper function to split identifiers into worker-sized batches
+def _batches(identifiers: List[str], size: int) -> List[List[str]]:
+    return [identifiers[i:i + size] for i in range(0, len(identifiers), size)]
+
+@celery_app.task(name="tasks.monitoring.schedule_kpi_monitoring")
+def schedule_kpi_monitoring(full_sweep: bool = False) -> Dict[str, Any]:
+    """
+    Fan out KPI monitoring for every identifier with new data since the last sweep.
+
+    Runs on the beat schedule. Identifiers are split into batches of
+    KPI_MONITOR_BATCH_SIZE and dispatched to the monitoring queue, so the
+    sweep spreads across all monitoring workers. The batches run as a chord:
+    the watermark only advances once every batch has finished, so a backed-up
+    or failed batch is swept again next time instead of being dropped. Ticks
+    are skipped while a sweep is outstanding; the marker expires after a few
+    intervals in case a batch fails and the chord never completes.
+
+    Args:
+        full_sweep (bool): Evaluate every identifier, ignoring the watermark.
+
+    Returns:
+        dict: Number of identifiers and batches dispatched.
+    """
+    if cache_get(SWEEP_RUNNING_KEY) and not full_sweep:
+        logger.info("KPI scheduler skipped: the previous sweep is still running")
+        return {"identifiers": 0, "batches": 0, "skipped": True}
+    started_at = datetime.utcnow()
+    watermark = None if full_sweep else cache_get(SWEEP_WATERMARK_KEY)
+    since = datetime.fromisoformat(watermark) if watermark else None
+
+    with session_scope() as db:
+        identifiers = get_updated_identifiers(db, since)
+
+    batches = _batches(identifiers, settings.KPI_MONITOR_BATCH_SIZE)
+    # Recorded as of the query: states updated mid-sweep are picked up next time
+    if batches:
+        cache_set(SWEEP_RUNNING_KEY, started_at.isoformat(), ttl=5 * settings.KPI_MONITOR_INTERVAL)
+        chord(
+            [monitor_kpi_batch.s(batch).set(queue="monitoring") for batch in batches],
+            advance_sweep_watermark.s(started_at.isoformat()).set(queue="monitoring")
+        ).apply_async()
+    else:
+        advance_sweep_watermark([], started_at.isoformat())
+    logger.info(f"KPI scheduler dispatched {len(identifiers)} identifiers in {len(batches)} batches")
+    return {"identifiers": len(identifiers), "batches": len(batches), "since": watermark}
+
+@celery_app.task(name="tasks.monitoring.advance_sweep_watermark")
+def advance_sweep_watermark(results: List[Dict[str, Any]], started_at: str) -> Dict[str, Any]:
+    """
+    Move the sweep watermark forward once all batches of a sweep have completed.
+
+    Args:
+        results (list): Batch summaries from the chord header.
+        started_at (str): ISO start time of the sweep.
+
+    Returns:
+        dict: The watermark in effect.
+    """
+    current = cache_get(SWEEP_WATERMARK_KEY)
+    # Sweeps can finish out of order; never move the watermark backwards
+    if current is None or current < started_at:
+        cache_set(SWEEP_WATERMARK_KEY, started_at, ttl=7 * 86400)
+        current = started_at
+    cache_delete(SWEEP_RUNNING_KEY)
+    return {"batches": len(results), "watermark": current}
+
+@celery_app.task(name="tasks.monitoring.monitor_kpi_batch")
+def monitor_kpi_batch(identifiers: List[str], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Evaluate KPI anomalies for a batch of identifiers.
+
+    Args:
+        identifiers (list): Identifiers to evaluate.
+        config (dict, optional): Monitoring configuration (e.g., thresholds).
+
+    Returns:
+        dict: Batch evaluation summary.
+    """
+    with session_scope() as db:
+        return asyncio.run(monitor_kpis_batch(db, identifiers, config, agent_id="kpi_scheduler"))
+
+@celery_app.task(name="tasks.monitoring.refresh_kpi_baselines")
+def refresh_kpi_baselines() -> Dict[str, Any]:
+    """
+    Fan out the offline recomputation of hour-of-week baselines for all identifiers.
+
+    Returns:
+        dict: Number of identifiers and batches dispatched.
+    """
+    with session_scope() as db:
+        identifiers = get_updated_identifiers(db)
+    batches = _batches(identifiers, settings.KPI_MONITOR_BATCH_SIZE)
+    for batch in batches:
+        refresh_baseline_batch.apply_async(args=[batch], queue="monitoring")
+    logger.info(f"Baseline refresh dispatched {len(identifiers)} identifiers in {len(batches)} batches")
+    return {"identifiers": len(identifiers), "batches": len(batches)}
+
+@celery_app.task(name="tasks.monitoring.refresh_baseline_batch")
+def refresh_baseline_batch(identifiers: List[str]) -> Dict[str, Any]:
+    """
+    Recompute the hour-of-week baselines of a batch of identifiers.
+
+    Args:
+        identifiers (list): Identifiers to refresh.
+
+    Returns:
+        dict: Number of baselines written.
+    """
+    with session_scope() as db:
+        written = refresh_baselines(db, identifiers, days=settings.KPI_BASELINE_DAYS)
+    return {"identifiers": len(identifiers), "baselines": written}
+
+if __name__ == "__main__":
+    # Test batching
+    print(_batches([f"cell_{i}" for i in range(12)], 5))
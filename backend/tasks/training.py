@@ -0,0 +1,142 @@
+from tasks.celery_config import celery_app
+from config.settings import settings
+from utils.database import session_scope
+from utils.kpi import get_updated_identifiers
+from utils.logger import logger
+from utils.model_store import list_model_members, list_models
+from agents.issue_detection import train_anomaly_model, ANOMALY_MODEL_KIND
+from agents.prediction import train_forecasters, train_global_forecasters, FORECAST_MODEL_KIND
+from tasks.monitoring import _batches
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import json
+
+@celery_app.task(name="tasks.training.retrain_anomaly_models")
+def retrain_anomaly_models() -> Dict[str, Any]:
+    """
+    Fan out retraining of the per-identifier and shared cluster anomaly models.
+
+    Cluster models are retrained on the members recorded in the model store.
+    Only identifiers with new data since the previous run are retrained.
+
+    Returns:
+        dict: Number of identifiers, batches and cluster models dispatched.
+    """
+    since = datetime.utcnow() - timedelta(seconds=settings.ANOMALY_MODEL_RETRAIN_INTERVAL)
+    with session_scope() as db:
+        identifiers = get_updated_identifiers(db, since)
+    batches = _batches(identifiers, settings.KPI_MONITOR_BATCH_SIZE)
+    for batch in batches:
+        train_anomaly_model_batch.apply_async(args=[batch], queue="training")
+    clusters = list_model_members(ANOMALY_MODEL_KIND)
+    for model_key, members in clusters.items():
+        train_cluster_anomaly_model.apply_async(args=[model_key, members], queue="training")
+    logger.info(
+        f"Anomaly model retraining dispatched {len(identifiers)} identifiers in {len(batches)} batches "
+        f"and {len(clusters)} cluster models"
+    )
+    return {"identifiers": len(identifiers), "batches": len(batches), "clusters": len(clusters)}
+
+@celery_app.task(name="tasks.training.train_anomaly_model_batch")
+def train_anomaly_model_batch(model_keys: List[str], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Train and persist the anomaly models of a batch of identifiers.
+
+    Args:
+        model_keys (list): Identifiers to train a model for.
+        config (dict, optional): Training configuration.
+
+    Returns:
+        dict: Number of models trained.
+    """
+    trained = 0
+    with session_scope() as db:
+        for model_key in model_keys:
+            try:
+                trained += train_anomaly_model(db, model_key, config=config) is not None
+            except Exception as e:
+                logger.error(f"Anomaly model training failed for {model_key}: {e}")
+    return {"identifiers": len(model_keys), "trained": trained}
+
+@celery_app.task(name="tasks.training.train_cluster_anomaly_model")
+def train_cluster_anomaly_model(model_key: str, identifiers: List[str], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Train one shared anomaly model for a cluster of similar cells.
+
+    Args:
+        model_key (str): Name the cluster model is stored under.
+        identifiers (list): Cells whose history is pooled.
+        config (dict, optional): Training configuration.
+
+    Returns:
+        dict: Metadata of the stored model, or a skipped status.
+    """
+    with session_scope() as db:
+        metadata = train_anomaly_model(db, model_key, identifiers, config)
+    return metadata or {"model_key": model_key, "status": "skipped"}
+
+@celery_app.task(name="tasks.training.retrain_forecasters")
+def retrain_forecasters() -> Dict[str, Any]:
+    """
+    Fan out retraining of the stored per-identifier LSTM forecasters.
+
+    Forecasters are grouped by the model settings recorded with them, so each
+    is retrained under the same model store key it is served from. Only
+    identifiers with new data since the previous run are retrained.
+
+    Returns:
+        dict: Number of identifiers, model configurations and batches dispatched.
+    """
+    since = datetime.utcnow() - timedelta(seconds=settings.FORECAST_MODEL_RETRAIN_INTERVAL)
+    with session_scope() as db:
+        updated = set(get_updated_identifiers(db, since))
+    by_config: Dict[str, set] = {}
+    for metadata in list_models(FORECAST_MODEL_KIND):
+        if metadata.get("identifier") in updated and metadata.get("config"):
+            by_config.setdefault(json.dumps(metadata["config"], sort_keys=True), set()).add(metadata["identifier"])
+    identifiers = batches = 0
+    for config, members in by_config.items():
+        for batch in _batches(sorted(members), settings.KPI_MONITOR_BATCH_SIZE):
+            train_forecaster_batch.apply_async(args=[batch, json.loads(config)], queue="training")
+            batches += 1
+        identifiers += len(members)
+    logger.info(f"Forecaster retraining dispatched {identifiers} identifiers in {batches} batches for {len(by_config)} configurations")
+    return {"identifiers": identifiers, "configs": len(by_config), "batches": batches}
+
+@celery_app.task(name="tasks.training.train_forecaster_batch")
+def train_forecaster_batch(identifiers: List[str], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Train and persist the per-column forecasters of a batch of identifiers.
+
+    Args:
+        identifiers (list): Identifiers to train forecasters for.
+        config (dict, optional): Prediction configuration; its model settings select the stored model.
+
+    Returns:
+        dict: Number of forecasters trained.
+    """
+    trained = 0
+    with session_scope() as db:
+        for identifier in identifiers:
+            try:
+                trained += len(train_forecasters(db, identifier, config))
+            except Exception as e:
+                logger.error(f"Forecaster training failed for {identifier}: {e}")
+    return {"identifiers": len(identifiers), "trained": trained}
+
+@celery_app.task(name="tasks.training.train_global_forecasters")
+def train_global_forecasters_task(identifiers: Optional[List[str]] = None, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Train the fleet-wide forecasters, one per KPI, across many identifiers.
+
+    Args:
+        identifiers (list, optional): Identifiers whose history is pooled; all identifiers when omitted.
+        config (dict, optional): Prediction configuration; its lookback, horizon and model select the stored models.
+
+    Returns:
+        dict: Number of identifiers pooled and KPIs trained.
+    """
+    with session_scope() as db:
+        identifiers = identifiers or get_updated_identifiers(db)
+        trained = train_global_forecasters(db, identifiers, config)
+    return {"identifiers": len(identifiers), "trained": sorted(trained)}
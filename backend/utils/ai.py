@@ -2,12 +2,29 @@ import aiohttp
 from config.settings import load_settings  # Changed import
 from utils.logger import logger
 from utils.cache import cache_get, cache_set
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+from datetime import datetime
+import pandas as pd
+import hashlib
+import json
+import asyncio
 import backoff
 from aiohttp import ClientSession
 
 settings = load_settings()  # Load settings locally
 
+# Background insight jobs, keyed by handle, and the semaphore bounding them
+_insights_tasks: Dict[str, asyncio.Task] = {}
+_insights_semaphore: Optional[asyncio.Semaphore] = None
+
+# Helper function to lazily create the concurrency limiter inside the running loop
+def _get_insights_semaphore() -> asyncio.Semaphore:
+    """Return the semaphore limiting concurrent AI insight requests."""
+    global _insights_semaphore
+    if _insights_semaphore is None:
+        _insights_semaphore = asyncio.Semaphore(max(1, settings.AI_INSIGHTS_MAX_CONCURRENCY))
+    return _insights_semaphore
+
 # Helper function to validate OpenAI response
 def _validate_response(response: Dict[str, Any]) -> Optional[str]:
     """Validate and extract content from OpenAI API response."""
@@ -47,7 +64,8 @@ async def get_ai_insights(
         logger.error("OpenAI API key not configured in settings")
         return "AI insights unavailable: API key not configured"
 
-    cache_key = f"ai_insights_{hash(frozenset(data.items()))}_{hash(prompt)}_{hash(frozenset(config.items()))}"
+    key_str = json.dumps({"data": data, "prompt": prompt, "config": config}, sort_keys=True, default=str)
+    cache_key = f"ai_insights_{hashlib.md5(key_str.encode()).hexdigest()}"
     if use_cache:
         cached_result = cache_get(cache_key)
         if cached_result:
@@ -94,6 +112,134 @@ async def get_ai_insights(
             logger.error(f"Unexpected error in AI insights request: {str(e)}")
             return f"Failed to retrieve AI insights: {str(e)}"
 
+def summarize_for_insights(
+    df: pd.DataFrame,
+    numeric_cols: List[str],
+    max_columns: int = 20,
+    precision: int = 4
+) -> Dict[str, Dict[str, float]]:
+    """
+    Build a compact, prompt-friendly statistical summary of numeric columns.
+
+    Args:
+        df (pd.DataFrame): Input DataFrame.
+        numeric_cols (list): Numeric columns to summarize.
+        max_columns (int): Maximum number of columns included in the summary.
+        precision (int): Number of decimals kept per statistic.
+
+    Returns:
+        dict: Mapping of column names to summary statistics (size independent of row count).
+    """
+    summary = {}
+    for col in numeric_cols[:max_columns]:
+        try:
+            series = pd.to_numeric(df[col], errors="coerce")
+            described = series.describe()
+            stats = {
+                name: round(float(value), precision)
+                for name, value in described.items()
+                if pd.notna(value)
+            }
+            stats["null_rate"] = round(float(series.isna().mean()), precision)
+            summary[col] = stats
+        except Exception as e:
+            logger.warning(f"Failed to summarize {col} for AI insights: {e}")
+    return summary
+
+def generate_insights_handle(identifier: str, summary: Dict[str, Any]) -> str:
+    """Generate a stable handle for an insights job from its identifier and summary."""
+    summary_str = json.dumps(summary, sort_keys=True, default=str)
+    return f"{identifier}_{hashlib.md5(summary_str.encode()).hexdigest()[:16]}"
+
+def get_insights_status(handle: str) -> Dict[str, Any]:
+    """
+    Look up the status of a background AI insights job.
+
+    Args:
+        handle (str): Handle returned by `schedule_ai_insights`.
+
+    Returns:
+        dict: Job status ('pending', 'complete', 'failed' or 'unknown') and insights if available.
+    """
+    status = cache_get(f"ai_insights_status_{handle}")
+    if status:
+        return status
+    if handle in _insights_tasks:
+        return {"handle": handle, "status": "pending"}
+    return {"handle": handle, "status": "unknown"}
+
+async def _run_insights_job(
+    handle: str,
+    summary: Dict[str, Any],
+    prompt: str,
+    config: Optional[Dict[str, Any]],
+    on_complete: Optional[Callable[[Dict[str, Any]], Awaitable[None]]],
+    ttl: int
+) -> None:
+    """Run a single insights request under the concurrency limit and publish its status."""
+    try:
+        async with _get_insights_semaphore():
+            insights = await get_ai_insights(summary, prompt, config)
+        status = {
+            "handle": handle,
+            "status": "complete",
+            "insights": insights,
+            "completed_at": datetime.utcnow().isoformat()
+        }
+    except Exception as e:
+        logger.error(f"AI insights job {handle} failed: {e}")
+        status = {
+            "handle": handle,
+            "status": "failed",
+            "message": str(e),
+            "completed_at": datetime.utcnow().isoformat()
+        }
+
+    cache_set(f"ai_insights_status_{handle}", status, ttl=ttl)
+    if on_complete:
+        try:
+            await on_complete(status)
+        except Exception as e:
+            logger.error(f"AI insights completion callback failed for {handle}: {e}")
+
+def schedule_ai_insights(
+    handle: str,
+    summary: Dict[str, Any],
+    prompt: str,
+    config: Optional[Dict[str, Any]] = None,
+    on_complete: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    ttl: int = 3600
+) -> Dict[str, Any]:
+    """
+    Schedule AI insights generation in the background without blocking the caller.
+
+    Args:
+        handle (str): Handle identifying the job (see `generate_insights_handle`).
+        summary (dict): Compact summary statistics sent to the model.
+        prompt (str): Prompt describing the analysis to perform.
+        config (dict, optional): OpenAI request configuration.
+        on_complete (callable, optional): Coroutine called with the final status.
+        ttl (int): Time-to-live of the stored status in seconds.
+
+    Returns:
+        dict: Initial job status containing the handle.
+    """
+    existing = cache_get(f"ai_insights_status_{handle}")
+    if existing and existing.get("status") == "complete":
+        logger.debug(f"AI insights already available for {handle}")
+        return existing
+    if handle in _insights_tasks:
+        logger.debug(f"AI insights job {handle} already running")
+        return {"handle": handle, "status": "pending"}
+
+    status = {"handle": handle, "status": "pending", "scheduled_at": datetime.utcnow().isoformat()}
+    cache_set(f"ai_insights_status_{handle}", status, ttl=ttl)
+    task = asyncio.create_task(_run_insights_job(handle, summary, prompt, config, on_complete, ttl))
+    _insights_tasks[handle] = task
+    task.add_done_callback(lambda _: _insights_tasks.pop(handle, None))
+    logger.info(f"Scheduled AI insights job {handle}")
+    return status
+
 if __name__ == "__main__":
     async def test_ai_insights():
         data = {"value": [1, 2, 3], "load": [10, 20, 30]}
@@ -103,5 +249,10 @@ if __name__ == "__main__":
         result = await get_ai_insights(data, prompt, config)
         print("AI Insights:", result)
 
-    import asyncio
+        summary = summarize_for_insights(pd.DataFrame(data), ["value", "load"])
+        handle = generate_insights_handle("test_data", summary)
+        print("Scheduled:", schedule_ai_insights(handle, summary, prompt, config))
+        await asyncio.sleep(0)
+        print("Status:", get_insights_status(handle))
+
     asyncio.run(test_ai_insights())
\ No newline at end of file
@@ -0,0 +1,155 @@
+import math
+from datetime import datetime
+from utils.logger import logger
+from typing import Dict, Any, Optional
+
+# Default alerting rules, overridable per identifier
+DEFAULT_ALERT_CONFIG = {
+    "enter_z": 3.0,  # |z| above which a sample breaches
+    "exit_z": 2.0,  # |z| below which a sample counts towards clearing (hysteresis band in between)
+    "min_samples": 3,  # Consecutive breaching samples before an alert is raised
+    "clear_samples": 3,  # Consecutive normal samples before an alert is cleared
+    "min_duration_seconds": 0,  # Breach must also last this long (when samples carry timestamps)
+    "warmup": 30,  # Samples of history required before z-scores are trusted
+    "rules": {}  # Optional static bounds per column: {"upper", "lower", "upper_clear", "lower_clear"}
+}
+
+class AlertState:
+    """
+    Per-column alert state machine evaluated on every ingested sample.
+
+    An alert is raised only after `min_samples` consecutive breaches (and
+    `min_duration_seconds`), stays active without re-notifying while the
+    condition persists, and clears only after `clear_samples` consecutive
+    samples back inside the exit band. Only transitions produce events.
+    """
+
+    def __init__(self):
+        self.status = "ok"  # 'ok' or 'active'
+        self.pending = 0
+        self.pending_since: Optional[float] = None
+        self.clearing = 0
+        self.raised_at: Optional[float] = None
+        self.breaches = 0
+        self.peak: Optional[float] = None
+        self.rule: Optional[str] = None
+
+    # Helper method to classify a sample as breaching, normal, or inside the hysteresis band
+    @staticmethod
+    def _classify(
+        value: float,
+        mean: float,
+        std: float,
+        count: int,
+        config: Dict[str, Any],
+        rule: Optional[Dict[str, float]]
+    ) -> tuple:
+        if rule:
+            upper, lower = rule.get("upper"), rule.get("lower")
+            if (upper is not None and value > upper) or (lower is not None and value < lower):
+                return "breach", "static", None
+            upper_clear = rule.get("upper_clear", upper)
+            lower_clear = rule.get("lower_clear", lower)
+            inside = (upper_clear is None or value <= upper_clear) and (lower_clear is None or value >= lower_clear)
+            return ("normal" if inside else "band"), "static", None
+        if count < config["warmup"] or std <= 0:
+            return "normal", "z_score", None
+        z_score = (value - mean) / std
+        if abs(z_score) > config["enter_z"]:
+            return "breach", "z_score", z_score
+        return ("normal" if abs(z_score) < config["exit_z"] else "band"), "z_score", z_score
+
+    def evaluate(
+        self,
+        value: float,
+        ts: Optional[float],
+        mean: float,
+        std: float,
+        count: int,
+        config: Dict[str, Any],
+        rule: Optional[Dict[str, float]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Evaluate one sample against the baseline seen before it.
+
+        Args:
+            value (float): Sample value.
+            ts (float, optional): Sample epoch timestamp in seconds.
+            mean (float): Baseline mean.
+            std (float): Baseline standard deviation.
+            count (int): Number of samples behind the baseline.
+            config (dict): Alerting configuration (see DEFAULT_ALERT_CONFIG).
+            rule (dict, optional): Static bounds for this column.
+
+        Returns:
+            dict or None: Event for a 'raised' or 'cleared' transition, otherwise None.
+        """
+        verdict, rule_type, z_score = self._classify(value, mean, std, count, config, rule)
+
+        if self.status == "ok":
+            if verdict != "breach":
+                self.pending, self.pending_since = 0, None
+                return None
+            self.pending += 1
+            self.pending_since = ts if self.pending_since is None else self.pending_since
+            duration = (ts - self.pending_since) if ts is not None and self.pending_since is not None else math.inf
+            if self.pending < config["min_samples"] or duration < config["min_duration_seconds"]:
+                return None
+            self.status, self.raised_at, self.rule = "active", self.pending_since, rule_type
+            self.breaches, self.peak, self.clearing = self.pending, value, 0
+            self.pending, self.pending_since = 0, None
+            severity = "high" if z_score is not None and abs(z_score) > config["enter_z"] + 1 else "medium"
+            return self._event("raised", value, ts, z_score, severity)
+
+        # Active: track the peak, clear only after enough consecutive normal samples
+        if verdict == "breach":
+            self.breaches += 1
+            self.clearing = 0
+            if self.peak is None or abs(value - mean) > abs(self.peak - mean):
+                self.peak = value
+            return None
+        if verdict == "band":
+            self.clearing = 0
+            return None
+        self.clearing += 1
+        if self.clearing < config["clear_samples"]:
+            return None
+        event = self._event("cleared", value, ts, z_score, "low")
+        self.__init__()
+        return event
+
+    # Helper method to build a transition event
+    def _event(self, status: str, value: float, ts: Optional[float], z_score: Optional[float], severity: str) -> Dict[str, Any]:
+        return {
+            "status": status,
+            "rule": self.rule,
+            "value": value,
+            "z_score": round(z_score, 4) if z_score is not None else None,
+            "peak": self.peak,
+            "breaches": self.breaches,
+            "severity": severity,
+            "started_at": datetime.utcfromtimestamp(self.raised_at).isoformat() if self.raised_at is not None else None,
+            "timestamp": datetime.utcfromtimestamp(ts).isoformat() if ts is not None else None
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "AlertState":
+        state = cls()
+        for key, value in (data or {}).items():
+            if key in state.__dict__:
+                setattr(state, key, value)
+        return state
+
+if __name__ == "__main__":
+    # Test the state machine: a sustained spike raises once and clears once
+    config = DEFAULT_ALERT_CONFIG
+    state = AlertState()
+    values = [10.0] * 5 + [40.0] * 10 + [26.0] * 3 + [10.0] * 5
+    for i, value in enumerate(values):
+        event = state.evaluate(value, float(i * 60), mean=10.0, std=5.0, count=100, config=config)
+        if event:
+            print(f"Sample {i}:", event)
+    logger.info(f"Alert state after run: {state.to_dict()}")
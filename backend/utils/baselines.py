@@ -0,0 +1,282 @@
+import pandas as pd
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models.kpi_baseline import KpiBaseline, HOURS_PER_WEEK
+from models.kpi_rollup import KpiHourlyRollup
+from utils.cache import cache_get, cache_set, cache_delete
+from utils.logger import logger
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+
+# Scale factor turning a MAD into a standard-deviation equivalent for normal data
+MAD_SCALE = 1.4826
+
+# Helper function to compute the hour-of-week index (Monday 00:00 = 0)
+def hour_of_week(when: datetime) -> int:
+    return when.weekday() * 24 + when.hour
+
+def update_hourly_rollups(
+    db: Session,
+    identifier: str,
+    df: pd.DataFrame,
+    numeric_cols: List[str],
+    timestamp_col: Optional[str]
+) -> int:
+    """
+    Fold raw ingested values into hourly rollups used by the baseline job.
+
+    Args:
+        db (Session): Database session.
+        identifier (str): Unique identifier for the data.
+        df (pd.DataFrame): New rows with raw (unscaled) values.
+        numeric_cols (list): Numeric columns to roll up.
+        timestamp_col (str, optional): Column holding sample timestamps.
+
+    Returns:
+        int: Number of hourly rollup rows written.
+    """
+    if df.empty or timestamp_col not in df.columns:
+        return 0
+    hours = pd.to_datetime(df[timestamp_col], errors="coerce").dt.floor("h")
+    cols = [col for col in numeric_cols if col in df.columns]
+    frame = df[cols].apply(pd.to_numeric, errors="coerce").assign(hour=hours).dropna(subset=["hour"])
+    if frame.empty:
+        return 0
+    long_df = frame.melt(id_vars="hour", var_name="column", value_name="value").dropna(subset=["value"])
+    batch = long_df.groupby(["column", "hour"])["value"].agg(["count", "mean", "min", "max"])
+
+    existing = {
+        (row.column, row.hour): row
+        for row in db.query(KpiHourlyRollup)
+        .filter(
+            KpiHourlyRollup.identifier == identifier,
+            KpiHourlyRollup.hour >= batch.index.get_level_values("hour").min().to_pydatetime(),
+            KpiHourlyRollup.hour <= batch.index.get_level_values("hour").max().to_pydatetime()
+        )
+        .all()
+    }
+    for (col, hour), agg in batch.iterrows():
+        hour = hour.to_pydatetime()
+        row = existing.get((col, hour))
+        if row is None:
+            db.add(KpiHourlyRollup(
+                identifier=identifier, column=col, hour=hour,
+                count=int(agg["count"]), mean=float(agg["mean"]), min=float(agg["min"]), max=float(agg["max"])
+            ))
+            continue
+        total = row.count + int(agg["count"])
+        row.mean = (row.mean * row.count + float(agg["mean"]) * agg["count"]) / total
+        row.count = total
+        row.min = min(row.min, float(agg["min"])) if row.min is not None else float(agg["min"])
+        row.max = max(row.max, float(agg["max"])) if row.max is not None else float(agg["max"])
+    db.commit()
+    return len(batch)
+
+def compute_hour_of_week_baselines(rollups: pd.DataFrame, min_count: int = 2) -> Dict[tuple, Dict[str, List[float]]]:
+    """
+    Compute robust per-hour-of-week baselines from hourly means in one grouped pass.
+
+    Hours of the week with fewer than `min_count` observed hours fall back to
+    the column's overall median/MAD (their count is reported as 0), so every
+    lookup is a plain index into the stored profile.
+
+    Args:
+        rollups (pd.DataFrame): Columns identifier, column, hour, mean.
+        min_count (int): Minimum hourly observations per hour of week.
+
+    Returns:
+        dict: {(identifier, column): {"medians", "mads", "counts"}} with 168 entries each.
+    """
+    if rollups.empty:
+        return {}
+    df = rollups.assign(how=rollups["hour"].dt.dayofweek * 24 + rollups["hour"].dt.hour)
+    keys = ["identifier", "column", "how"]
+    median = df.groupby(keys)["mean"].transform("median")
+    df = df.assign(absdev=(df["mean"] - median).abs())
+    profile = df.groupby(keys).agg(median=("mean", "median"), mad=("absdev", "median"), count=("mean", "size"))
+
+    overall_median = df.groupby(["identifier", "column"])["mean"].transform("median")
+    overall = df.assign(absdev=(df["mean"] - overall_median).abs()).groupby(["identifier", "column"]).agg(
+        median=("mean", "median"), mad=("absdev", "median")
+    )
+
+    baselines = {}
+    full_week = pd.RangeIndex(HOURS_PER_WEEK)
+    for key, group in profile.groupby(level=[0, 1]):
+        week = group.droplevel([0, 1]).reindex(full_week)
+        sparse = week["count"].fillna(0) < min_count
+        fallback = overall.loc[key]
+        baselines[key] = {
+            "medians": week["median"].where(~sparse, fallback["median"]).astype(float).tolist(),
+            "mads": week["mad"].where(~sparse, fallback["mad"]).astype(float).tolist(),
+            "counts": week["count"].where(~sparse, 0).fillna(0).astype(int).tolist()
+        }
+    return baselines
+
+def refresh_baselines(
+    db: Session,
+    identifiers: List[str],
+    days: int = 28,
+    min_count: int = 2
+) -> int:
+    """
+    Recompute and store the hour-of-week baselines of a batch of identifiers.
+
+    Args:
+        db (Session): Database session.
+        identifiers (list): Identifiers to refresh.
+        days (int): Days of hourly history to use.
+        min_count (int): Minimum hourly observations per hour of week.
+
+    Returns:
+        int: Number of (identifier, column) baselines written.
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    rows = (
+        db.query(KpiHourlyRollup.identifier, KpiHourlyRollup.column, KpiHourlyRollup.hour, KpiHourlyRollup.mean)
+        .filter(KpiHourlyRollup.identifier.in_(list(identifiers)), KpiHourlyRollup.hour >= since)
+        .all()
+    )
+    rollups = pd.DataFrame(rows, columns=["identifier", "column", "hour", "mean"])
+    if rollups.empty:
+        return 0
+    rollups["hour"] = pd.to_datetime(rollups["hour"])
+    baselines = compute_hour_of_week_baselines(rollups, min_count)
+
+    existing = {
+        (row.identifier, row.column): row
+        for row in db.query(KpiBaseline).filter(KpiBaseline.identifier.in_(list(identifiers))).all()
+    }
+    now = datetime.utcnow()
+    for (identifier, col), profile in baselines.items():
+        row = existing.get((identifier, col))
+        if row is None:
+            row = KpiBaseline(identifier=identifier, column=col, **profile)
+            db.add(row)
+        else:
+            row.medians, row.mads, row.counts = profile["medians"], profile["mads"], profile["counts"]
+        row.history_days = days
+        row.computed_at = now
+    db.commit()
+    for identifier in {identifier for identifier, _ in baselines}:
+        cache_delete(f"kpi_baseline_{identifier}")
+    logger.info(f"Refreshed {len(baselines)} hour-of-week baselines for {len(identifiers)} identifiers")
+    return len(baselines)
+
+def load_baselines(db: Session, identifier: str, ttl: int = 21600) -> Dict[str, Dict[str, List[float]]]:
+    """
+    Return the stored hour-of-week baselines of an identifier, keyed by column.
+
+    Args:
+        db (Session): Database session.
+        identifier (str): Unique identifier for the data.
+        ttl (int): Time-to-live of the cached baselines.
+
+    Returns:
+        dict: Profiles per column; empty if none have been computed.
+    """
+    cached = cache_get(f"kpi_baseline_{identifier}")
+    if cached:
+        return cached
+    try:
+        baselines = {
+            row.column: {"medians": row.medians, "mads": row.mads, "counts": row.counts}
+            for row in db.query(KpiBaseline).filter(KpiBaseline.identifier == identifier).all()
+            if isinstance(row, KpiBaseline)
+        }
+        if baselines:
+            cache_set(f"kpi_baseline_{identifier}", baselines, ttl=ttl)
+        return baselines
+    except Exception as e:
+        logger.warning(f"Could not load baselines for {identifier}: {e}")
+        return {}
+
+def load_baselines_bulk(db: Session, identifiers: List[str]) -> Dict[str, Dict[str, Dict[str, List[float]]]]:
+    """Return the hour-of-week baselines of many identifiers with a single query."""
+    baselines: Dict[str, Dict[str, Dict[str, List[float]]]] = {}
+    if not identifiers:
+        return baselines
+    for row in db.query(KpiBaseline).filter(KpiBaseline.identifier.in_(list(identifiers))).all():
+        baselines.setdefault(row.identifier, {})[row.column] = {
+            "medians": row.medians, "mads": row.mads, "counts": row.counts
+        }
+    return baselines
+
+def load_latest_rollups(db: Session, identifiers: List[str]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Return the newest hourly rollup of every column of many identifiers with a single query.
+
+    The newest hour is usually still filling up, so the sample count of the
+    hour before it is returned too as the count of a complete hour.
+
+    Args:
+        db (Session): Database session.
+        identifiers (list): Identifiers to load.
+
+    Returns:
+        dict: Per identifier and column, the rollup's 'hour', 'mean', 'count' and 'previous_count'.
+    """
+    rollups: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    if not identifiers:
+        return rollups
+    ranked = (
+        db.query(
+            KpiHourlyRollup.identifier,
+            KpiHourlyRollup.column,
+            KpiHourlyRollup.hour,
+            KpiHourlyRollup.mean,
+            KpiHourlyRollup.count,
+            func.row_number().over(
+                partition_by=(KpiHourlyRollup.identifier, KpiHourlyRollup.column),
+                order_by=KpiHourlyRollup.hour.desc()
+            ).label("rank")
+        )
+        .filter(KpiHourlyRollup.identifier.in_(list(identifiers)))
+        .subquery()
+    )
+    rows = db.query(ranked).filter(ranked.c.rank <= 2).order_by(ranked.c.rank).all()
+    for row in rows:
+        columns = rollups.setdefault(row.identifier, {})
+        if row.rank == 1:
+            columns[row.column] = {"hour": row.hour, "mean": row.mean, "count": row.count, "previous_count": None}
+        elif row.column in columns:
+            columns[row.column]["previous_count"] = row.count
+    return rollups
+
+def seasonal_band(profile: Dict[str, List[float]], when: datetime, k: float = 3.0) -> Optional[Dict[str, Any]]:
+    """
+    Look up the expected band for a point in time in O(1).
+
+    Args:
+        profile (dict): Baseline profile with 'medians', 'mads' and 'counts'.
+        when (datetime): Time of the value being evaluated (UTC).
+        k (float): Band half-width in robust standard deviations.
+
+    Returns:
+        dict or None: Expected value, robust scale and band, or None if the profile has no usable scale.
+    """
+    index = hour_of_week(when)
+    expected, mad = profile["medians"][index], profile["mads"][index]
+    if expected is None or mad is None or not np.isfinite(expected) or not np.isfinite(mad):
+        return None
+    scale = MAD_SCALE * mad
+    if scale <= 0:
+        return None
+    return {
+        "hour_of_week": index,
+        "expected": expected,
+        "scale": scale,
+        "lower": expected - k * scale,
+        "upper": expected + k * scale,
+        "samples": profile["counts"][index]
+    }
+
+if __name__ == "__main__":
+    # Test baselines on two weeks of a daily cycle
+    hours = pd.date_range("2024-01-01", periods=24 * 14, freq="h")
+    values = 100 + 50 * np.sin(2 * np.pi * hours.hour / 24) + np.random.normal(0, 2, len(hours))
+    rollups = pd.DataFrame({"identifier": "cell_1", "column": "throughput", "hour": hours, "mean": values})
+    profile = compute_hour_of_week_baselines(rollups)[("cell_1", "throughput")]
+    print("Busy hour band:", seasonal_band(profile, datetime(2024, 1, 15, 6)))
+    print("Quiet hour band:", seasonal_band(profile, datetime(2024, 1, 15, 18)))
@@ -2,7 +2,7 @@ import redis
 import json
 from config.settings import load_settings  # Changed import
 from utils.logger import logger
-from typing import Any, Optional, Union, Dict
+from typing import Any, Optional, Union, Dict, List
 import backoff
 from redis.exceptions import ConnectionError, TimeoutError
 
@@ -52,7 +52,7 @@ def cache_set(key: str, value: Any, ttl: int = 3600) -> bool:
     full_key = f"{CACHE_PREFIX}{key}"
     try:
         serialized_value = _serialize(value)
-        redis_client.setex(full_key, ttl, serialized_value)
+        get_redis_client().setex(full_key, ttl, serialized_value)
         logger.debug(f"Cache set for {full_key} with TTL {ttl}")
         return True
     except (ConnectionError, TimeoutError) as e:
@@ -71,7 +71,7 @@ def cache_set(key: str, value: Any, ttl: int = 3600) -> bool:
 def cache_get(key: str) -> Optional[Any]:
     full_key = f"{CACHE_PREFIX}{key}"
     try:
-        result = redis_client.get(full_key)
+        result = get_redis_client().get(full_key)
         if result is None:
             logger.debug(f"Cache miss for {full_key}")
             return None
@@ -91,7 +91,7 @@ def cache_get(key: str) -> Optional[Any]:
 def cache_delete(key: str) -> bool:
     full_key = f"{CACHE_PREFIX}{key}"
     try:
-        deleted = redis_client.delete(full_key)
+        deleted = get_redis_client().delete(full_key)
         if deleted:
             logger.debug(f"Cache deleted for {full_key}")
         else:
@@ -101,11 +101,78 @@ def cache_delete(key: str) -> bool:
         logger.error(f"Cache delete failed for {full_key}: {e}")
         return False
 
+def cache_get_many(keys: List[str]) -> List[Optional[Any]]:
+    """Read many keys with a single MGET; missing or unreadable entries are None."""
+    if not keys:
+        return []
+    try:
+        values = get_redis_client().mget([f"{CACHE_PREFIX}{key}" for key in keys])
+        return [_deserialize(value) if value is not None else None for value in values]
+    except Exception as e:
+        logger.error(f"Cache multi-get failed for {len(keys)} keys: {e}")
+        return [None] * len(keys)
+
+def cache_set_many(values: Dict[str, Any], ttl: int = 3600) -> bool:
+    """Write many keys with the same TTL in one pipeline round trip."""
+    if not values:
+        return True
+    try:
+        pipe = get_redis_client().pipeline()
+        for key, value in values.items():
+            pipe.setex(f"{CACHE_PREFIX}{key}", ttl, _serialize(value))
+        pipe.execute()
+        logger.debug(f"Cache set for {len(values)} keys with TTL {ttl}")
+        return True
+    except Exception as e:
+        logger.error(f"Cache multi-set failed for {len(values)} keys: {e}")
+        return False
+
+def cache_add_members(key: str, members: List[str], ttl: Optional[int] = None) -> int:
+    """Add members to a Redis set stored under the cache prefix; returns the number added."""
+    full_key = f"{CACHE_PREFIX}{key}"
+    if not members:
+        return 0
+    try:
+        client = get_redis_client()
+        pipe = client.pipeline()
+        pipe.sadd(full_key, *members)
+        if ttl:
+            pipe.expire(full_key, ttl)
+        added = pipe.execute()[0]
+        logger.debug(f"Added {added} members to {full_key}")
+        return int(added)
+    except Exception as e:
+        logger.error(f"Cache set-add failed for {full_key}: {e}")
+        return 0
+
+def cache_filter_new_members(key: str, members: List[str]) -> List[bool]:
+    """Return, for each member, whether it is absent from the Redis set under `key`."""
+    full_key = f"{CACHE_PREFIX}{key}"
+    if not members:
+        return []
+    try:
+        pipe = get_redis_client().pipeline()
+        for member in members:
+            pipe.sismember(full_key, member)
+        return [not bool(seen) for seen in pipe.execute()]
+    except Exception as e:
+        logger.error(f"Cache membership check failed for {full_key}: {e}")
+        return [True] * len(members)
+
+def cache_publish(channel: str, value: Any) -> int:
+    """Publish a message on a Redis channel under the cache prefix; returns the number of subscribers reached."""
+    full_channel = f"{CACHE_PREFIX}{channel}"
+    try:
+        return int(get_redis_client().publish(full_channel, _serialize(value)))
+    except Exception as e:
+        logger.error(f"Cache publish failed for {full_channel}: {e}")
+        return 0
+
 def cache_health_check() -> Dict[str, Any]:
     """Check the health of the Redis connection."""
     try:
-        redis_client.ping()
-        info = redis_client.info("memory")
+        get_redis_client().ping()
+        info = get_redis_client().info("memory")
         return {
             "status": "healthy",
             "details": {
@@ -0,0 +1,535 @@
+import heapq
+import math
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models.change_point import ChangePoint
+from models.kpi_rollup import KpiHourlyRollup
+from utils.baselines import load_baselines
+from utils.cache import cache_get, cache_set
+from utils.logger import logger
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+
+# Default settings of the online CUSUM detector
+DEFAULT_CUSUM_CONFIG = {
+    "drift": 0.5,  # Allowed drift (in standard deviations) before evidence accumulates
+    "threshold": 8.0,  # Accumulated evidence that signals a change (about 5 false alarms per 50k stationary samples)
+    "warmup": 30,  # Samples used to learn the reference level of a new regime
+    "half_life": 500,  # Samples after which the reference statistics forget half their weight
+    "ttl": 7 * 86400  # Lifetime of the per-identifier state in Redis
+}
+
+# Helper function to prepend a zero row to column-wise cumulative sums
+def _cumsum0(values: np.ndarray) -> np.ndarray:
+    out = np.zeros((values.shape[0] + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=out[1:])
+    return out
+
+class SegmentCost:
+    """
+    O(1) segment costs from cumulative sums.
+
+    'l2' is the within-segment sum of squares (mean changes). 'normal' is the
+    Gaussian negative log-likelihood n * log(variance), which also catches
+    variance changes. Costs are summed over columns and evaluated for arrays
+    of (start, end) pairs at once.
+    """
+
+    def __init__(self, X: np.ndarray, model: str = "l2"):
+        if model not in {"l2", "normal"}:
+            raise ValueError(f"Unsupported cost model: {model}")
+        X = np.asarray(X, dtype=np.float64)
+        self.X = X[:, None] if X.ndim == 1 else X
+        self.model = model
+        self.sums = _cumsum0(self.X)
+        self.squares = _cumsum0(self.X ** 2)
+
+    def __call__(self, starts: Any, ends: Any) -> np.ndarray:
+        starts, ends = np.broadcast_arrays(np.asarray(starts), np.asarray(ends))
+        n = (ends - starts).astype(np.float64)[..., None]
+        s = self.sums[ends] - self.sums[starts]
+        q = self.squares[ends] - self.squares[starts]
+        if self.model == "l2":
+            return (q - s ** 2 / n).sum(axis=-1)
+        var = np.maximum(q / n - (s / n) ** 2, 1e-8)
+        return (n * np.log(var)).sum(axis=-1)
+
+# Helper function to scale each column by a robust noise estimate (MAD of first differences)
+def _standardize(X: np.ndarray) -> np.ndarray:
+    X = np.asarray(X, dtype=np.float64)
+    X = X[:, None] if X.ndim == 1 else X
+    diffs = np.diff(X, axis=0)
+    scale = 1.4826 * np.median(np.abs(diffs - np.median(diffs, axis=0)), axis=0) / math.sqrt(2)
+    scale = np.where(scale > 0, scale, X.std(axis=0))
+    return (X - X.mean(axis=0)) / np.where(scale > 0, scale, 1.0)
+
+# Helper function to resolve the default (BIC) penalty per change point
+def _penalty(penalty: Optional[float], model: str, n: int, k: int) -> float:
+    if penalty is not None:
+        return float(penalty)
+    params = k + 1 if model == "l2" else 2 * k + 1
+    return params * math.log(max(n, 2))
+
+def pelt(
+    X: np.ndarray,
+    penalty: Optional[float] = None,
+    model: str = "l2",
+    min_size: int = 5,
+    standardize: bool = True
+) -> List[int]:
+    """
+    Exact penalized change point search with PELT pruning.
+
+    Minimizes the total segment cost plus `penalty` per change. Candidates
+    that can no longer start the optimal last segment are pruned, which keeps
+    the expected cost linear in the series length when the number of changes
+    grows with it.
+
+    Args:
+        X (np.ndarray): (samples,) or (samples, columns) array in time order.
+        penalty (float, optional): Cost per change point (defaults to a BIC penalty).
+        model (str): 'l2' (mean shifts) or 'normal' (mean and variance shifts).
+        min_size (int): Minimum segment length.
+        standardize (bool): Scale columns by a robust noise estimate so the default penalty applies.
+
+    Returns:
+        list: Indices of the first sample of each new segment.
+    """
+    if len(X) < 2 * min_size:
+        return []
+    X = _standardize(X) if standardize else np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+    n = X.shape[0]
+    cost = SegmentCost(X, model)
+    beta = _penalty(penalty, model, n, X.shape[1])
+
+    F = np.full(n + 1, np.inf)
+    F[0] = -beta
+    last = np.zeros(n + 1, dtype=int)
+    candidates = np.array([0])
+    for t in range(min_size, n + 1):
+        admissible = t - candidates >= min_size
+        starts = candidates[admissible]
+        totals = F[starts] + cost(starts, t)
+        best = int(np.argmin(totals))
+        F[t] = totals[best] + beta
+        last[t] = starts[best]
+        # Prune starts that cannot beat F[t] for any later end; keep ones still too recent to evaluate
+        keep = ~admissible
+        keep[admissible] = totals <= F[t]
+        candidates = np.append(candidates[keep], t)
+
+    change_points = []
+    t = n
+    while last[t] > 0:
+        change_points.append(int(last[t]))
+        t = last[t]
+    return sorted(change_points)
+
+def binary_segmentation(
+    X: np.ndarray,
+    penalty: Optional[float] = None,
+    model: str = "l2",
+    min_size: int = 5,
+    max_changes: Optional[int] = None,
+    standardize: bool = True
+) -> List[int]:
+    """
+    Greedy change point search by recursive splitting, O(n log n).
+
+    The split with the largest cost reduction across all current segments is
+    applied first; splitting stops when no reduction exceeds `penalty` (or
+    after `max_changes`).
+
+    Args:
+        X (np.ndarray): (samples,) or (samples, columns) array in time order.
+        penalty (float, optional): Minimum cost reduction per split (defaults to a BIC penalty).
+        model (str): 'l2' or 'normal'.
+        min_size (int): Minimum segment length.
+        max_changes (int, optional): Maximum number of change points.
+        standardize (bool): Scale columns by a robust noise estimate.
+
+    Returns:
+        list: Indices of the first sample of each new segment.
+    """
+    if len(X) < 2 * min_size:
+        return []
+    X = _standardize(X) if standardize else np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+    n = X.shape[0]
+    cost = SegmentCost(X, model)
+    beta = _penalty(penalty, model, n, X.shape[1])
+
+    def best_split(start: int, end: int) -> Optional[tuple]:
+        splits = np.arange(start + min_size, end - min_size + 1)
+        if len(splits) == 0:
+            return None
+        gains = cost(start, end) - (cost(start, splits) + cost(splits, end))
+        best = int(np.argmax(gains))
+        return (-float(gains[best]), int(splits[best]), start, end) if gains[best] > beta else None
+
+    heap = [split for split in [best_split(0, n)] if split]
+    change_points: List[int] = []
+    while heap and (max_changes is None or len(change_points) < max_changes):
+        _, split, start, end = heapq.heappop(heap)
+        change_points.append(split)
+        for segment in ((start, split), (split, end)):
+            candidate = best_split(*segment)
+            if candidate:
+                heapq.heappush(heap, candidate)
+    return sorted(change_points)
+
+class CusumDetector:
+    """
+    Online two-sided CUSUM detector for one column.
+
+    Learns the level and spread of the current regime during a warmup, then
+    accumulates standardized deviations beyond `drift`. When either sum
+    exceeds `threshold`, a change is reported. The change time is where that
+    sum last left zero. The detector then relearns the new regime. Every
+    sample that does not raise an alarm keeps updating the reference; the
+    slow `half_life` means a genuine shift is reported well before it is
+    absorbed.
+
+    With an `expected` value per sample (the hour-of-week baseline), the
+    sums run on the residuals, so a daily cycle is not mistaken for shifts.
+    An alarm is reported once the new regime's warmup is complete, so that
+    'mean_after' is the mean of `warmup` post-change samples rather than of
+    the few that tripped the alarm. Means are in raw units: 'mean_before' is
+    the old regime's raw level and 'mean_after' adds the residual shift.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = {**DEFAULT_CUSUM_CONFIG, **(config or {})}
+        self.alpha = 1.0 - 0.5 ** (1.0 / self.config["half_life"])
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.level = 0.0  # Raw level of the regime, learned alongside the residual reference
+        self.pos = 0.0
+        self.neg = 0.0
+        self.pos_start: Optional[str] = None
+        self.neg_start: Optional[str] = None
+        self.pending: Optional[Dict[str, Any]] = None  # Alarm waiting for the new regime's warmup
+
+    def update(self, value: float, ts: str, expected: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Fold one sample in and return a change event if one is signalled.
+
+        Args:
+            value (float): Raw sample value.
+            ts (str): ISO timestamp of the sample.
+            expected (float, optional): Seasonal baseline at the sample's time; the raw value is tracked without one.
+
+        Returns:
+            dict or None: Change with 'changed_at', 'direction', 'mean_before' and 'mean_after',
+            returned `warmup` samples after the alarm.
+        """
+        residual = value - expected if expected is not None else value
+        if self.count >= self.config["warmup"] and self.var > 0:
+            z = (residual - self.mean) / math.sqrt(self.var)
+            drift = self.config["drift"]
+            if self.pos == 0 and z - drift > 0:
+                self.pos_start = ts
+            if self.neg == 0 and -z - drift > 0:
+                self.neg_start = ts
+            self.pos = max(0.0, self.pos + z - drift)
+            self.neg = max(0.0, self.neg - z - drift)
+            if self.pos > self.config["threshold"] or self.neg > self.config["threshold"]:
+                up = self.pos > self.config["threshold"]
+                pending = {
+                    "changed_at": self.pos_start if up else self.neg_start,
+                    "direction": "up" if up else "down",
+                    "mean_before": self.level,
+                    "reference": self.mean
+                }
+                self.__init__(self.config)
+                self.pending = pending
+        self._learn(residual, value)
+        if self.pending and self.count >= self.config["warmup"]:
+            # The warmup mean is exact, so the shift is measured on all post-change samples seen so far
+            event, self.pending = self.pending, None
+            event["mean_after"] = event["mean_before"] + self.mean - event.pop("reference")
+            return event
+        return None
+
+    # Helper method to update the reference level (exact during warmup, exponentially weighted after)
+    def _learn(self, residual: float, value: float) -> None:
+        a = max(self.alpha, 1.0 / (self.count + 1))
+        delta = residual - self.mean
+        self.mean += a * delta
+        self.var = (1.0 - a) * (self.var + a * delta * delta)
+        self.level += a * (value - self.level)
+        self.count += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the detector state."""
+        return {
+            key: getattr(self, key)
+            for key in ("count", "mean", "var", "level", "pos", "neg", "pos_start", "neg_start", "pending")
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> "CusumDetector":
+        """Restore a detector from its serialized state."""
+        detector = cls(config)
+        for key, value in data.items():
+            setattr(detector, key, value)
+        return detector
+
+# Helper function to insert change points, skipping ones already stored
+def _store_change_points(db: Session, identifier: str, records: List[Dict[str, Any]]) -> int:
+    if not records:
+        return 0
+    existing = {
+        (row.column, row.changed_at, row.method)
+        for row in db.query(ChangePoint.column, ChangePoint.changed_at, ChangePoint.method)
+        .filter(
+            ChangePoint.identifier == identifier,
+            ChangePoint.changed_at.in_([record["changed_at"] for record in records])
+        )
+        .all()
+    }
+    added = 0
+    for record in records:
+        if (record["column"], record["changed_at"], record["method"]) in existing:
+            continue
+        db.add(ChangePoint(identifier=identifier, **record))
+        existing.add((record["column"], record["changed_at"], record["method"]))
+        added += 1
+    db.commit()
+    return added
+
+# Helper function to look up the hour-of-week baseline medians of many timestamps (NaN where none is known)
+def _expected_levels(profile: Optional[Dict[str, List[float]]], timestamps: pd.DatetimeIndex) -> np.ndarray:
+    if not profile:
+        return np.full(len(timestamps), np.nan)
+    medians = np.array([np.nan if m is None else m for m in profile["medians"]], dtype=np.float64)
+    return medians[np.asarray(timestamps.dayofweek * 24 + timestamps.hour)]
+
+def detect_change_points(
+    db: Session,
+    identifier: str,
+    columns: Optional[List[str]] = None,
+    method: str = "pelt",
+    max_rows: int = 2000,
+    penalty: Optional[float] = None,
+    model: str = "l2",
+    min_size: int = 5
+) -> Dict[str, Any]:
+    """
+    Detect and store change points in the latest hourly history of an identifier.
+
+    The search runs on the raw hourly means of KpiHourlyRollup. Columns with an
+    hour-of-week baseline are searched as residuals against it, so the daily
+    cycle is not reported as a series of level shifts. Means are in raw units:
+    'mean_before' is the mean of the segment before the change and
+    'mean_after' adds the seasonally adjusted shift ('magnitude') to it, as
+    the online CUSUM detector reports them.
+
+    Args:
+        db (Session): Database session.
+        identifier (str): Unique identifier for the data.
+        columns (list, optional): Columns to analyze (defaults to every rolled-up column).
+        method (str): 'pelt' (exact) or 'binseg' (greedy, faster on very long windows).
+        max_rows (int): Hours of history to analyze.
+        penalty (float, optional): Cost per change point (defaults to a BIC penalty).
+        model (str): 'l2' (mean shifts) or 'normal' (mean and variance shifts).
+        min_size (int): Minimum segment length, in hours.
+
+    Returns:
+        dict: Change points per column (newest first) and the number newly stored.
+    """
+    if method not in {"pelt", "binseg"}:
+        raise ValueError(f"Unsupported change point method: {method}")
+    latest = db.query(func.max(KpiHourlyRollup.hour)).filter(KpiHourlyRollup.identifier == identifier).scalar()
+    if latest is None:
+        return {"identifier": identifier, "status": "no data", "change_points": {}}
+    query = db.query(KpiHourlyRollup.column, KpiHourlyRollup.hour, KpiHourlyRollup.mean).filter(
+        KpiHourlyRollup.identifier == identifier,
+        KpiHourlyRollup.hour > latest - pd.Timedelta(hours=max_rows)
+    )
+    if columns:
+        query = query.filter(KpiHourlyRollup.column.in_(list(columns)))
+    rows = query.all()
+    hourly = pd.DataFrame(rows, columns=["column", "hour", "mean"]).pivot(index="hour", columns="column", values="mean").sort_index()
+    hourly.index = pd.to_datetime(hourly.index)
+    baselines = load_baselines(db, identifier)
+
+    search = pelt if method == "pelt" else binary_segmentation
+    records, started = [], time.perf_counter()
+    for col in hourly.columns:
+        values = hourly[col].to_numpy(dtype=np.float64)
+        expected = _expected_levels(baselines.get(col), hourly.index)
+        # Residuals where the baseline is known; raw values only when the column has no baseline at all
+        residuals = values - expected if baselines.get(col) else values
+        valid = ~np.isnan(residuals)
+        values, residuals, times = values[valid], residuals[valid], hourly.index[valid]
+        if len(values) < 2 * min_size:
+            continue
+        bounds = [0] + search(residuals, penalty=penalty, model=model, min_size=min_size) + [len(values)]
+        for i in range(1, len(bounds) - 1):
+            before = float(values[bounds[i - 1]:bounds[i]].mean())
+            shift = float(residuals[bounds[i]:bounds[i + 1]].mean() - residuals[bounds[i - 1]:bounds[i]].mean())
+            records.append({
+                "column": col,
+                "changed_at": times[bounds[i]].to_pydatetime(),
+                "method": method,
+                "mean_before": before,
+                "mean_after": before + shift,
+                "magnitude": shift
+            })
+    stored = _store_change_points(db, identifier, records)
+    logger.info(f"Found {len(records)} change points for {identifier} in {time.perf_counter() - started:.3f}s ({stored} new)")
+
+    change_points: Dict[str, List[Dict[str, Any]]] = {}
+    for record in sorted(records, key=lambda record: record["changed_at"], reverse=True):
+        change_points.setdefault(record["column"], []).append({**record, "changed_at": record["changed_at"].isoformat()})
+    return {
+        "identifier": identifier,
+        "status": "success",
+        "method": method,
+        "source": "hourly_rollups",
+        "rows_analyzed": len(hourly),
+        "seasonally_adjusted": [col for col in hourly.columns if baselines.get(col)],
+        "change_points": change_points,
+        "stored": stored
+    }
+
+def update_cusum_states(
+    db: Session,
+    identifier: str,
+    df: pd.DataFrame,
+    numeric_cols: List[str],
+    timestamp_col: Optional[str] = None,
+    config: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run newly ingested raw values through the identifier's online CUSUM detectors.
+
+    Columns with an hour-of-week baseline are tracked as residuals against it
+    (samples at hours without a baseline value are skipped), others as raw
+    values. A detector is restarted when a column switches between the two,
+    since its reference is only valid in one of them. Detected changes are
+    stored with method 'cusum'.
+
+    Args:
+        db (Session): Database session.
+        identifier (str): Unique identifier for the data.
+        df (pd.DataFrame): New rows with raw (unscaled) values.
+        numeric_cols (list): Columns to monitor.
+        timestamp_col (str, optional): Column holding sample timestamps.
+        config (dict, optional): Overrides for DEFAULT_CUSUM_CONFIG.
+
+    Returns:
+        list: Change points detected in this batch.
+    """
+    config = {**DEFAULT_CUSUM_CONFIG, **(config or {})}
+    cols = [col for col in numeric_cols if col in df.columns]
+    if df.empty or not cols:
+        return []
+    if timestamp_col in df.columns:
+        df = df.assign(_ts=pd.to_datetime(df[timestamp_col], errors="coerce")).sort_values("_ts", kind="stable")
+        times = pd.DatetimeIndex(df["_ts"])
+    else:
+        times = pd.DatetimeIndex([datetime.utcnow()] * len(df))
+    stamps = [ts.isoformat() if not pd.isna(ts) else None for ts in times]
+
+    cache_key = f"cusum_state_{identifier}"
+    states = cache_get(cache_key) or {}
+    baselines = load_baselines(db, identifier)
+    records = []
+    for col in cols:
+        mode = "residual" if baselines.get(col) else "raw"
+        state = states.get(col)
+        detector = CusumDetector.from_dict(state["detector"], config) if state and state.get("mode") == mode else CusumDetector(config)
+        expected = _expected_levels(baselines.get(col), times.fillna(pd.Timestamp(0)))
+        for value, ts, level in zip(pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64), stamps, expected):
+            if np.isnan(value) or ts is None or (mode == "residual" and np.isnan(level)):
+                continue
+            event = detector.update(float(value), ts, float(level) if mode == "residual" else None)
+            if event and event["changed_at"]:
+                records.append({
+                    "column": col,
+                    "changed_at": datetime.fromisoformat(event["changed_at"]),
+                    "method": "cusum",
+                    "mean_before": event["mean_before"],
+                    "mean_after": event["mean_after"],
+                    "magnitude": event["mean_after"] - event["mean_before"]
+                })
+        states[col] = {"mode": mode, "detector": detector.to_dict()}
+    cache_set(cache_key, states, ttl=config["ttl"])
+    _store_change_points(db, identifier, records)
+    return records
+
+def get_change_points(
+    db: Session,
+    identifier: str,
+    column: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: int = 100
+) -> List[Dict[str, Any]]:
+    """Return stored change points of an identifier, newest first."""
+    query = db.query(ChangePoint).filter(ChangePoint.identifier == identifier)
+    if column:
+        query = query.filter(ChangePoint.column == column)
+    if since:
+        query = query.filter(ChangePoint.changed_at >= since)
+    return [row.to_dict() for row in query.order_by(ChangePoint.changed_at.desc()).limit(limit).all()]
+
+def benchmark_change_points(sizes: tuple = (2000, 8000, 32000), segment: int = 200, seed: int = 0) -> List[Dict[str, float]]:
+    """
+    Time PELT and binary segmentation on piecewise-constant series of growing length.
+
+    Change points are spaced `segment` samples apart, so their number grows with
+    the length. A roughly constant time per sample shows linear scaling.
+
+    Returns:
+        list: Per size, the seconds taken and microseconds per sample of each method.
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for n in sizes:
+        levels = np.repeat(rng.normal(0, 3, n // segment + 1), segment)[:n]
+        values = levels + rng.normal(0, 1, n)
+        row = {"n": n, "true_changes": int((np.diff(levels) != 0).sum())}
+        for name, search in (("pelt", pelt), ("binseg", binary_segmentation)):
+            started = time.perf_counter()
+            found = search(values)
+            elapsed = time.perf_counter() - started
+            row[f"{name}_seconds"] = round(elapsed, 4)
+            row[f"{name}_us_per_sample"] = round(elapsed / n * 1e6, 2)
+            row[f"{name}_changes"] = len(found)
+        results.append(row)
+    return results
+
+if __name__ == "__main__":
+    # Benchmark: time per sample should stay flat as the series grows
+    for row in benchmark_change_points():
+        print(row)
+
+    # Online CUSUM: false alarms on a stationary series, then a level shift at sample 300
+    detector = CusumDetector()
+    alarms = sum(1 for i, value in enumerate(np.random.normal(10, 1, 50000)) if detector.update(float(value), str(i)))
+    print("CUSUM false alarms in 50000 stationary samples:", alarms)
+    detector = CusumDetector()
+    series = np.concatenate([np.random.normal(10, 1, 300), np.random.normal(13, 1, 200)])
+    for i, value in enumerate(series):
+        event = detector.update(float(value), str(i))
+        if event:
+            print("CUSUM change:", event)
+
+    # Daily cycle sampled every 5 minutes with a +60 shift after 10 days, tracked against its hourly baseline
+    minutes = np.arange(14 * 288) * 5
+    cycle = 100 + 30 * np.sin(2 * np.pi * minutes / 1440)
+    series = cycle + np.random.normal(0, 2, len(minutes)) + np.where(minutes >= 10 * 1440, 60, 0)
+    hourly = np.array([cycle[(minutes // 60) % 24 == hour].mean() for hour in range(24)])
+    for name, expected in (("raw", None), ("residual", hourly)):
+        detector, events = CusumDetector(), []
+        for i, value in enumerate(series):
+            event = detector.update(float(value), str(minutes[i] // 60), None if expected is None else float(expected[(minutes[i] // 60) % 24]))
+            if event:
+                events.append(event)
+        print(f"CUSUM on {name} values: {len(events)} changes, first at hour {events[0]['changed_at'] if events else None}:",
+              [(e["changed_at"], round(e["mean_before"], 1), round(e["mean_after"], 1)) for e in events][:3])
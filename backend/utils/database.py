@@ -1,9 +1,9 @@
-from sqlalchemy import create_engine, Index
+from sqlalchemy import create_engine, Index, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from utils.logger import logger
 from contextlib import contextmanager
-from typing import Generator, Dict, Any  # Added Dict to imports
+from typing import Generator, Dict, Any, List  # Added Dict to imports
 import sqlalchemy.exc as sqlexc
 from fastapi import HTTPException
 
@@ -22,6 +22,69 @@ Index(
     postgresql_using="btree"  # Optimize for PostgreSQL; adjust for other DBs if needed
 )
 
+# Columns added to existing tables after their first release, with the SQL expression backfilling old rows.
+# create_all only creates missing tables, so these are applied by upgrade_schema.
+ADDED_COLUMNS = {
+    "issues": {
+        "issue_type": None,
+        "column": None,
+        "fingerprint": None,
+        "details": None,
+        "occurrences": "1",
+        "last_seen_at": "detected_at"
+    }
+}
+
+def upgrade_schema(bind) -> List[str]:
+    """
+    Bring tables created by older releases up to the current models.
+
+    Adds the missing columns listed in ADDED_COLUMNS (backfilling old rows),
+    their unique constraints and the missing indexes of those tables. Every
+    step is skipped when already applied, so this is safe to run on each
+    start-up. Backfilled columns are made NOT NULL on PostgreSQL only; SQLite
+    cannot alter a column's nullability.
+
+    Args:
+        bind: Engine to upgrade.
+
+    Returns:
+        list: Columns and indexes that were added.
+    """
+    inspector = inspect(bind)
+    preparer = bind.dialect.identifier_preparer
+    applied = []
+    with bind.begin() as conn:
+        for table_name, columns in ADDED_COLUMNS.items():
+            if table_name not in Base.metadata.tables or not inspector.has_table(table_name):
+                continue
+            table = Base.metadata.tables[table_name]
+            quoted_table = preparer.quote(table_name)
+            existing = {column["name"] for column in inspector.get_columns(table_name)}
+            for name, backfill in columns.items():
+                if name in existing:
+                    continue
+                column = table.c[name]
+                quoted = preparer.quote(name)
+                conn.execute(text(f"ALTER TABLE {quoted_table} ADD COLUMN {quoted} {column.type.compile(dialect=bind.dialect)}"))
+                if backfill is not None:
+                    conn.execute(text(f"UPDATE {quoted_table} SET {quoted} = {backfill} WHERE {quoted} IS NULL"))
+                    if not column.nullable and bind.dialect.name == "postgresql":
+                        conn.execute(text(f"ALTER TABLE {quoted_table} ALTER COLUMN {quoted} SET NOT NULL"))
+                if column.unique:
+                    conn.execute(text(
+                        f"CREATE UNIQUE INDEX {preparer.quote(f'uq_{table_name}_{name}')} ON {quoted_table} ({quoted})"
+                    ))
+                applied.append(f"{table_name}.{name}")
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table_name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=conn)
+                    applied.append(index.name)
+    if applied:
+        logger.info(f"Upgraded database schema: {applied}")
+    return applied
+
 # Initialization function to set up the database with settings
 def init_db(database_url: str) -> None:
     """Initialize the database engine and session factory with the provided URL."""
@@ -42,6 +105,7 @@ def init_db(database_url: str) -> None:
             expire_on_commit=False,
         )
         Base.metadata.create_all(bind=engine)
+        upgrade_schema(engine)
         logger.info("Database schema initialized successfully")
     except sqlexc.SQLAlchemyError as e:
         logger.error(f"Failed to initialize database schema: {str(e)}")
@@ -0,0 +1,189 @@
+import pandas as pd
+import numpy as np
+import orjson
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from cachetools import LRUCache
+from models.schema_registry import SchemaVersion
+from utils.logger import logger
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+Row = Union[Dict[str, Any], str, bytes]
+
+# Compiled decoders keyed by (identifier, schema version); versions are immutable, so entries never go stale
+_decoder_cache: LRUCache = LRUCache(maxsize=50000)
+
+class RowDecoder:
+    """Decoder that extracts a fixed set of numeric fields from JSON rows into a NumPy array."""
+
+    def __init__(self, identifier: str, version: int, fields: List[str]):
+        self.identifier = identifier
+        self.version = version
+        self.fields = list(fields)
+        self.column_index = {field: i for i, field in enumerate(self.fields)}
+
+    def decode(self, rows: List[Row]) -> np.ndarray:
+        """
+        Decode rows into a preallocated (rows, fields) float64 array.
+
+        Args:
+            rows (list): Row dictionaries or raw JSON strings/bytes.
+
+        Returns:
+            np.ndarray: Decoded values, NaN where a field is missing or not numeric.
+        """
+        rows = [orjson.loads(row) if isinstance(row, (str, bytes)) else row for row in rows]
+        out = np.empty((len(rows), len(self.fields)), dtype=np.float64)
+        for field, j in self.column_index.items():
+            values = [row.get(field) for row in rows]
+            try:
+                # None becomes NaN; numeric strings are parsed by NumPy directly
+                out[:, j] = np.array(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                out[:, j] = pd.to_numeric(pd.Series(values, dtype="object"), errors="coerce").to_numpy(dtype=np.float64)
+        return out
+
+    def to_frame(self, rows: List[Row]) -> pd.DataFrame:
+        """Decode rows into a float64 DataFrame with one column per numeric field."""
+        return pd.DataFrame(self.decode(rows), columns=self.fields, copy=False)
+
+def compile_decoder(identifier: str, version: int, field_types: Dict[str, str]) -> RowDecoder:
+    """
+    Build a decoder for the numeric fields of a schema version.
+
+    Args:
+        identifier (str): Unique identifier for the data.
+        version (int): Schema version the decoder is built from.
+        field_types (dict): Mapping of column names to inferred types.
+
+    Returns:
+        RowDecoder: Decoder with a fixed column index map.
+    """
+    fields = sorted(col for col, col_type in field_types.items() if col_type == "numeric")
+    logger.debug(f"Compiled decoder for {identifier} v{version} with {len(fields)} numeric fields")
+    return RowDecoder(identifier, version, fields)
+
+def get_row_decoder(db: Session, identifier: str) -> Optional[RowDecoder]:
+    """
+    Return the decoder for the latest registered schema of an identifier.
+
+    Args:
+        db (Session): Database session.
+        identifier (str): Unique identifier for the data.
+
+    Returns:
+        RowDecoder or None: Decoder, or None if no usable schema is registered.
+    """
+    try:
+        # The latest version number is an indexed lookup; only a new version compiles a decoder
+        version = (
+            db.query(func.max(SchemaVersion.version))
+            .filter(SchemaVersion.identifier == identifier)
+            .scalar()
+        )
+        if not isinstance(version, int):
+            return None
+        if (identifier, version) in _decoder_cache:
+            return _decoder_cache[(identifier, version)]
+        schema = (
+            db.query(SchemaVersion)
+            .filter(SchemaVersion.identifier == identifier, SchemaVersion.version == version)
+            .first()
+        )
+        decoder = None
+        if isinstance(schema, SchemaVersion) and isinstance(schema.field_types, dict):
+            decoder = compile_decoder(identifier, schema.version, schema.field_types)
+            if not decoder.fields:
+                decoder = None
+        _decoder_cache[(identifier, version)] = decoder
+        return decoder
+    except Exception as e:
+        logger.warning(f"Could not build row decoder for {identifier}: {e}")
+        return None
+
+def get_row_decoders_bulk(db: Session, identifiers: List[str]) -> Dict[str, Optional[RowDecoder]]:
+    """
+    Return the decoders for the latest registered schemas of many identifiers.
+
+    Latest versions are resolved with one grouped query, and only schemas
+    missing from the decoder cache are loaded, with a second query.
+
+    Args:
+        db (Session): Database session.
+        identifiers (list): Identifiers to look up.
+
+    Returns:
+        dict: Decoder (or None without a usable schema) per identifier.
+    """
+    decoders: Dict[str, Optional[RowDecoder]] = {identifier: None for identifier in identifiers}
+    try:
+        latest = (
+            db.query(SchemaVersion.identifier, func.max(SchemaVersion.version).label("version"))
+            .filter(SchemaVersion.identifier.in_(list(identifiers)))
+            .group_by(SchemaVersion.identifier)
+            .subquery()
+        )
+        versions = dict(db.query(latest.c.identifier, latest.c.version).all())
+        missing = []
+        for identifier, version in versions.items():
+            if (identifier, version) in _decoder_cache:
+                decoders[identifier] = _decoder_cache[(identifier, version)]
+            else:
+                missing.append(identifier)
+        if missing:
+            schemas = (
+                db.query(SchemaVersion)
+                .join(latest, (SchemaVersion.identifier == latest.c.identifier) & (SchemaVersion.version == latest.c.version))
+                .filter(SchemaVersion.identifier.in_(missing))
+                .all()
+            )
+            for schema in schemas:
+                decoder = None
+                if isinstance(schema.field_types, dict):
+                    decoder = compile_decoder(schema.identifier, schema.version, schema.field_types)
+                    if not decoder.fields:
+                        decoder = None
+                _decoder_cache[(schema.identifier, schema.version)] = decoder
+                decoders[schema.identifier] = decoder
+    except Exception as e:
+        logger.warning(f"Could not build row decoders for {len(identifiers)} identifiers: {e}")
+    return decoders
+
+def decode_numeric_frame(
+    db: Session,
+    identifier: str,
+    rows: List[Row]
+) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Load rows into a DataFrame of numeric columns using the schema-driven decoder.
+
+    Falls back to building an object DataFrame and checking dtypes when no
+    schema is registered for the identifier yet.
+
+    Args:
+        db (Session): Database session.
+        identifier (str): Unique identifier for the data.
+        rows (list): Row dictionaries or raw JSON strings/bytes.
+
+    Returns:
+        tuple: DataFrame and the list of numeric columns with at least one value.
+    """
+    decoder = get_row_decoder(db, identifier)
+    if decoder is not None:
+        df = decoder.to_frame(rows)
+        numeric_cols = [col for col in decoder.fields if df[col].notna().any()]
+        return df, numeric_cols
+
+    df = pd.DataFrame([orjson.loads(row) if isinstance(row, (str, bytes)) else row for row in rows])
+    numeric_cols = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    return df, numeric_cols
+
+if __name__ == "__main__":
+    # Test the decoder
+    decoder = compile_decoder("test_data", 1, {"value": "numeric", "load": "numeric", "cell": "identifier"})
+    rows = [
+        {"value": 10, "load": 5, "cell": "A"},
+        b'{"value": 20.5, "load": null, "cell": "B"}',
+        {"value": "15", "cell": "A"}
+    ]
+    print("Decoded:\n", decoder.to_frame(rows))
@@ -0,0 +1,337 @@
+import math
+import hashlib
+from utils.sketches import HyperLogLog
+from utils.logger import logger
+from typing import Dict, Any, List, Optional
+
+# Default drift thresholds, overridable per identifier
+DEFAULT_DRIFT_CONFIG = {
+    "min_samples": 50,  # Observations per column before rates are trusted
+    "window": 500,  # Effective window (rows) of the decayed rates and of the cardinality sketch
+    "type_threshold": 0.1,  # Share of values not matching the registered type
+    "null_threshold": 0.2,  # Increase of the null rate over the baseline
+    "range_threshold": 0.05,  # Share of numeric values outside the baseline range
+    "range_tolerance": 0.1,  # Margin around the baseline range, relative to its span
+    "max_categories": 100,  # Distinct values above which a categorical column is flagged
+    "rearm_ratio": 0.5,  # A reported drift re-arms once its rate falls below this fraction of the threshold
+    "hll_precision": 10
+}
+
+# Observed value classes mapped onto the field type vocabulary of infer_field_types
+_FIELD_TYPES = {"bool": "boolean", "numeric": "numeric", "string": "string", "null": "null"}
+
+# Helper function to classify a raw value in constant time
+def classify_value(value: Any) -> str:
+    """Return the observed type of a raw value: null, bool, numeric, or string."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "null" if isinstance(value, float) and math.isnan(value) else "numeric"
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return "null"
+        try:
+            float(text)
+            return "numeric"
+        except ValueError:
+            return "string"
+    return "string"
+
+# Helper function to hash a value to 64 bits for the cardinality sketch
+def _hash64(value: Any) -> int:
+    """Return a stable 64-bit hash of a value's string form."""
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+class ColumnSketch:
+    """
+    Constant-size sliding summary of one column.
+
+    Type counts and range violations decay by (1 - 1/window) per observation,
+    so rates reflect roughly the last `window` values rather than the whole
+    history. Cardinality comes from two HyperLogLog generations rotated every
+    `window` observations and covers the last one to two windows.
+    """
+
+    def __init__(self, precision: int = 10, window: int = 500):
+        self.precision = precision
+        self.window = window
+        self.count = 0
+        self.weight = 0.0
+        self.type_counts: Dict[str, float] = {}
+        self.out_of_range = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.hll = HyperLogLog(precision)
+        self.previous_hll: Optional[HyperLogLog] = None
+
+    def update(self, value: Any, bounds: Optional[tuple] = None) -> str:
+        """Add a value and return its observed type."""
+        observed = classify_value(value)
+        decay = 1.0 - 1.0 / self.window
+        self.count += 1
+        self.weight = self.weight * decay + 1.0
+        for key in self.type_counts:
+            self.type_counts[key] *= decay
+        self.out_of_range *= decay
+        self.type_counts[observed] = self.type_counts.get(observed, 0.0) + 1.0
+        if self.count % self.window == 0:
+            self.previous_hll, self.hll = self.hll, HyperLogLog(self.precision)
+        if observed == "null":
+            return observed
+        self.hll.add_hash(_hash64(value))
+        if observed == "numeric":
+            number = float(value)
+            self.min = number if self.min is None else min(self.min, number)
+            self.max = number if self.max is None else max(self.max, number)
+            if bounds is not None and not bounds[0] <= number <= bounds[1]:
+                self.out_of_range += 1.0
+        return observed
+
+    @property
+    def null_rate(self) -> float:
+        return self.type_counts.get("null", 0.0) / self.weight if self.weight else 0.0
+
+    def type_share(self, observed: str) -> float:
+        """Recent share of non-null values with the given observed type."""
+        non_null = self.weight - self.type_counts.get("null", 0.0)
+        return self.type_counts.get(observed, 0.0) / non_null if non_null > 0 else 0.0
+
+    def dominant_type(self, exclude: tuple = ()) -> str:
+        """Most frequent recent non-null observed type, ignoring `exclude`."""
+        candidates = {key: weight for key, weight in self.type_counts.items() if key != "null" and key not in exclude}
+        return _FIELD_TYPES[max(candidates, key=candidates.get)] if candidates else "null"
+
+    @property
+    def out_of_range_rate(self) -> float:
+        numeric = self.type_counts.get("numeric", 0.0)
+        return self.out_of_range / numeric if numeric > 0 else 0.0
+
+    def cardinality(self) -> float:
+        """Distinct values over the last one to two windows."""
+        merged = HyperLogLog(self.precision, registers=self.hll.registers)
+        if self.previous_hll is not None:
+            merged.merge(self.previous_hll)
+        return merged.cardinality()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "precision": self.precision,
+            "window": self.window,
+            "count": self.count,
+            "weight": self.weight,
+            "type_counts": self.type_counts,
+            "out_of_range": self.out_of_range,
+            "min": self.min,
+            "max": self.max,
+            "hll": self.hll.to_dict(),
+            "previous_hll": self.previous_hll.to_dict() if self.previous_hll is not None else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ColumnSketch":
+        sketch = cls(data.get("precision", 10), data.get("window", DEFAULT_DRIFT_CONFIG["window"]))
+        sketch.count = data.get("count", 0)
+        sketch.weight = data.get("weight", float(sketch.count))
+        sketch.type_counts = dict(data.get("type_counts", {}))
+        sketch.out_of_range = data.get("out_of_range", 0.0)
+        sketch.min = data.get("min")
+        sketch.max = data.get("max")
+        sketch.hll = HyperLogLog.from_dict(data["hll"])
+        if data.get("previous_hll"):
+            sketch.previous_hll = HyperLogLog.from_dict(data["previous_hll"])
+        return sketch
+
+class SchemaDriftDetector:
+    """
+    Online schema-drift detector for one identifier.
+
+    Each row updates per-column sketches in constant time and is checked
+    against the registered schema (field types, null rates, numeric ranges).
+    Rates are computed over a sliding (decayed) window, so a drift is caught
+    as soon as recent rows cross a threshold however long the history is. A
+    drift is reported once, and re-armed once its rate falls back below
+    `rearm_ratio` of the threshold.
+    """
+
+    def __init__(
+        self,
+        identifier: str,
+        field_types: Optional[Dict[str, str]] = None,
+        stats: Optional[Dict[str, Dict[str, float]]] = None,
+        config: Optional[Dict[str, Any]] = None,
+        version: int = 0
+    ):
+        self.identifier = identifier
+        self.config = {**DEFAULT_DRIFT_CONFIG, **(config or {})}
+        self.version = version
+        self.field_types = dict(field_types or {})
+        self.bounds: Dict[str, tuple] = {}
+        self.baseline_null_rates: Dict[str, float] = {}
+        self.set_baseline(stats or {})
+        self.columns: Dict[str, ColumnSketch] = {}
+        self.reported: set = set()
+        self.rows_seen = 0
+
+    def set_baseline(self, stats: Dict[str, Dict[str, float]]) -> None:
+        """
+        Refresh range bounds and null-rate baselines from the registry statistics.
+
+        Args:
+            stats (dict): Mergeable running statistics (count, nulls, min, max) per column.
+        """
+        tolerance = self.config["range_tolerance"]
+        for col, s in stats.items():
+            if s.get("min") is not None and s.get("max") is not None:
+                margin = (s["max"] - s["min"]) * tolerance
+                self.bounds[col] = (s["min"] - margin, s["max"] + margin)
+            total = (s.get("count") or 0) + (s.get("nulls") or 0)
+            if total:
+                self.baseline_null_rates[col] = (s.get("nulls") or 0) / total
+
+    # Helper method to record a drift once per column and kind
+    def _report(self, drifts: List[Dict[str, Any]], column: str, kind: str, **details: Any) -> None:
+        if (column, kind) in self.reported:
+            return
+        self.reported.add((column, kind))
+        drifts.append({
+            "column": column,
+            "drift_type": kind,
+            "previous_type": self.field_types.get(column, "missing"),
+            "row": self.rows_seen,
+            **details
+        })
+
+    # Helper method to report a rate above its threshold, or re-arm it once it has clearly recovered
+    def _evaluate(self, drifts: List[Dict[str, Any]], column: str, kind: str, rate: float, threshold: float, **details: Any) -> None:
+        if rate > threshold:
+            self._report(drifts, column, kind, **details)
+        elif rate < threshold * self.config["rearm_ratio"]:
+            self.reported.discard((column, kind))
+
+    def update(self, row: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Add a row to the sketches and return newly detected drifts.
+
+        Args:
+            row (dict): Raw record.
+
+        Returns:
+            list: Drifts first crossing a threshold with this row (usually empty).
+        """
+        drifts = []
+        self.rows_seen += 1
+        min_samples = self.config["min_samples"]
+        type_threshold = self.config["type_threshold"]
+        for col, value in row.items():
+            sketch = self.columns.get(col)
+            if sketch is None:
+                sketch = self.columns[col] = ColumnSketch(self.config["hll_precision"], self.config["window"])
+            expected = self.field_types.get(col)
+            observed = sketch.update(value, self.bounds.get(col) if expected == "numeric" else None)
+
+            if expected is None:
+                if observed != "null":
+                    self._report(drifts, col, "added", current_type=_FIELD_TYPES[observed])
+                continue
+            if sketch.count < min_samples:
+                continue
+
+            if expected == "numeric":
+                mismatch = 1.0 - sketch.type_share("numeric")
+                self._evaluate(
+                    drifts, col, "type_changed", mismatch, type_threshold,
+                    current_type=sketch.dominant_type(exclude=("numeric",)), mismatch_rate=round(mismatch, 4)
+                )
+            elif expected in ("categorical", "identifier"):
+                share = sketch.type_share("numeric")
+                self._evaluate(
+                    drifts, col, "type_changed", share, 1.0 - type_threshold,
+                    current_type="numeric", mismatch_rate=round(share, 4)
+                )
+
+            baseline = self.baseline_null_rates.get(col, 0.0)
+            self._evaluate(
+                drifts, col, "null_rate", sketch.null_rate - baseline, self.config["null_threshold"],
+                null_rate=round(sketch.null_rate, 4), baseline=round(baseline, 4)
+            )
+            if col in self.bounds:
+                rate = sketch.out_of_range_rate
+                self._evaluate(
+                    drifts, col, "range", rate, self.config["range_threshold"],
+                    observed_min=sketch.min, observed_max=sketch.max,
+                    baseline_range=list(self.bounds[col]), out_of_range_rate=round(rate, 4)
+                )
+        return drifts
+
+    def check_cardinality(self) -> List[Dict[str, Any]]:
+        """Check categorical columns for cardinality blow-ups (run once per batch, not per row)."""
+        drifts = []
+        for col, sketch in self.columns.items():
+            if self.field_types.get(col) != "categorical" or sketch.count < self.config["min_samples"]:
+                continue
+            cardinality = sketch.cardinality()
+            self._evaluate(
+                drifts, col, "cardinality", cardinality, self.config["max_categories"],
+                current_type="categorical", cardinality=round(cardinality)
+            )
+        return drifts
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Return the current per-column sketch summary (rates over the recent window)."""
+        return {
+            col: {
+                "count": sketch.count,
+                "null_rate": round(sketch.null_rate, 4),
+                "type_counts": {key: round(weight, 2) for key, weight in sketch.type_counts.items()},
+                "cardinality": round(sketch.cardinality()),
+                "min": sketch.min,
+                "max": sketch.max
+            }
+            for col, sketch in self.columns.items()
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the detector state to a JSON-compatible dictionary."""
+        return {
+            "identifier": self.identifier,
+            "version": self.version,
+            "config": self.config,
+            "field_types": self.field_types,
+            "bounds": {col: list(b) for col, b in self.bounds.items()},
+            "baseline_null_rates": self.baseline_null_rates,
+            "columns": {col: sketch.to_dict() for col, sketch in self.columns.items()},
+            "reported": [list(item) for item in self.reported],
+            "rows_seen": self.rows_seen
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SchemaDriftDetector":
+        """Restore a detector serialized with `to_dict`."""
+        detector = cls(data["identifier"], data.get("field_types"), config=data.get("config"), version=data.get("version", 0))
+        detector.bounds = {col: tuple(b) for col, b in data.get("bounds", {}).items()}
+        detector.baseline_null_rates = data.get("baseline_null_rates", {})
+        detector.columns = {col: ColumnSketch.from_dict(s) for col, s in data.get("columns", {}).items()}
+        detector.reported = {tuple(item) for item in data.get("reported", [])}
+        detector.rows_seen = data.get("rows_seen", 0)
+        return detector
+
+if __name__ == "__main__":
+    # Test the detector
+    detector = SchemaDriftDetector(
+        "test_data",
+        field_types={"value": "numeric", "cell": "categorical"},
+        stats={"value": {"min": 0.0, "max": 100.0}},
+        config={"min_samples": 10}
+    )
+    for i in range(200):
+        row = {"value": i if i < 150 else "n/a", "cell": f"cell_{i}", "band": "n78"}
+        drifts = detector.update(row)
+        if drifts:
+            print(f"Row {i}:", drifts)
+    print("Cardinality drifts:", detector.check_cardinality())
+    restored = SchemaDriftDetector.from_dict(detector.to_dict())
+    print("Round trip rows:", restored.rows_seen, "columns:", list(restored.columns))
+    logger.info("Drift detector test complete")
@@ -1,61 +1,137 @@
 import pandas as pd
 import numpy as np
 from utils.logger import logger
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple
 from scipy import stats
+from cachetools import LRUCache
+from utils.sketches import estimate_cardinality
 
-# Helper function to refine type inference
-def _refine_type_inference(series: pd.Series, col_name: str) -> str:
-    """Refine field type inference with additional checks."""
-    try:
-        if pd.api.types.is_datetime64_any_dtype(series) or "time" in col_name.lower():
-            return "timestamp"
-        elif pd.api.types.is_numeric_dtype(series):
-            # Check if it’s more likely an identifier (e.g., low cardinality, integer-like)
-            if series.nunique() < len(series) * 0.1 and pd.api.types.is_integer_dtype(series):
-                return "identifier"
-            return "numeric"
-        elif pd.api.types.is_string_dtype(series):
-            # Check cardinality to distinguish identifiers from categorical
-            if series.nunique() < len(series) * 0.1:
-                return "identifier"
-            return "categorical"
-        elif pd.api.types.is_bool_dtype(series):
-            return "boolean"
-        else:
-            return "unknown"
-    except Exception as e:
-        logger.warning(f"Type inference refinement failed for {col_name}: {e}")
-        return "unknown"
+# Cache of inference results keyed by column signature (name, dtype, length, probe of sampled values)
+_type_inference_cache: LRUCache = LRUCache(maxsize=4096)
+# Number of evenly spaced sampled values that key the inference cache
+_SIGNATURE_PROBE = 64
+# Plausible epoch range (seconds through microseconds) for numeric timestamp columns
+_EPOCH_RANGE = (1e8, 1e17)
 
-def infer_field_types(df: pd.DataFrame, config: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+# Helper function to build a cheap cache key for a sampled column
+def _column_signature(column: pd.Series, col_name: str, sample_size: int) -> tuple:
+    """Key a column by name, dtype, length and a fixed probe of its values instead of hashing all of them."""
+    positions = np.linspace(0, len(column) - 1, min(_SIGNATURE_PROBE, len(column))).astype(np.int64)
+    probe = tuple(str(value) for value in column.iloc[positions].tolist())
+    return (str(col_name), str(column.dtype), len(column), hash(probe), sample_size)
+
+# Helper function to draw a bounded, position-stratified sample
+def _stratified_sample(df: pd.DataFrame, sample_size: int, seed: int = 42) -> pd.DataFrame:
+    """Pick one random row from each of `sample_size` equally sized strata of the frame."""
+    n_rows = len(df)
+    if n_rows <= sample_size:
+        return df
+    rng = np.random.default_rng(seed)
+    stratum = n_rows / sample_size
+    positions = (np.arange(sample_size) * stratum + rng.random(sample_size) * stratum).astype(np.int64)
+    return df.iloc[np.minimum(positions, n_rows - 1)]
+
+# Helper function to infer the type of one sampled column
+def _infer_column_type(sample: pd.Series, col_name: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Infer a column type from a sample by attempting vectorized parsing."""
+    parse_threshold = config.get("parse_threshold", 0.95)
+    identifier_ratio = config.get("identifier_ratio", 0.1)
+    if isinstance(sample.dtype, pd.CategoricalDtype):
+        sample = sample.astype("object")
+
+    non_null = sample.dropna()
+    result = {
+        "sample_size": int(len(sample)),
+        "null_rate": round(1.0 - len(non_null) / len(sample), 4) if len(sample) else 1.0,
+        "cardinality_estimate": round(estimate_cardinality(non_null)) if len(non_null) else 0
+    }
+    if non_null.empty:
+        return {**result, "type": "unknown", "confidence": 0.0}
+    low_cardinality = result["cardinality_estimate"] < len(sample) * identifier_ratio
+
+    if pd.api.types.is_bool_dtype(sample):
+        return {**result, "type": "boolean", "confidence": 1.0}
+    if pd.api.types.is_datetime64_any_dtype(sample):
+        return {**result, "type": "timestamp", "confidence": 1.0}
+    if pd.api.types.is_numeric_dtype(sample):
+        # Epoch seconds/milliseconds under a time-like name are timestamps, not measurements
+        if "time" in str(col_name).lower() and non_null.between(*_EPOCH_RANGE).all():
+            return {**result, "type": "timestamp", "confidence": 0.9}
+        # Low-cardinality integer columns are more likely identifiers than measurements
+        if low_cardinality and pd.api.types.is_integer_dtype(sample):
+            return {**result, "type": "identifier", "confidence": 0.8}
+        return {**result, "type": "numeric", "confidence": 1.0}
+
+    # Object columns: try numeric, then datetime parsing on the sample
+    numeric_ratio = float(pd.to_numeric(non_null, errors="coerce").notna().mean())
+    if numeric_ratio >= parse_threshold:
+        return {**result, "type": "numeric", "confidence": round(numeric_ratio, 4)}
+
+    # A time-like column name lowers the bar for timestamps but no longer decides on its own
+    datetime_threshold = parse_threshold * 0.8 if "time" in str(col_name).lower() else parse_threshold
+    datetime_ratio = float(
+        pd.to_datetime(non_null.astype(str), errors="coerce", format="mixed").notna().mean()
+    )
+    if datetime_ratio >= datetime_threshold:
+        return {**result, "type": "timestamp", "confidence": round(datetime_ratio, 4)}
+
+    if pd.api.types.is_string_dtype(sample) or pd.api.types.is_object_dtype(sample):
+        # Check cardinality to distinguish identifiers from categorical
+        confidence = round(1.0 - max(numeric_ratio, datetime_ratio), 4)
+        return {**result, "type": "identifier" if low_cardinality else "categorical", "confidence": confidence}
+    return {**result, "type": "unknown", "confidence": 0.0}
+
+def infer_field_types_detailed(df: pd.DataFrame, config: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
     """
-    Infer field types for each column in the DataFrame.
+    Infer field types with confidence scores from a bounded stratified sample.
+
+    The cost is O(sample_size) per column regardless of frame length, and
+    results are cached by column signature so repeated inference over the
+    same data is free.
 
     Args:
         df (pd.DataFrame): Input DataFrame.
-        config (dict, optional): Configuration for inference (e.g., custom rules).
+        config (dict, optional): Inference settings (sample_size, parse_threshold, identifier_ratio).
 
     Returns:
-        dict: Mapping of column names to inferred types.
+        dict: Mapping of column names to type, confidence, null rate and cardinality estimate.
     """
     config = config or {}
-    field_types = {}
-    
+    sample_size = config.get("sample_size", 1000)
+    details = {}
+
     if df.empty:
         logger.warning("Empty DataFrame provided for type inference")
-        return field_types
+        return details
 
+    sample = _stratified_sample(df, sample_size, seed=config.get("seed", 42))
     for col in df.columns:
         try:
-            field_type = _refine_type_inference(df[col], col)
-            field_types[col] = field_type
-            logger.debug(f"Inferred type for {col}: {field_type}")
+            column = sample[col]
+            signature = _column_signature(column, col, sample_size)
+            cached = _type_inference_cache.get(signature)
+            if cached is None:
+                cached = _infer_column_type(column, col, config)
+                _type_inference_cache[signature] = cached
+            details[col] = dict(cached)
+            logger.debug(f"Inferred type for {col}: {cached['type']} (confidence {cached['confidence']})")
         except Exception as e:
             logger.warning(f"Field type inference failed for {col}: {e}")
-            field_types[col] = "unknown"
-    
-    return field_types
+            details[col] = {"type": "unknown", "confidence": 0.0}
+    return details
+
+def infer_field_types(df: pd.DataFrame, config: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """
+    Infer field types for each column in the DataFrame.
+
+    Args:
+        df (pd.DataFrame): Input DataFrame.
+        config (dict, optional): Configuration for inference (e.g., sample_size).
+
+    Returns:
+        dict: Mapping of column names to inferred types.
+    """
+    return {col: info["type"] for col, info in infer_field_types_detailed(df, config).items()}
 
 def clean_data(df: pd.DataFrame, field_types: Dict[str, str], config: Dict[str, Any]) -> pd.DataFrame:
     """
@@ -170,6 +246,138 @@ def transform_data(df: pd.DataFrame, field_types: Dict[str, str], config: Option
     
     return df
 
+# Helper function to check whether a float column survives a float32 round trip
+def _is_float32_lossless(series: pd.Series) -> bool:
+    """Return True if casting the series to float32 preserves every value."""
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    finite = np.isfinite(values)
+    if np.any(np.abs(values[finite]) > np.finfo(np.float32).max):
+        return False
+    roundtrip = values.astype(np.float32).astype(np.float64)
+    return bool(np.all((roundtrip == values) | (np.isnan(values) & np.isnan(roundtrip))))
+
+def optimize_dtypes(
+    df: pd.DataFrame,
+    config: Optional[Dict[str, Any]] = None
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Reduce the memory footprint of a DataFrame by downcasting its columns.
+
+    Numeric columns are downcast to the smallest lossless integer type or to
+    float32 when every value round-trips exactly, and string columns with few
+    distinct values are converted to pandas `category`. Columns listed in
+    `float_columns` only go to float32: they are cleaned and scaled later,
+    which writes NaNs and fractions that an integer dtype cannot hold.
+
+    Args:
+        df (pd.DataFrame): Input DataFrame.
+        config (dict, optional): Optimization settings (e.g., max_category_ratio, float_columns).
+
+    Returns:
+        tuple: Optimized DataFrame and a memory report.
+    """
+    config = config or {}
+    max_category_ratio = config.get("max_category_ratio", 0.5)
+    max_categories = config.get("max_categories", 1000)
+    float_columns = set(config.get("float_columns", []))
+
+    df = df.copy()
+    memory_before = int(df.memory_usage(deep=True).sum())
+    conversions = {}
+
+    for col in df.columns:
+        try:
+            series = df[col]
+            original = str(series.dtype)
+            if pd.api.types.is_bool_dtype(series):
+                continue
+            elif col in float_columns and pd.api.types.is_numeric_dtype(series):
+                df[col] = series.astype(np.float32) if _is_float32_lossless(series) else series.astype(np.float64)
+            elif pd.api.types.is_integer_dtype(series):
+                df[col] = pd.to_numeric(series, downcast="integer")
+            elif pd.api.types.is_float_dtype(series):
+                non_null = series.dropna()
+                if not non_null.empty and (non_null % 1 == 0).all() and not series.isna().any():
+                    df[col] = pd.to_numeric(series, downcast="integer")
+                elif _is_float32_lossless(series):
+                    df[col] = series.astype(np.float32)
+            elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+                non_null = series.dropna()
+                if non_null.empty or not non_null.map(lambda v: isinstance(v, str)).all():
+                    continue
+                n_unique = non_null.nunique()
+                if n_unique <= max_categories and n_unique <= len(series) * max_category_ratio:
+                    df[col] = series.astype("category")
+            if str(df[col].dtype) != original:
+                conversions[col] = {"from": original, "to": str(df[col].dtype)}
+        except Exception as e:
+            logger.warning(f"Dtype optimization failed for {col}: {e}")
+
+    memory_after = int(df.memory_usage(deep=True).sum())
+    report = {
+        "memory_before_bytes": memory_before,
+        "memory_after_bytes": memory_after,
+        "memory_saved_bytes": memory_before - memory_after,
+        "memory_saved_pct": round(100.0 * (memory_before - memory_after) / memory_before, 2) if memory_before else 0.0,
+        "conversions": conversions
+    }
+    logger.debug(f"Dtype optimization saved {report['memory_saved_bytes']} bytes ({report['memory_saved_pct']}%)")
+    return df, report
+
+def encode_categoricals(
+    df: pd.DataFrame,
+    categorical_cols: List[str],
+    config: Optional[Dict[str, Any]] = None
+) -> pd.DataFrame:
+    """
+    One-hot encode categorical columns with a cap on the number of generated columns.
+
+    Columns with at most `max_one_hot` distinct values are fully one-hot encoded.
+    Wider columns are either reduced to their top-k values plus an "other"
+    bucket (method 'top_k') or hashed into a fixed number of buckets (method 'hash').
+
+    Args:
+        df (pd.DataFrame): Input DataFrame.
+        categorical_cols (list): Columns to encode.
+        config (dict, optional): Encoding settings (max_one_hot, method, hash_buckets).
+
+    Returns:
+        pd.DataFrame: DataFrame with encoded columns replacing the originals.
+    """
+    config = config or {}
+    max_one_hot = config.get("max_one_hot", 20)
+    method = config.get("method", "top_k")
+    hash_buckets = config.get("hash_buckets", 16)
+
+    encoded = []
+    for col in categorical_cols:
+        try:
+            series = df[col].astype("object")
+            n_unique = series.nunique(dropna=True)
+            if n_unique <= max_one_hot:
+                encoded.append(pd.get_dummies(series, prefix=col, dtype=np.uint8))
+            elif method == "hash":
+                buckets = pd.util.hash_pandas_object(series.fillna(""), index=False).to_numpy() % hash_buckets
+                one_hot = np.zeros((len(series), hash_buckets), dtype=np.uint8)
+                one_hot[np.arange(len(series)), buckets.astype(np.int64)] = 1
+                encoded.append(pd.DataFrame(
+                    one_hot,
+                    index=df.index,
+                    columns=[f"{col}_hash_{i}" for i in range(hash_buckets)]
+                ))
+            else:
+                top_values = series.value_counts().index[:max(1, max_one_hot - 1)]
+                capped = series.where(series.isin(top_values), "other")
+                encoded.append(pd.get_dummies(capped, prefix=col, dtype=np.uint8))
+            logger.debug(f"Encoded {col} ({n_unique} categories) with {encoded[-1].shape[1]} columns")
+        except Exception as e:
+            logger.warning(f"Categorical encoding failed for {col}: {e}")
+            categorical_cols = [c for c in categorical_cols if c != col]
+
+    if not encoded:
+        return df
+    return pd.concat([df.drop(columns=categorical_cols), *encoded], axis=1)
+
 if __name__ == "__main__":
     # Test the functions
     data = {
@@ -184,6 +392,7 @@ if __name__ == "__main__":
     # Test infer_field_types
     types = infer_field_types(df)
     print("Field Types:", types)
+    print("Field Type Details:", infer_field_types_detailed(df, {"sample_size": 2}))
 
     # Test clean_data
     config = {"impute_method": "median", "outlier_threshold": 1.5, "outlier_method": "zscore"}
@@ -192,4 +401,9 @@ if __name__ == "__main__":
 
     # Test transform_data
     transformed_df = transform_data(cleaned_df, types)
-    print("Transformed Data:\n", transformed_df)
\ No newline at end of file
+    print("Transformed Data:\n", transformed_df)
+
+    # Test optimize_dtypes and encode_categoricals
+    optimized_df, memory_report = optimize_dtypes(df)
+    print("Memory Report:", memory_report)
+    print("Encoded Data:\n", encode_categoricals(optimized_df, ["category"], {"max_one_hot": 1}))
\ No newline at end of file
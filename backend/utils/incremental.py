@@ -0,0 +1,274 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+from sklearn.cluster import KMeans
+from utils.logger import logger
+from typing import Dict, Any, List, Optional, Tuple
+
+# Helper function to normalize a record before hashing
+def _normalize_row(row: Dict[str, Any]) -> bytes:
+    """Serialize a record deterministically (sorted keys, compact separators)."""
+    return json.dumps(row, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+# Helper function to hash a single record deterministically
+def hash_row(row: Dict[str, Any]) -> str:
+    """Return a stable content hash for a record, independent of key order."""
+    return hashlib.blake2b(_normalize_row(row), digest_size=16).hexdigest()
+
+def hash_records(records: List[Dict[str, Any]], chunk_size: Optional[int] = None) -> Tuple[str, List[str]]:
+    """
+    Compute a streaming content hash of a payload and of its fixed-size chunks.
+
+    Records are normalized one at a time and fed into BLAKE2b hashers, so the
+    payload is never serialized as a whole.
+
+    Args:
+        records (list): Input records.
+        chunk_size (int, optional): Number of records per chunk; no chunk hashes if omitted.
+
+    Returns:
+        tuple: Hash of the whole payload and the list of chunk hashes.
+    """
+    payload_hasher = hashlib.blake2b(digest_size=16)
+    chunk_hasher = hashlib.blake2b(digest_size=16)
+    chunk_digests = []
+    for i, row in enumerate(records):
+        normalized = _normalize_row(row) + b"\n"
+        payload_hasher.update(normalized)
+        if chunk_size:
+            chunk_hasher.update(normalized)
+            if (i + 1) % chunk_size == 0:
+                chunk_digests.append(chunk_hasher.hexdigest())
+                chunk_hasher = hashlib.blake2b(digest_size=16)
+    if chunk_size and len(records) % chunk_size:
+        chunk_digests.append(chunk_hasher.hexdigest())
+    return payload_hasher.hexdigest(), chunk_digests
+
+def compute_running_stats(df: pd.DataFrame, numeric_cols: List[str]) -> Dict[str, Dict[str, float]]:
+    """
+    Compute mergeable per-column statistics (count, mean, M2, min, max, and nulls).
+
+    Args:
+        df (pd.DataFrame): Input DataFrame.
+        numeric_cols (list): Numeric columns to summarize.
+
+    Returns:
+        dict: Mapping of column names to running statistics.
+    """
+    stats = {}
+    for col in numeric_cols:
+        try:
+            parsed = pd.to_numeric(df[col], errors="coerce")
+            values = parsed.dropna().to_numpy(dtype=np.float64)
+            if values.size == 0:
+                continue
+            mean = float(values.mean())
+            stats[col] = {
+                "count": int(values.size),
+                "nulls": int(parsed.isna().sum()),
+                "mean": mean,
+                "m2": float(((values - mean) ** 2).sum()),
+                "min": float(values.min()),
+                "max": float(values.max())
+            }
+        except Exception as e:
+            logger.warning(f"Running statistics failed for {col}: {e}")
+    return stats
+
+def merge_running_stats(
+    previous: Dict[str, Dict[str, float]],
+    current: Dict[str, Dict[str, float]]
+) -> Dict[str, Dict[str, float]]:
+    """
+    Merge two sets of running statistics using the parallel variance update.
+
+    Args:
+        previous (dict): Statistics accumulated so far.
+        current (dict): Statistics of the newly processed rows.
+
+    Returns:
+        dict: Combined statistics, equivalent to computing over both row sets.
+    """
+    merged = {col: dict(values) for col, values in (previous or {}).items()}
+    for col, new in (current or {}).items():
+        old = merged.get(col)
+        if not old or not old.get("count"):
+            merged[col] = dict(new)
+            continue
+        count = old["count"] + new["count"]
+        delta = new["mean"] - old["mean"]
+        merged[col] = {
+            "count": count,
+            "nulls": old.get("nulls", 0) + new.get("nulls", 0),
+            "mean": old["mean"] + delta * new["count"] / count,
+            "m2": old["m2"] + new["m2"] + delta ** 2 * old["count"] * new["count"] / count,
+            "min": min(old["min"], new["min"]),
+            "max": max(old["max"], new["max"])
+        }
+    return merged
+
+def summarize_running_stats(stats: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Convert running statistics into a describe()-style summary."""
+    summary = {}
+    for col, s in (stats or {}).items():
+        count = s.get("count", 0)
+        summary[col] = {
+            "count": count,
+            "nulls": s.get("nulls", 0),
+            "mean": s.get("mean"),
+            "std": float(np.sqrt(s["m2"] / (count - 1))) if count > 1 else 0.0,
+            "min": s.get("min"),
+            "max": s.get("max")
+        }
+    return summary
+
+def running_stats_from_summary(summary: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Rebuild mergeable running statistics from a summary with count/mean/std/min/max."""
+    stats = {}
+    for col, s in (summary or {}).items():
+        count = int(s.get("count") or 0)
+        if count == 0:
+            continue
+        stats[col] = {
+            "count": count,
+            "nulls": int(s.get("nulls") or 0),
+            "mean": float(s["mean"]),
+            "m2": float(s.get("std") or 0.0) ** 2 * (count - 1),
+            "min": float(s["min"]),
+            "max": float(s["max"])
+        }
+    return stats
+
+# Helper function to move centroids from the scaled space of one scaler into another's
+def _rescale_centers(centers: np.ndarray, old: Optional[Dict[str, List[float]]], new: Optional[Dict[str, List[float]]]) -> np.ndarray:
+    if not old or not new or (old["mean"] == new["mean"] and old["std"] == new["std"]):
+        return centers
+    raw = centers * np.asarray(old["std"]) + np.asarray(old["mean"])
+    return (raw - np.asarray(new["mean"])) / np.asarray(new["std"])
+
+# Helper function to assign samples to their nearest centroid over the features they have (NaN-aware)
+def _assign_clusters(features: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    observed = ~np.isnan(features)
+    diffs = np.where(observed[:, None, :], features[:, None, :] - centers[None, :, :], 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        distances = (diffs ** 2).sum(axis=2) / observed.sum(axis=1, keepdims=True)
+    labels = np.nan_to_num(distances, nan=np.inf).argmin(axis=1)
+    return np.where(observed.any(axis=1), labels, -1)
+
+def update_cluster_model(
+    state: Optional[Dict[str, Any]],
+    features: np.ndarray,
+    n_clusters: int = 3,
+    scaler: Optional[Dict[str, List[float]]] = None
+) -> Tuple[np.ndarray, Optional[Dict[str, Any]]]:
+    """
+    Assign new samples to clusters and update the centroids incrementally.
+
+    The first call fits KMeans on the provided features; later calls assign
+    each sample to its nearest centroid and move the centroids towards the
+    new samples with a per-centroid learning rate of 1 / count (sequential k-means).
+
+    Features are standardized with running statistics that keep changing, so
+    the scaler used for each batch is stored with the centroids. When it
+    differs from the previous one, the centroids are mapped back to raw units
+    and re-standardized with the new scaler before assignment.
+
+    Cleaning leaves outliers as NaN, so only complete samples fit or move the
+    centroids. Incomplete samples are assigned afterwards by their distance over
+    the features they have; samples with no values get -1.
+
+    Args:
+        state (dict, optional): Previous model state with 'centers', 'counts' and 'scaler'.
+        features (np.ndarray): 2D array of new samples (samples, features).
+        n_clusters (int): Number of clusters used when initializing the model.
+        scaler (dict, optional): 'mean' and 'std' lists (one per feature) used to scale `features`.
+
+    Returns:
+        tuple: Cluster labels for the new samples and the updated model state.
+    """
+    features = np.asarray(features, dtype=np.float64)
+    if features.ndim != 2 or features.shape[0] == 0:
+        return np.full(features.shape[0] if features.ndim else 0, -1), state
+
+    try:
+        complete = ~np.isnan(features).any(axis=1)
+        centers = np.asarray(state["centers"], dtype=np.float64) if state else None
+        if centers is None or centers.shape[1] != features.shape[1]:
+            if not complete.any():
+                return np.full(features.shape[0], -1), state
+            k = min(n_clusters, int(complete.sum()))
+            model = KMeans(n_clusters=k, random_state=42, n_init=10).fit(features[complete])
+            counts = np.bincount(model.labels_, minlength=k).astype(np.float64)
+            centers = model.cluster_centers_
+            return _assign_clusters(features, centers), {"centers": centers.tolist(), "counts": counts.tolist(), "scaler": scaler}
+
+        centers = _rescale_centers(centers, state.get("scaler"), scaler)
+        counts = np.asarray(state["counts"], dtype=np.float64)
+        labels = _assign_clusters(features, centers)
+        for label in np.unique(labels[complete]):
+            members = features[complete & (labels == label)]
+            new_count = counts[label] + len(members)
+            centers[label] += (members.sum(axis=0) - len(members) * centers[label]) / new_count
+            counts[label] = new_count
+        return labels, {"centers": centers.tolist(), "counts": counts.tolist(), "scaler": scaler or state.get("scaler")}
+    except Exception as e:
+        logger.error(f"Incremental clustering failed: {e}")
+        return np.full(features.shape[0], -1), state
+
+def select_new_rows(
+    df: pd.DataFrame,
+    strategy: str,
+    watermark: Optional[str] = None,
+    timestamp_col: Optional[str] = None,
+    seen: Optional[List[bool]] = None
+) -> pd.Series:
+    """
+    Build a boolean mask of rows that have not been processed before.
+
+    Args:
+        df (pd.DataFrame): Incoming rows.
+        strategy (str): 'watermark' (timestamp greater than the last processed one) or 'hash'.
+        watermark (str, optional): ISO timestamp of the newest processed row.
+        timestamp_col (str, optional): Column holding row timestamps.
+        seen (list, optional): For the 'hash' strategy, whether each row is new.
+
+    Returns:
+        pd.Series: Boolean mask aligned with `df`.
+    """
+    if strategy == "watermark" and timestamp_col in df.columns:
+        timestamps = pd.to_datetime(df[timestamp_col], errors="coerce")
+        if watermark is None:
+            return pd.Series(True, index=df.index)
+        return timestamps.isna() | (timestamps > pd.Timestamp(watermark))
+    if seen is not None:
+        return pd.Series(seen, index=df.index)
+    return pd.Series(True, index=df.index)
+
+if __name__ == "__main__":
+    # Test the functions
+    first = pd.DataFrame({"value": [1.0, 2.0, 3.0], "load": [10.0, 20.0, 30.0]})
+    second = pd.DataFrame({"value": [4.0, 5.0], "load": [40.0, 50.0]})
+
+    merged = merge_running_stats(
+        compute_running_stats(first, ["value", "load"]),
+        compute_running_stats(second, ["value", "load"])
+    )
+    print("Merged Summary:", summarize_running_stats(merged))
+    print("Full Summary:", pd.concat([first, second]).describe().loc[["mean", "std"]].to_dict())
+
+    labels, state = update_cluster_model(None, first.values, n_clusters=2)
+    labels, state = update_cluster_model(state, second.values)
+    print("Cluster Labels:", labels, "State:", state)
+
+    # Outliers cleaned to NaN must not stop the centroids from being learned and kept across runs
+    first.loc[1, "load"] = np.nan
+    second.loc[0, "value"] = np.nan
+    labels, state = update_cluster_model(None, first.values, n_clusters=2)
+    assert state is not None, "Centroids were not learned from a batch with NaN"
+    labels, next_state = update_cluster_model(state, second.values)
+    assert next_state["counts"] != state["counts"], "Centroids did not persist and update across runs"
+    print("Cluster Labels with NaN:", labels, "Counts:", state["counts"], "->", next_state["counts"])
+
+    print("Row Hash:", hash_row({"value": 1, "load": 2}) == hash_row({"load": 2, "value": 1}))
+    print("Payload Hashes:", hash_records(first.to_dict(orient="records"), chunk_size=2))
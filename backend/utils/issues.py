@@ -0,0 +1,150 @@
+import hashlib
+from sqlalchemy.orm import Session
+from models.issue import Issue, SeverityLevel
+from utils.logger import logger
+from typing import Dict, Any, List, Optional, Set
+from datetime import datetime
+
+# Helper function to fingerprint an issue so re-detections map onto the same row
+def issue_fingerprint(identifier: str, issue_type: Optional[str], column: Optional[str]) -> str:
+    return hashlib.sha1(f"{identifier}|{issue_type or ''}|{column or ''}".encode()).hexdigest()
+
+# Helper function to coerce detector severities into the stored enum
+def _severity(value: Optional[str]) -> SeverityLevel:
+    try:
+        return SeverityLevel(str(value).lower())
+    except ValueError:
+        return SeverityLevel.MEDIUM
+
+def persist_issues(
+    db: Session,
+    issues_by_identifier: Dict[str, List[Dict[str, Any]]],
+    agent_id: Optional[str] = None,
+    evaluated: Optional[Dict[str, Set[str]]] = None
+) -> Dict[str, int]:
+    """
+    Upsert detected issues and resolve the ones that were not detected again.
+
+    Every issue is keyed by its fingerprint (identifier + type + column). A
+    re-detection updates the existing row (or reopens a resolved one) instead
+    of inserting a duplicate. Open issues of an analyzed identifier that are
+    missing from the current detection are marked resolved, but only for the
+    issue types whose detector actually ran for that identifier, so a skipped
+    detector (e.g. no anomaly model yet) does not flap its issues. Existing
+    rows for all identifiers are loaded with one query.
+
+    Args:
+        db (Session): Database session.
+        issues_by_identifier (dict): Current issues per analyzed identifier (empty list = all clear).
+        agent_id (str, optional): Agent that ran the detection.
+        evaluated (dict, optional): Issue types evaluated per identifier; all types when omitted.
+
+    Returns:
+        dict: Number of issues opened, updated, reopened and resolved.
+    """
+    counts = {"opened": 0, "updated": 0, "reopened": 0, "resolved": 0}
+    if not issues_by_identifier:
+        return counts
+    now = datetime.utcnow()
+
+    current: Dict[str, tuple] = {}
+    for identifier, issues in issues_by_identifier.items():
+        for issue in issues:
+            fingerprint = issue_fingerprint(identifier, issue.get("type"), issue.get("column"))
+            current[fingerprint] = (identifier, issue)
+
+    existing = {
+        row.fingerprint: row
+        for row in db.query(Issue)
+        .filter(Issue.identifier.in_(list(issues_by_identifier)), Issue.fingerprint.isnot(None))
+        .all()
+    }
+
+    for fingerprint, (identifier, issue) in current.items():
+        row = existing.get(fingerprint)
+        if row is None:
+            db.add(Issue(
+                identifier=identifier,
+                description=issue["description"],
+                severity=_severity(issue.get("severity")),
+                issue_type=issue.get("type"),
+                column=issue.get("column"),
+                fingerprint=fingerprint,
+                details=issue.get("details"),
+                agent_id=agent_id,
+                detected_at=now,
+                last_seen_at=now,
+                status="open"
+            ))
+            counts["opened"] += 1
+            continue
+        if row.status == "resolved":
+            row.status = "open"
+            row.detected_at = now
+            row.resolved_at = None
+            row.occurrences = 0
+            counts["reopened"] += 1
+        else:
+            counts["updated"] += 1
+        row.description = issue["description"]
+        row.severity = _severity(issue.get("severity"))
+        row.details = issue.get("details")
+        row.agent_id = agent_id or row.agent_id
+        row.last_seen_at = now
+        row.occurrences = (row.occurrences or 0) + 1
+
+    for fingerprint, row in existing.items():
+        if fingerprint in current or row.status == "resolved":
+            continue
+        if evaluated is None or row.issue_type in evaluated.get(row.identifier, ()):
+            row.status = "resolved"
+            row.resolved_at = now
+            counts["resolved"] += 1
+
+    db.commit()
+    logger.debug(f"Persisted issues for {len(issues_by_identifier)} identifiers: {counts}")
+    return counts
+
+def query_issues(
+    db: Session,
+    identifier: Optional[str] = None,
+    status: Optional[str] = None,
+    severity: Optional[str] = None,
+    issue_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: int = 50,
+    offset: int = 0
+) -> Dict[str, Any]:
+    """
+    Page through stored issues, newest activity first.
+
+    Filters map onto the (identifier, status) and (status, severity, last_seen_at)
+    indexes, so dashboard reads never rerun detection.
+
+    Args:
+        db (Session): Database session.
+        identifier (str, optional): Only issues of this identifier.
+        status (str, optional): 'open', 'in_progress' or 'resolved'.
+        severity (str, optional): 'low', 'medium', 'high' or 'critical'.
+        issue_type (str, optional): Issue kind (e.g., 'anomaly', 'trend').
+        since (datetime, optional): Only issues seen at or after this time.
+        limit (int): Page size.
+        offset (int): Rows to skip.
+
+    Returns:
+        dict: Total matching issues and the requested page.
+    """
+    query = db.query(Issue)
+    if identifier:
+        query = query.filter(Issue.identifier == identifier)
+    if status:
+        query = query.filter(Issue.status == status.lower())
+    if severity:
+        query = query.filter(Issue.severity == SeverityLevel(severity.lower()))
+    if issue_type:
+        query = query.filter(Issue.issue_type == issue_type)
+    if since:
+        query = query.filter(Issue.last_seen_at >= since)
+    total = query.count()
+    rows = query.order_by(Issue.last_seen_at.desc(), Issue.id.desc()).offset(offset).limit(limit).all()
+    return {"total": total, "limit": limit, "offset": offset, "items": [row.to_dict() for row in rows]}
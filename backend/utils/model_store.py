@@ -0,0 +1,208 @@
+import os
+import re
+import json
+import hashlib
+import joblib
+from cachetools import LRUCache
+from config.settings import settings
+from utils.logger import logger
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+
+# Loaded models per (kind, key): (version, model, metadata); bounded so hot models stay resident
+_model_cache: LRUCache = LRUCache(maxsize=settings.MODEL_CACHE_SIZE)
+
+# Helper function to turn a model key into a safe, collision-free directory name
+def _safe_name(key: str) -> str:
+    digest = hashlib.blake2b(key.encode(), digest_size=4).hexdigest()
+    return f"{re.sub(r'[^A-Za-z0-9._-]', '_', key)[:100]}-{digest}"
+
+# Helper function to locate the directory holding all versions of a model
+def _model_dir(kind: str, key: str) -> str:
+    return os.path.join(settings.MODEL_STORE_DIR, kind, _safe_name(key))
+
+# Helper function to write a file atomically so readers never see a partial model
+def _atomic_write(path: str, write) -> None:
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    with open(path, "w") as f:
+        json.dump(data, f, default=str)
+
+def _read_latest(directory: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(directory, "latest.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+# File extension per serialization format; Keras models use their native format
+_EXTENSIONS = {"joblib": "joblib", "keras": "keras"}
+
+def _dump(model: Any, path: str, fmt: str) -> None:
+    if fmt == "keras":
+        # Keras infers the format from the extension, so save under it and move into place
+        model.save(f"{path}.keras")
+        os.replace(f"{path}.keras", path)
+    else:
+        joblib.dump(model, path)
+
+def _load(path: str, fmt: str) -> Any:
+    if fmt == "keras":
+        from tensorflow.keras.models import load_model as load_keras_model  # Only workers serving Keras models pay for TensorFlow
+        return load_keras_model(path, compile=False)
+    return joblib.load(path)
+
+def save_model(
+    kind: str,
+    key: str,
+    model: Any,
+    metadata: Optional[Dict[str, Any]] = None,
+    fmt: str = "joblib"
+) -> int:
+    """
+    Persist a fitted model as a new version and make it the latest.
+
+    Args:
+        kind (str): Model family (e.g., 'isolation_forest').
+        key (str): Identifier or cluster the model was trained for.
+        model (Any): Fitted model.
+        metadata (dict, optional): Training metadata (features, rows, parameters).
+        fmt (str): 'joblib' for picklable models or 'keras' for Keras models.
+
+    Returns:
+        int: Version number of the stored model.
+    """
+    if fmt not in _EXTENSIONS:
+        raise ValueError(f"Unsupported model format: {fmt}")
+    directory = _model_dir(kind, key)
+    os.makedirs(directory, exist_ok=True)
+    latest = _read_latest(directory)
+    version = (latest["version"] + 1) if latest else 1
+    metadata = {
+        **(metadata or {}),
+        "kind": kind,
+        "key": key,
+        "version": version,
+        "format": fmt,
+        "saved_at": datetime.utcnow().isoformat()
+    }
+
+    _atomic_write(os.path.join(directory, f"v{version}.{_EXTENSIONS[fmt]}"), lambda path: _dump(model, path, fmt))
+    _atomic_write(os.path.join(directory, "latest.json"), lambda path: _write_json(path, metadata))
+
+    # Keep a few previous versions for rollback
+    stale = version - settings.MODEL_STORE_KEEP_VERSIONS
+    while stale > 0 and os.path.exists(os.path.join(directory, f"v{stale}.{_EXTENSIONS[fmt]}")):
+        os.remove(os.path.join(directory, f"v{stale}.{_EXTENSIONS[fmt]}"))
+        stale -= 1
+
+    _model_cache[(kind, key)] = (version, model, metadata)
+    logger.info(f"Stored {kind} model for {key} as version {version}")
+    return version
+
+def load_model(kind: str, key: str) -> Optional[Tuple[Any, Dict[str, Any]]]:
+    """
+    Return the latest stored model and its metadata, from the in-process cache when current.
+
+    Only the small version pointer is read on a cache hit, so models retrained
+    by another worker are picked up on the next call.
+
+    Args:
+        kind (str): Model family.
+        key (str): Identifier or cluster the model was trained for.
+
+    Returns:
+        tuple or None: (model, metadata), or None if no model has been trained.
+    """
+    latest = _read_latest(_model_dir(kind, key))
+    if latest is None:
+        return None
+    cached = _model_cache.get((kind, key))
+    if cached and cached[0] == latest["version"]:
+        return cached[1], cached[2]
+    try:
+        fmt = latest.get("format", "joblib")
+        model = _load(os.path.join(_model_dir(kind, key), f"v{latest['version']}.{_EXTENSIONS[fmt]}"), fmt)
+    except Exception as e:
+        logger.warning(f"Could not load {kind} model for {key}: {e}")
+        return None
+    _model_cache[(kind, key)] = (latest["version"], model, latest)
+    return model, latest
+
+def model_metadata(kind: str, key: str) -> Optional[Dict[str, Any]]:
+    """Return the metadata of the latest stored model without loading it."""
+    return _read_latest(_model_dir(kind, key))
+
+def register_model_members(kind: str, key: str, identifiers: List[str]) -> List[str]:
+    """
+    Record the identifiers a shared (cluster) model is trained on.
+
+    The membership is kept next to the model versions, before any model
+    exists, so cold starts and the periodic retrain know whose history to
+    pool. New identifiers are added to the stored set; the file is only
+    rewritten when it changes.
+
+    Args:
+        kind (str): Model family.
+        key (str): Cluster the model is stored under.
+        identifiers (list): Identifiers scored with the model.
+
+    Returns:
+        list: All known members of the cluster, sorted.
+    """
+    directory = _model_dir(kind, key)
+    path = os.path.join(directory, "members.json")
+    known = model_members(kind, key)
+    members = sorted(set(known) | set(identifiers))
+    if members != known:
+        os.makedirs(directory, exist_ok=True)
+        _atomic_write(path, lambda tmp: _write_json(tmp, {"key": key, "identifiers": members}))
+    return members
+
+def model_members(kind: str, key: str) -> List[str]:
+    """Return the recorded members of a shared model, empty for per-identifier models."""
+    try:
+        with open(os.path.join(_model_dir(kind, key), "members.json")) as f:
+            return sorted(json.load(f)["identifiers"])
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return []
+
+def list_model_members(kind: str) -> Dict[str, List[str]]:
+    """Return the members of every shared model of a family, keyed by model key."""
+    clusters = {}
+    root = os.path.join(settings.MODEL_STORE_DIR, kind)
+    if not os.path.isdir(root):
+        return clusters
+    for name in os.listdir(root):
+        try:
+            with open(os.path.join(root, name, "members.json")) as f:
+                data = json.load(f)
+            clusters[data["key"]] = sorted(data["identifiers"])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, NotADirectoryError):
+            continue
+    return clusters
+
+def list_models(kind: str) -> List[Dict[str, Any]]:
+    """Return the metadata of the latest version of every stored model of a family."""
+    models = []
+    root = os.path.join(settings.MODEL_STORE_DIR, kind)
+    if not os.path.isdir(root):
+        return models
+    for name in os.listdir(root):
+        latest = _read_latest(os.path.join(root, name))
+        if latest:
+            models.append(latest)
+    return models
+
+if __name__ == "__main__":
+    # Test the store with a small model
+    from sklearn.preprocessing import StandardScaler
+    import numpy as np
+
+    scaler = StandardScaler().fit(np.random.normal(size=(100, 3)))
+    print("Saved version:", save_model("scaler", "cell/1", scaler, {"columns": ["a", "b", "c"]}))
+    model, meta = load_model("scaler", "cell/1")
+    print("Loaded:", type(model).__name__, meta["version"], meta["columns"])
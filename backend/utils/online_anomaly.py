@@ -0,0 +1,216 @@
+import math
+import numpy as np
+import pandas as pd
+from statistics import NormalDist
+from utils.cache import cache_get, cache_set
+from utils.logger import logger
+from typing import Dict, Any, List, Optional
+
+# Default online detection settings, overridable per source
+DEFAULT_ONLINE_CONFIG = {
+    "half_life": 200,  # Samples after which an observation's weight in the EW statistics halves
+    "z_threshold": 4.0,  # Per-column |robust z| that flags a sample
+    "mahalanobis_p": 0.9999,  # Tail probability of the joint (chi-square) threshold
+    "huber_k": 3.0,  # Residuals beyond k sigma are clipped before updating, so outliers barely move the baseline
+    "warmup": 50,  # Samples before scores are trusted
+    "refresh_every": 500,  # Recompute the inverse covariance exactly this often to bound rounding drift
+    "min_rel_std": 1e-3,  # Std floor as a fraction of |mean|, so near-constant columns are not scored on rounding noise
+    "min_std": 1e-9,  # Absolute std floor for columns centred on zero
+    "ttl": 7 * 86400  # Lifetime of the per-identifier state in Redis
+}
+
+# Helper function to approximate the chi-square quantile (Wilson-Hilferty) without SciPy
+def chi2_quantile(p: float, dof: int) -> float:
+    z = NormalDist().inv_cdf(p)
+    h = 2.0 / (9.0 * dof)
+    return dof * (1.0 - h + z * math.sqrt(h)) ** 3
+
+class OnlineAnomalyDetector:
+    """
+    Per-identifier streaming detector scoring each sample before learning from it.
+
+    Keeps exponentially weighted means and a covariance matrix together with
+    its inverse. Each sample gets a robust z-score per column and a joint
+    Mahalanobis distance. The inverse is updated in O(k^2) per sample with
+    Sherman-Morrison instead of re-inverting. Residuals are Huber-clipped
+    before the update so anomalies do not drag the baseline towards
+    themselves. State is a few small arrays and serializes to JSON for Redis.
+
+    Per-column variances are floored relative to the column mean, and columns
+    whose variance is below that floor (e.g. constant so far) are left out of
+    the Mahalanobis term, so the inverse is only kept for a well-conditioned
+    block of the covariance.
+    """
+
+    def __init__(self, columns: List[str], config: Optional[Dict[str, Any]] = None):
+        self.config = {**DEFAULT_ONLINE_CONFIG, **(config or {})}
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.alpha = 1.0 - 0.5 ** (1.0 / self.config["half_life"])
+        self.count = 0
+        self.mean = np.zeros(k)
+        self.cov = np.zeros((k, k))
+        self.active = np.zeros(k, dtype=bool)  # Columns with enough variance to enter the Mahalanobis term
+        self.inv_cov = np.zeros((0, 0))  # Inverse of the covariance block of the active columns
+        self.threshold = chi2_quantile(self.config["mahalanobis_p"], 1)
+
+    # Helper method to compute the per-column variance floor
+    def _variance_floor(self) -> np.ndarray:
+        return np.maximum(self.config["min_rel_std"] * np.abs(self.mean), self.config["min_std"]) ** 2
+
+    # Helper method to refresh the active columns and their inverse covariance exactly
+    def _refresh_inverse(self) -> None:
+        self.active = np.diag(self.cov) > self._variance_floor()
+        idx = np.flatnonzero(self.active)
+        self.inv_cov = np.linalg.pinv(self.cov[np.ix_(idx, idx)]) if idx.size else np.zeros((0, 0))
+        self.threshold = chi2_quantile(self.config["mahalanobis_p"], max(idx.size, 1))
+
+    def score(self, x: np.ndarray) -> Dict[str, Any]:
+        """
+        Score one sample against the state seen so far, then update the state.
+
+        Missing values are imputed with the current mean (zero residual).
+
+        Args:
+            x (np.ndarray): Sample values in `columns` order.
+
+        Returns:
+            dict: Per-column z-scores, Mahalanobis distance and whether the sample is anomalous.
+        """
+        x = np.where(np.isnan(x), self.mean, x)
+        if self.count == 0:
+            self.mean = x.astype(np.float64)
+            self.count = 1
+            return {"z_scores": {}, "mahalanobis": None, "anomalous": False}
+
+        residual = x - self.mean
+        floor = self._variance_floor()
+        variances = np.diag(self.cov)
+        z = residual / np.sqrt(np.maximum(variances, floor))
+        if not np.array_equal(variances > floor, self.active):
+            self._refresh_inverse()
+        active_residual = residual[self.active]
+        d2 = float(active_residual @ self.inv_cov @ active_residual) if active_residual.size else 0.0
+        warm = self.count > self.config["warmup"]
+        flagged = np.abs(z) > self.config["z_threshold"]
+        anomalous = warm and (bool(flagged.any()) or d2 > self.threshold)
+
+        # Huber-clip the residual (jointly, by Mahalanobis radius) before learning from it
+        limit = self.config["huber_k"] ** 2 * max(int(self.active.sum()), 1)
+        if warm and d2 > limit:
+            residual = residual * math.sqrt(limit / d2)
+
+        # cov' = (1 - a)(cov + a r r^T); a = 1/n during warmup gives the exact sample statistics
+        a = max(self.alpha, 1.0 / (self.count + 1))
+        self.mean = self.mean + a * residual
+        self.cov = (1.0 - a) * (self.cov + a * np.outer(residual, residual))
+        self.count += 1
+        if self.count <= self.config["warmup"] or self.count % self.config["refresh_every"] == 0:
+            self._refresh_inverse()
+        else:
+            # Sherman-Morrison on the active block: invert the rank-one update in O(k^2)
+            active_residual = residual[self.active]
+            p_r = self.inv_cov @ active_residual
+            denom = 1.0 + a * float(active_residual @ p_r)
+            self.inv_cov = (self.inv_cov - a * np.outer(p_r, p_r) / denom) / (1.0 - a)
+
+        return {
+            "z_scores": {col: float(z[j]) for j, col in enumerate(self.columns) if flagged[j]},
+            "mahalanobis": math.sqrt(max(d2, 0.0)),
+            "anomalous": anomalous
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the detector state (the inverse is rebuilt on load)."""
+        return {"columns": self.columns, "count": self.count, "mean": self.mean.tolist(), "cov": self.cov.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> "OnlineAnomalyDetector":
+        """Restore a detector from its serialized state."""
+        detector = cls(data["columns"], config)
+        detector.count = data["count"]
+        detector.mean = np.asarray(data["mean"], dtype=np.float64)
+        detector.cov = np.asarray(data["cov"], dtype=np.float64)
+        detector._refresh_inverse()
+        return detector
+
+def score_stream(
+    identifier: str,
+    df: pd.DataFrame,
+    numeric_cols: List[str],
+    timestamp_col: Optional[str] = None,
+    config: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Score newly ingested samples in arrival order with the identifier's online detector.
+
+    The detector is loaded from Redis, run over the batch and saved back.
+    If the column set changes, the detector starts over.
+
+    Args:
+        identifier (str): Unique identifier for the data.
+        df (pd.DataFrame): New rows with raw (unscaled) values.
+        numeric_cols (list): Columns to score jointly.
+        timestamp_col (str, optional): Column holding sample timestamps, used for ordering.
+        config (dict, optional): Overrides for DEFAULT_ONLINE_CONFIG.
+
+    Returns:
+        list: One event per anomalous sample, ready to emit.
+    """
+    config = {**DEFAULT_ONLINE_CONFIG, **(config or {})}
+    cols = [col for col in numeric_cols if col in df.columns]
+    if df.empty or not cols:
+        return []
+    if timestamp_col in df.columns:
+        df = df.assign(_ts=pd.to_datetime(df[timestamp_col], errors="coerce")).sort_values("_ts", kind="stable")
+        timestamps = df["_ts"].tolist()
+    else:
+        timestamps = [None] * len(df)
+
+    cache_key = f"online_detector_{identifier}"
+    state = cache_get(cache_key)
+    if state and state.get("columns") == cols:
+        detector = OnlineAnomalyDetector.from_dict(state, config)
+    else:
+        detector = OnlineAnomalyDetector(cols, config)
+
+    events = []
+    values = df[cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    for row, ts in zip(values, timestamps):
+        result = detector.score(row)
+        if not result["anomalous"]:
+            continue
+        columns = ", ".join(result["z_scores"]) or "joint behaviour of " + ", ".join(cols)
+        events.append({
+            "identifier": identifier,
+            "description": f"Streaming anomaly in {columns} (Mahalanobis {result['mahalanobis']:.2f})",
+            "detection": "online",
+            "timestamp": ts.isoformat() if ts is not None and not pd.isna(ts) else None,
+            "values": {col: (None if np.isnan(v) else float(v)) for col, v in zip(cols, row)},
+            "z_scores": result["z_scores"],
+            "mahalanobis": result["mahalanobis"],
+            "threshold": math.sqrt(detector.threshold),
+            "severity": "high" if result["mahalanobis"] > 2 * math.sqrt(detector.threshold) else "medium"
+        })
+    cache_set(cache_key, detector.to_dict(), ttl=config["ttl"])
+    if events:
+        logger.info(f"Online detector flagged {len(events)} of {len(values)} samples for {identifier}")
+    return events
+
+if __name__ == "__main__":
+    # Test on correlated data with an injected joint anomaly (each value alone is unremarkable)
+    rng = np.random.default_rng(0)
+    load = rng.normal(50, 10, 2000)
+    samples = np.column_stack([load, 2 * load + rng.normal(0, 2, 2000)])
+    samples[1500] = [65, 70]
+    detector = OnlineAnomalyDetector(["load", "throughput"])
+    flagged = [i for i, x in enumerate(samples) if detector.score(x)["anomalous"]]
+    print("Flagged samples:", flagged)
+    restored = OnlineAnomalyDetector.from_dict(detector.to_dict())
+    print("Inverse drift:", float(np.abs(restored.inv_cov - detector.inv_cov).max()))
+
+    # A column constant during warmup must not flag on a tiny shift
+    detector = OnlineAnomalyDetector(["load", "tilt"])
+    steady = [detector.score(np.array([rng.normal(50, 10), 10.0])) for _ in range(100)]
+    shifted = [detector.score(np.array([rng.normal(50, 10), 10.001]))["anomalous"] for _ in range(50)]
+    print("Flagged after a 0.001 shift:", sum(shifted), "of", len(shifted))
@@ -0,0 +1,210 @@
+import hashlib
+import pandas as pd
+import numpy as np
+from sqlalchemy.orm import Session
+from models.kpi_sketch import KpiQuantileSketch
+from utils.sketches import KLLSketch
+from utils.kpi import load_kpis
+from utils.cache import cache_get, cache_set, cache_delete
+from utils.logger import logger
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+
+# Identifiers hash to this many shards per (kpi, bucket), so concurrent ingests rarely lock the same row
+FLEET_SHARDS = 16
+# Quantiles reported for the network distribution
+DISTRIBUTION_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+# Helper function to map an identifier to its sketch shard
+def _shard(identifier: str) -> int:
+    return int.from_bytes(hashlib.blake2b(identifier.encode(), digest_size=4).digest(), "big") % FLEET_SHARDS
+
+# Helper function to build the cache key of a merged fleet sketch
+def _fleet_cache_key(kpi: str, bucket_start: datetime) -> str:
+    return f"fleet_sketch_{kpi}_{bucket_start.isoformat()}"
+
+def update_fleet_sketches(
+    db: Session,
+    identifier: str,
+    df: pd.DataFrame,
+    numeric_cols: List[str],
+    timestamp_col: Optional[str] = None,
+    k: int = 200
+) -> int:
+    """
+    Fold raw ingested values into the fleet-wide hourly KLL sketches of each KPI.
+
+    The batch is summarized into one small sketch per (kpi, hour) first, then
+    merged into the identifier's shard row under a row lock.
+
+    Args:
+        db (Session): Database session.
+        identifier (str): Unique identifier for the data.
+        df (pd.DataFrame): New rows with raw (unscaled) values.
+        numeric_cols (list): KPI columns to sketch.
+        timestamp_col (str, optional): Column holding sample timestamps (current hour if missing).
+        k (int): KLL accuracy parameter.
+
+    Returns:
+        int: Number of (kpi, hour) sketches updated.
+    """
+    cols = [col for col in numeric_cols if col in df.columns]
+    if df.empty or not cols:
+        return 0
+    if timestamp_col in df.columns:
+        hours = pd.to_datetime(df[timestamp_col], errors="coerce").dt.floor("h")
+    else:
+        hours = pd.Series(pd.Timestamp.utcnow().tz_localize(None).floor("h"), index=df.index)
+    frame = df[cols].apply(pd.to_numeric, errors="coerce").assign(_hour=hours).dropna(subset=["_hour"])
+    if frame.empty:
+        return 0
+
+    shard = _shard(identifier)
+    batch_sketches: Dict[tuple, KLLSketch] = {}
+    for hour, group in frame.groupby("_hour"):
+        for col in cols:
+            values = group[col].to_numpy(dtype=np.float64)
+            if np.isnan(values).all():
+                continue
+            sketch = KLLSketch(k)
+            sketch.update(values)
+            batch_sketches[(col, hour.to_pydatetime())] = sketch
+    if not batch_sketches:
+        return 0
+
+    bucket_starts = sorted({bucket for _, bucket in batch_sketches})
+    rows = {
+        (row.kpi, row.bucket_start): row
+        for row in db.query(KpiQuantileSketch)
+        .filter(
+            KpiQuantileSketch.shard == shard,
+            KpiQuantileSketch.kpi.in_(cols),
+            KpiQuantileSketch.bucket_start.in_(bucket_starts)
+        )
+        .with_for_update()
+        .all()
+    }
+    for (col, bucket_start), sketch in batch_sketches.items():
+        row = rows.get((col, bucket_start))
+        if row is None:
+            db.add(KpiQuantileSketch(kpi=col, bucket_start=bucket_start, shard=shard, sketch=sketch.to_dict(), count=sketch.n))
+            continue
+        merged = KLLSketch.from_dict(row.sketch).merge(sketch)
+        row.sketch = merged.to_dict()
+        row.count = merged.n
+    db.commit()
+    for col, bucket_start in batch_sketches:
+        cache_delete(_fleet_cache_key(col, bucket_start))
+    return len(batch_sketches)
+
+def load_fleet_sketch(db: Session, kpi: str, bucket_start: datetime, ttl: int = 30) -> Optional[KLLSketch]:
+    """
+    Return the network-wide sketch of a KPI for an hourly bucket, merged across shards.
+
+    Args:
+        db (Session): Database session.
+        kpi (str): KPI column.
+        bucket_start (datetime): Start of the hour.
+        ttl (int): Time-to-live of the merged sketch in the cache.
+
+    Returns:
+        KLLSketch or None: Merged sketch, or None if no values were ingested for the bucket.
+    """
+    cache_key = _fleet_cache_key(kpi, bucket_start)
+    cached = cache_get(cache_key)
+    if cached:
+        return KLLSketch.from_dict(cached)
+    rows = (
+        db.query(KpiQuantileSketch)
+        .filter(KpiQuantileSketch.kpi == kpi, KpiQuantileSketch.bucket_start == bucket_start)
+        .all()
+    )
+    if not rows:
+        return None
+    merged = KLLSketch.from_dict(rows[0].sketch)
+    for row in rows[1:]:
+        merged.merge(KLLSketch.from_dict(row.sketch))
+    cache_set(cache_key, merged.to_dict(), ttl=ttl)
+    return merged
+
+def fleet_distribution(
+    db: Session,
+    kpi: str,
+    bucket_start: datetime,
+    quantiles: tuple = DISTRIBUTION_QUANTILES
+) -> Optional[Dict[str, Any]]:
+    """Summarize the network distribution of a KPI for an hourly bucket."""
+    sketch = load_fleet_sketch(db, kpi, bucket_start)
+    if sketch is None:
+        return None
+    return _summarize(sketch, kpi, bucket_start, quantiles)
+
+# Helper function to describe a merged sketch
+def _summarize(sketch: KLLSketch, kpi: str, bucket_start: datetime, quantiles: tuple = DISTRIBUTION_QUANTILES) -> Dict[str, Any]:
+    return {
+        "kpi": kpi,
+        "bucket_start": bucket_start.isoformat(),
+        "count": sketch.n,
+        "min": sketch.min,
+        "max": sketch.max,
+        "quantiles": {f"p{int(round(q * 100)):02d}": v for q, v in zip(quantiles, sketch.quantiles(quantiles))}
+    }
+
+def kpi_percentile(
+    db: Session,
+    identifier: str,
+    kpi: str,
+    bucket_start: Optional[datetime] = None,
+    value: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Locate an identifier's KPI within the network distribution.
+
+    The fleet sketches hold raw samples pooled across cells, so the value
+    ranked must be a raw sample too: it defaults to the identifier's most
+    recent value from the incremental KPI state, and the bucket to the hour of
+    that value. A window mean would have a much narrower spread than the
+    samples and land in the tails.
+
+    Args:
+        db (Session): Database session.
+        identifier (str): Unique identifier for the cell.
+        kpi (str): KPI column.
+        bucket_start (datetime, optional): Hour to compare against.
+        value (float, optional): Explicit raw sample to rank instead of the cell's own.
+
+    Returns:
+        dict: Value, percentile (0-100) and network distribution; status 'no data' if unavailable.
+    """
+    recent_at = None
+    if value is None:
+        kpi_state = load_kpis(db, identifier).get(kpi)
+        if not kpi_state:
+            return {"identifier": identifier, "kpi": kpi, "status": "no data", "message": f"No KPI state for {kpi}"}
+        value = kpi_state.get("recent_value")
+        recent_at = kpi_state.get("recent_at")
+    if bucket_start is None:
+        reference = pd.Timestamp(recent_at) if recent_at else pd.Timestamp.utcnow().tz_localize(None)
+        bucket_start = reference.floor("h").to_pydatetime()
+
+    sketch = load_fleet_sketch(db, kpi, bucket_start)
+    if sketch is None or value is None:
+        return {
+            "identifier": identifier,
+            "kpi": kpi,
+            "value": value,
+            "bucket_start": bucket_start.isoformat(),
+            "status": "no data",
+            "message": "No network distribution for this bucket"
+        }
+    percentile = round(sketch.rank(float(value)) * 100, 2)
+    logger.debug(f"{identifier} {kpi}={value} at p{percentile} of {sketch.n} samples")
+    return {
+        "identifier": identifier,
+        "kpi": kpi,
+        "value": value,
+        "percentile": percentile,
+        "bucket_start": bucket_start.isoformat(),
+        "distribution": _summarize(sketch, kpi, bucket_start),
+        "status": "success"
+    }
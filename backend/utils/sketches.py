@@ -0,0 +1,235 @@
+import pandas as pd
+import numpy as np
+from utils.logger import logger
+from typing import Dict, Any, Optional, Iterable
+
+# Helper function to hash values into 64-bit integers
+def _hash_values(values: Iterable[Any]) -> np.ndarray:
+    """Hash arbitrary values to uint64 using pandas' vectorized hashing."""
+    series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype="object")
+    return pd.util.hash_pandas_object(series.astype(str), index=False).to_numpy(dtype=np.uint64)
+
+class HyperLogLog:
+    """Mergeable HyperLogLog sketch for approximate distinct counts."""
+
+    def __init__(self, precision: int = 12, registers: Optional[np.ndarray] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = (
+            np.asarray(registers, dtype=np.uint8).copy()
+            if registers is not None
+            else np.zeros(self.m, dtype=np.uint8)
+        )
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """Add pre-computed uint64 hashes to the sketch."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if hashes.size == 0:
+            return
+        suffix_bits = 64 - self.precision
+        index = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+        # Rank = position of the leftmost 1-bit in the suffix (suffix_bits + 1 when all zero)
+        _, bit_length = np.frexp(suffix.astype(np.float64))
+        rank = np.where(suffix == 0, suffix_bits + 1, suffix_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def add_hash(self, hashed: int) -> None:
+        """Add a single pre-computed 64-bit hash without NumPy overhead."""
+        suffix_bits = 64 - self.precision
+        index = hashed >> suffix_bits
+        suffix = hashed & ((1 << suffix_bits) - 1)
+        rank = suffix_bits - suffix.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, value: Any) -> None:
+        """Add a single value to the sketch."""
+        self.add_hashes(_hash_values([value]))
+
+    def update(self, values: Iterable[Any]) -> None:
+        """Add many values to the sketch."""
+        self.add_hashes(_hash_values(values))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Merge another sketch of the same precision into this one."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def cardinality(self) -> float:
+        """Estimate the number of distinct values added."""
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m ** 2 / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros > 0:
+            estimate = self.m * np.log(self.m / zeros)  # Small-range correction
+        return float(estimate)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the sketch to a JSON-compatible dictionary."""
+        return {"precision": self.precision, "registers": self.registers.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        """Restore a sketch serialized with `to_dict`."""
+        return cls(precision=data["precision"], registers=np.asarray(data["registers"], dtype=np.uint8))
+
+def estimate_cardinality(values: Iterable[Any], precision: int = 12) -> float:
+    """
+    Estimate the number of distinct values with a HyperLogLog sketch.
+
+    Args:
+        values (iterable): Values to count (NaN values should be removed beforehand).
+        precision (int): Number of register index bits (4-16).
+
+    Returns:
+        float: Estimated distinct count.
+    """
+    try:
+        sketch = HyperLogLog(precision)
+        sketch.update(values)
+        return sketch.cardinality()
+    except Exception as e:
+        logger.warning(f"Cardinality estimation failed: {e}")
+        return float(pd.Series(list(values)).nunique())
+
+class KLLSketch:
+    """
+    Mergeable KLL quantile sketch.
+
+    Items live in a hierarchy of compactors; level h items carry weight 2^h.
+    A full compactor is sorted and every other item (random offset) is
+    promoted one level up, which keeps the sketch at O(k) items with rank
+    error around 1.65 / k regardless of how many values were added.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        if k < 8:
+            raise ValueError("KLL k must be at least 8")
+        self.k = k
+        self.n = 0
+        self.compactors: list = [[]]
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _size(self) -> int:
+        return sum(len(c) for c in self.compactors)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _compress(self) -> None:
+        while self._size() >= self._max_size():
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self.compactors):
+                        self.compactors.append([])
+                    items.sort()
+                    offset = int(self._rng.integers(0, 2))
+                    self.compactors[level + 1].extend(items[offset::2])
+                    self.compactors[level] = []
+                    break
+
+    def update(self, values: Iterable[float]) -> None:
+        """Add many values (NaN values are skipped)."""
+        values = np.asarray(list(values) if not isinstance(values, np.ndarray) else values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.n += int(values.size)
+        low, high = float(values.min()), float(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        # Feed level 0 in slices of k so compaction keeps memory bounded for large batches
+        step = self.k
+        for start in range(0, values.size, step):
+            self.compactors[0].extend(values[start:start + step].tolist())
+            self._compress()
+
+    def add(self, value: float) -> None:
+        """Add a single value."""
+        self.update([value])
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Merge another sketch into this one."""
+        if other.n == 0:
+            return self
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted_items(self) -> tuple:
+        items = np.concatenate([np.asarray(c, dtype=np.float64) for c in self.compactors])
+        weights = np.concatenate([np.full(len(c), 2 ** level, dtype=np.float64) for level, c in enumerate(self.compactors)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def rank(self, value: float) -> float:
+        """Estimate the fraction of added values less than or equal to `value`."""
+        if self.n == 0:
+            return float("nan")
+        items, cumulative = self._weighted_items()
+        index = np.searchsorted(items, value, side="right")
+        return float(cumulative[index - 1] / cumulative[-1]) if index > 0 else 0.0
+
+    def quantiles(self, qs: Iterable[float]) -> list:
+        """Estimate the values at the given quantiles (0-1)."""
+        qs = np.asarray(list(qs), dtype=np.float64)
+        if self.n == 0:
+            return [None for _ in qs]
+        items, cumulative = self._weighted_items()
+        indices = np.clip(np.searchsorted(cumulative, qs * cumulative[-1], side="left"), 0, len(items) - 1)
+        # Exact extremes are tracked separately
+        values = np.where(qs <= 0, self.min, np.where(qs >= 1, self.max, items[indices]))
+        return [float(v) for v in values]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the sketch to a JSON-compatible dictionary."""
+        return {"k": self.k, "n": self.n, "min": self.min, "max": self.max, "compactors": self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "KLLSketch":
+        """Restore a sketch serialized with `to_dict`."""
+        sketch = cls(k=data.get("k", 200))
+        sketch.n = data.get("n", 0)
+        sketch.min, sketch.max = data.get("min"), data.get("max")
+        sketch.compactors = [list(c) for c in data.get("compactors", [[]])] or [[]]
+        return sketch
+
+if __name__ == "__main__":
+    # Test the sketches
+    values = np.random.randint(0, 5000, size=100000)
+    sketch = HyperLogLog(precision=12)
+    sketch.update(values)
+    print("Exact distinct:", len(np.unique(values)), "HLL estimate:", round(sketch.cardinality()))
+
+    other = HyperLogLog(precision=12)
+    other.update(np.arange(5000, 8000))
+    print("Merged estimate (~8000):", round(sketch.merge(other).cardinality()))
+    print("Round trip:", HyperLogLog.from_dict(sketch.to_dict()).cardinality() == sketch.cardinality())
+
+    # Test the quantile sketch against exact quantiles
+    data = np.random.lognormal(3, 1, size=200000)
+    kll = KLLSketch(k=200)
+    for part in np.array_split(data, 20):
+        shard = KLLSketch(k=200)
+        shard.update(part)
+        kll.merge(shard)
+    print("KLL p50/p95/p99:", [round(v, 2) for v in kll.quantiles([0.5, 0.95, 0.99])])
+    print("Exact p50/p95/p99:", [round(v, 2) for v in np.quantile(data, [0.5, 0.95, 0.99])])
+    print("Rank of exact median (~0.5):", round(kll.rank(np.median(data)), 4), "items kept:", kll._size())
@@ -0,0 +1,183 @@
+import numpy as np
+from scipy import stats
+from utils.logger import logger
+from typing import Dict, Any, Optional, Tuple
+
+# Helper function to prepend a zero row to column-wise cumulative sums
+def _cumsum0(values: np.ndarray) -> np.ndarray:
+    out = np.zeros((values.shape[0] + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=out[1:])
+    return out
+
+# Helper function to resolve (centered) sample times as a column vector
+def _times(n: int, t: Optional[np.ndarray]) -> np.ndarray:
+    t = np.arange(n, dtype=np.float64) if t is None else np.asarray(t, dtype=np.float64)
+    return (t - t.mean())[:, None]
+
+# Helper function to evenly thin long series for the O(n^2) pairwise statistics
+def _downsample(X: np.ndarray, t: np.ndarray, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    if X.shape[0] <= max_points:
+        return X, t
+    positions = np.linspace(0, X.shape[0] - 1, max_points).round().astype(int)
+    return X[positions], t[positions]
+
+# Helper function to compute the Mann-Kendall tie term sum(t(t-1)(2t+5)) of every column without a loop
+def _tie_correction(X: np.ndarray) -> np.ndarray:
+    if X.shape[0] < 2:
+        return np.zeros(X.shape[1])
+    ordered = np.sort(X, axis=0)  # NaNs sort last and never compare equal
+    equal = ordered[1:] == ordered[:-1]
+    # Label each run of equal values by the index where it starts, then count run lengths
+    starts = np.vstack([np.ones((1, X.shape[1]), dtype=bool), ~equal])
+    run_ids = np.cumsum(starts, axis=0) - 1 + np.arange(X.shape[1]) * X.shape[0]
+    lengths = np.bincount(run_ids.ravel(order="F"), minlength=X.shape[0] * X.shape[1]).reshape(X.shape[1], X.shape[0]).astype(np.float64)
+    return (lengths * (lengths - 1) * (2 * lengths + 5)).sum(axis=1)
+
+def rolling_mean(X: np.ndarray, window: int) -> np.ndarray:
+    """
+    Rolling mean of every column from cumulative sums (pandas `min_periods=1` semantics, NaNs skipped).
+
+    Args:
+        X (np.ndarray): (samples, columns) array.
+        window (int): Window size.
+
+    Returns:
+        np.ndarray: Rolling means, same shape as X.
+    """
+    valid = ~np.isnan(X)
+    sums, counts = _cumsum0(np.where(valid, X, 0.0)), _cumsum0(valid.astype(np.float64))
+    end = np.arange(1, X.shape[0] + 1)
+    start = np.maximum(end - window, 0)
+    window_counts = counts[end] - counts[start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_counts > 0, (sums[end] - sums[start]) / window_counts, np.nan)
+
+def rolling_slope(X: np.ndarray, window: int, t: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Least-squares slope over a sliding window for every column, from cumulative sums.
+
+    Each window's slope is (n*Stx - St*Sx) / (n*Stt - St^2), where the sums are
+    differences of running sums. The cost is O(samples * columns) whatever the window.
+
+    Args:
+        X (np.ndarray): (samples, columns) array.
+        window (int): Window size.
+        t (np.ndarray, optional): Sample times (defaults to the sample index).
+
+    Returns:
+        np.ndarray: Slope per unit of t of the window ending at each sample (NaN until two points).
+    """
+    valid = ~np.isnan(X)
+    w = valid.astype(np.float64)
+    t = _times(X.shape[0], t)
+    x = np.where(valid, X, 0.0)
+    end = np.arange(1, X.shape[0] + 1)
+    start = np.maximum(end - window, 0)
+    sums = [_cumsum0(values) for values in (w, t * w, t * t * w, x, t * x)]
+    n, st, stt, sx, stx = (total[end] - total[start] for total in sums)
+    denom = n * stt - st ** 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denom > 1e-12, (n * stx - st * sx) / denom, np.nan)
+
+def ols_slope(X: np.ndarray, t: Optional[np.ndarray] = None) -> np.ndarray:
+    """Least-squares slope of every column over the whole series (NaNs skipped)."""
+    return rolling_slope(X, X.shape[0], t)[-1]
+
+def mann_kendall(X: np.ndarray, t: Optional[np.ndarray] = None, max_points: int = 500) -> Dict[str, np.ndarray]:
+    """
+    Mann-Kendall trend test and Theil-Sen slope for every column at once.
+
+    All pairwise differences are formed once as a (pairs, columns) array. The
+    Mann-Kendall statistic is the sum of their signs; the Theil-Sen slope is
+    the median of the pairwise slopes. Both are robust to outliers and
+    non-normal noise. Series longer than `max_points` are thinned evenly to
+    bound the quadratic cost.
+
+    Args:
+        X (np.ndarray): (samples, columns) array.
+        t (np.ndarray, optional): Sample times (defaults to the sample index).
+        max_points (int): Maximum samples used for the pairwise statistics.
+
+    Returns:
+        dict: Arrays 's', 'tau', 'z', 'p_value' and 'theil_sen' (slope per unit of t), one entry per column.
+    """
+    t = np.arange(X.shape[0], dtype=np.float64) if t is None else np.asarray(t, dtype=np.float64)
+    X, t = _downsample(X, t, max_points)
+    i, j = np.triu_indices(X.shape[0], 1)
+    diffs = X[j] - X[i]
+    s = np.nansum(np.sign(diffs), axis=0)
+    counts = (~np.isnan(X)).sum(axis=0).astype(np.float64)
+
+    # Variance of S with the correction for tied values
+    var = (counts * (counts - 1) * (2 * counts + 5) - _tie_correction(X)) / 18.0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = np.where(var > 0, (s - np.sign(s)) / np.sqrt(var), 0.0)
+        tau = np.where(counts > 1, s / (counts * (counts - 1) / 2.0), 0.0)
+        dt = (t[j] - t[i])[:, None]
+        theil_sen = np.nanmedian(np.where(dt > 0, diffs / dt, np.nan), axis=0) if len(i) else np.full(X.shape[1], np.nan)
+    return {"s": s, "tau": tau, "z": z, "p_value": 2.0 * stats.norm.sf(np.abs(z)), "theil_sen": theil_sen}
+
+def compute_trends(
+    X: np.ndarray,
+    window: int = 10,
+    alpha: float = 0.05,
+    significance: bool = False,
+    t: Optional[np.ndarray] = None,
+    max_points: int = 500
+) -> Dict[str, Any]:
+    """
+    Trend statistics for all columns of a (samples, columns) array in one pass.
+
+    With `significance`, a column trends when its Mann-Kendall p-value is below
+    `alpha`, and the magnitude is the Theil-Sen slope. Without it, the rolling
+    mean rule is used: the latest step and more than 70% of the steps share a
+    sign, and the magnitude is the latest step.
+
+    Args:
+        X (np.ndarray): (samples, columns) array in time order.
+        window (int): Rolling window size.
+        alpha (float): Significance level of the Mann-Kendall test.
+        significance (bool): Use the robust test instead of the rolling-mean rule.
+        t (np.ndarray, optional): Sample times (defaults to the sample index).
+        max_points (int): Maximum samples used for the pairwise statistics.
+
+    Returns:
+        dict: Per-column arrays 'direction' (-1, 0, 1), 'magnitude', 'slope' (OLS),
+        'recent_slope' (last window) and, with significance, 'p_value' and 'tau'.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    if X.shape[0] < 2:
+        logger.debug("Not enough samples for trend detection")
+        empty = np.zeros(X.shape[1])
+        return {"direction": empty.astype(int), "magnitude": empty, "slope": empty, "recent_slope": empty}
+
+    result = {"slope": ols_slope(X, t), "recent_slope": rolling_slope(X, window, t)[-1]}
+    if significance:
+        test = mann_kendall(X, t, max_points)
+        significant = test["p_value"] < alpha
+        result["direction"] = np.where(significant, np.sign(test["theil_sen"]), 0).astype(int)
+        result["magnitude"] = test["theil_sen"]
+        result["p_value"] = test["p_value"]
+        result["tau"] = test["tau"]
+        return result
+
+    steps = np.diff(rolling_mean(X, window), axis=0)
+    last = steps[-1]
+    up, down = (steps > 0).sum(axis=0), (steps < 0).sum(axis=0)
+    result["direction"] = np.where((last > 0) & (up > window * 0.7), 1, np.where((last < 0) & (down > window * 0.7), -1, 0))
+    result["magnitude"] = last
+    return result
+
+if __name__ == "__main__":
+    # Test on a noisy upward trend, a flat series with outliers, and a downward step
+    rng = np.random.default_rng(0)
+    n = 200
+    flat = rng.normal(0, 1, n)
+    flat[::25] += 15
+    X = np.column_stack([0.05 * np.arange(n) + rng.normal(0, 1, n), flat, np.where(np.arange(n) < 100, 5.0, 2.0) + rng.normal(0, 0.5, n)])
+    trends = compute_trends(X, significance=True)
+    print("Direction:", trends["direction"], "Theil-Sen:", np.round(trends["magnitude"], 4), "p:", np.round(trends["p_value"], 4))
+    print("Rolling rule:", compute_trends(X, significance=False)["direction"])
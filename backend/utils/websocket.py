@@ -1,6 +1,7 @@
 from fastapi import WebSocket, WebSocketDisconnect
 import json
 from utils.logger import logger
+from utils.cache import get_redis_client, CACHE_PREFIX
 from typing import Dict, Any, List, Optional
 import asyncio
 from collections import defaultdict
@@ -171,6 +172,39 @@ class WebSocketManager:
 
 ws_manager = WebSocketManager()
 
+# Redis channel carrying agent events from processes without WebSocket clients (Celery workers) to the API
+EVENT_CHANNEL = "agent_events"
+
+async def relay_events(manager: WebSocketManager, channel: str = EVENT_CHANNEL, poll_seconds: float = 1.0) -> None:
+    """
+    Broadcast agent events published on the Redis event channel to this process's WebSocket clients.
+
+    Runs until cancelled, resubscribing after Redis errors.
+
+    Args:
+        manager (WebSocketManager): Manager holding the WebSocket clients.
+        channel (str): Channel the events are published on (see utils.cache.cache_publish).
+        poll_seconds (float): Longest wait for a message before checking for cancellation.
+    """
+    while True:
+        pubsub = None
+        try:
+            pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(f"{CACHE_PREFIX}{channel}")
+            logger.info(f"Relaying agent events from Redis channel {channel}")
+            while True:
+                message = await asyncio.to_thread(pubsub.get_message, timeout=poll_seconds)
+                if message and message.get("type") == "message":
+                    await manager.broadcast(json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Agent event relay failed, resubscribing: {e}")
+            await asyncio.sleep(5)
+        finally:
+            if pubsub is not None:
+                pubsub.close()
+
 if __name__ == "__main__":
     # Test the WebSocketManager
     async def test_websocket():